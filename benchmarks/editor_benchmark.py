@@ -0,0 +1,335 @@
+"""
+Time texty's hot paths on generated files: open, save, typing and rewrapping.
+
+    python3 benchmarks/editor_benchmark.py [--sizes 1K,1M,10M] [--kinds short,long,unicode]
+                                           [--app texty2] [--output results.json]
+                                           [--compare baseline.json]
+
+For every kind and size a corpus is generated (and kept in --corpus-dir for
+the next run): "short" is many ASCII lines of about 60 characters, "long"
+lines of LONG_LINE characters, "unicode" short lines of accented, CJK and
+emoji text. Each corpus is measured in a process of its own, driving a real
+TextyWindow:
+
+    open_ms                 load_file() to the first frame showing the text
+    save_ms                 save_to_file() to the save having finished
+    keystroke_ms            median time for a typed character to reach the buffer,
+                            its signal handlers included
+    keystroke_to_frame_ms   median time from a typed character to the next frame
+    wrap_toggle_ms          median time from switching wrapping to the next frame
+    peak_rss_mb             the process's peak resident set size
+
+Files above the large-file threshold (256 MB by default) open in the
+read-only viewer, so only open_ms and peak_rss_mb are measured for them.
+
+Without a display the windows are shown on a GTK Broadway server started for
+the run (gtk4-broadwayd must be installed); --display current uses the one
+GDK would pick. Settings go to a memory backend and journals to a temporary
+directory. The results are printed and, with --output, written as JSON;
+--compare prints each metric's ratio to an earlier results file.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+LONG_LINE = 100_000
+UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+METRICS = ("open_ms", "save_ms", "keystroke_ms", "keystroke_to_frame_ms", "wrap_toggle_ms", "peak_rss_mb")
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def make_block(kind, rng):
+    """About a megabyte of corpus text, repeated to make up the size asked for."""
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do"]
+    if kind == "unicode":
+        words = ["café", "naïve", "Ärger", "żółw", "дом", "λόγος", "東京", "한국어", "😀", "🚀", "ñandú", "Øre"]
+    lines = []
+    size = 0
+    while size < 1024 * 1024:
+        if kind == "long":
+            line = []
+            length = 0
+            while length < LONG_LINE:
+                word = rng.choice(words)
+                line.append(word)
+                length += len(word) + 1
+            line = " ".join(line)[:LONG_LINE]
+        else:
+            line = " ".join(rng.choice(words) for _ in range(rng.randint(6, 12)))
+        lines.append(line)
+        size += len(line.encode()) + 1
+    return ("\n".join(lines) + "\n").encode()
+
+
+def ensure_corpus(corpus_dir, kind, size):
+    path = os.path.join(corpus_dir, f"{kind}-{size}.txt")
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        return path
+    block = make_block(kind, random.Random(size))
+    with open(path + ".tmp", "wb") as corpus:
+        written = 0
+        while written < size:
+            chunk = block[:size - written]
+            if len(chunk) < len(block) and kind == "unicode":
+                # don't end in the middle of a character
+                chunk = chunk.decode("utf-8", "ignore").encode()
+                chunk += b" " * (size - written - len(chunk))
+            corpus.write(chunk)
+            written += len(chunk)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+class Driver:
+    """
+    Run a generator on the main loop: it yields wait functions, which are
+    given a callback to resume it with once what they wait for happens.
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def start(self):
+        from gi.repository import GLib
+        GLib.idle_add(self.step, None)
+
+    def step(self, value):
+        try:
+            wait = self.generator.send(value)
+        except StopIteration:
+            return False
+        wait(self.step)
+        return False
+
+
+def next_frame(widget):
+    def wait(resume):
+        frame_clock = widget.get_frame_clock()
+        handler = None
+
+        def on_after_paint(frame_clock):
+            frame_clock.disconnect(handler)
+            resume(time.perf_counter())
+        handler = frame_clock.connect("after-paint", on_after_paint)
+        widget.queue_draw()
+    return wait
+
+
+def loaded(page):
+    def wait(resume):
+        from gi.repository import GLib
+        if not page.loading:
+            GLib.idle_add(resume, None)
+            return
+        handler = None
+
+        def on_loading_changed(page, param):
+            if not page.loading:
+                page.disconnect(handler)
+                resume(None)
+        handler = page.connect("notify::loading", on_loading_changed)
+    return wait
+
+
+def saved(page, file):
+    def wait(resume):
+        page.save_to_file(file, lambda success: resume(success))
+    return wait
+
+
+def measure(app, window, args, result):
+    from gi.repository import Gio
+
+    page = window.page
+    yield next_frame(window)
+
+    started = time.perf_counter()
+    page.load_file(Gio.File.new_for_path(args.corpus))
+    yield loaded(page)
+    result["open_ms"] = ((yield next_frame(window)) - started) * 1000
+
+    if not page.large_file_view:
+        started = time.perf_counter()
+        yield saved(page, Gio.File.new_for_path(os.path.join(args.scratch_dir, "saved.txt")))
+        result["save_ms"] = (time.perf_counter() - started) * 1000
+
+        buffer = page.buffer
+        buffer.place_cursor(buffer.get_iter_at_offset(buffer.get_char_count() // 2))
+        page.text_view.scroll_to_mark(buffer.get_insert(), 0, True, 0, 0.5)
+        yield next_frame(window)
+        inserted = []
+        framed = []
+        for _ in range(args.keystrokes):
+            started = time.perf_counter()
+            # what GtkTextView does with a committed character
+            buffer.begin_user_action()
+            buffer.insert_interactive_at_cursor("x", -1, True)
+            buffer.end_user_action()
+            inserted.append((time.perf_counter() - started) * 1000)
+            framed.append(((yield next_frame(window)) - started) * 1000)
+        result["keystroke_ms"] = statistics.median(inserted)
+        result["keystroke_to_frame_ms"] = statistics.median(framed)
+
+        toggles = []
+        for i in range(args.wrap_toggles):
+            started = time.perf_counter()
+            page.set_wrap(i % 2 == 1)
+            toggles.append(((yield next_frame(window)) - started) * 1000)
+        result["wrap_toggle_ms"] = statistics.median(toggles)
+
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    app.quit()
+
+
+def run_child(args):
+    import gi
+
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+    from gi.repository import Gio
+
+    sys.path.insert(0, ROOT)
+    module = importlib.import_module(args.app)
+    import resources
+    resources.register()
+    if args.app == "texty":
+        app = module.TextyApp(application_id="ca.footeware.py.texty")
+    else:
+        app = module.TextyApplication()
+    app.set_flags(app.get_flags() | Gio.ApplicationFlags.NON_UNIQUE)
+
+    result = {}
+    windows = []
+
+    def on_window_added(app, window):
+        # the first texty window; not e.g. a dialog
+        if hasattr(window, "tabs") and not windows:
+            windows.append(window)
+            window.connect("map", lambda window: Driver(measure(app, window, args, result)).start())
+
+    app.connect("window-added", on_window_added)
+    app.run([sys.argv[0]])
+    print(json.dumps(result))
+
+
+def start_broadway(env):
+    for display in range(5, 50):
+        server = subprocess.Popen(["gtk4-broadwayd", f":{display}"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(0.5)
+        if server.poll() is None:
+            env.update(GDK_BACKEND="broadway", BROADWAY_DISPLAY=f":{display}")
+            return server
+    sys.exit("couldn't start gtk4-broadwayd")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = {case["corpus"]: case for case in json.load(baseline_file)["results"]}
+    print(f"compared to {baseline_path}:")
+    for case in results["results"]:
+        old = baseline.get(case["corpus"])
+        if old is None:
+            continue
+        ratios = []
+        for metric in METRICS:
+            if case.get(metric) and old.get(metric):
+                ratios.append(f"{metric} {case[metric] / old[metric]:.2f}x")
+        print(f"  {case['corpus']}: " + ", ".join(ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1K,1M,10M", help="comma-separated, e.g. 1K,1M,100M,1G")
+    parser.add_argument("--kinds", default="short,long,unicode")
+    parser.add_argument("--app", choices=("texty", "texty2"), default="texty2")
+    parser.add_argument("--display", choices=("auto", "broadway", "current"), default="auto")
+    parser.add_argument("--keystrokes", type=int, default=200)
+    parser.add_argument("--wrap-toggles", type=int, default=10)
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "texty-corpora"))
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds allowed per corpus")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON of an earlier run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--scratch-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    env = dict(os.environ, GSETTINGS_BACKEND="memory")
+    env.setdefault("GSETTINGS_SCHEMA_DIR", os.path.join(ROOT, "data"))
+    server = None
+    has_display = os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")
+    if args.display == "broadway" or (args.display == "auto" and not has_display):
+        server = start_broadway(env)
+
+    results = {
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "app": args.app,
+        "backend": env.get("GDK_BACKEND", "default"),
+        "results": [],
+    }
+    try:
+        for kind in args.kinds.split(","):
+            for size_text in args.sizes.split(","):
+                size = parse_size(size_text)
+                corpus = ensure_corpus(args.corpus_dir, kind, size)
+                with tempfile.TemporaryDirectory() as scratch_dir:
+                    env["XDG_CACHE_HOME"] = scratch_dir
+                    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child",
+                                             "--app", args.app,
+                                             "--corpus", corpus,
+                                             "--scratch-dir", scratch_dir,
+                                             "--keystrokes", str(args.keystrokes),
+                                             "--wrap-toggles", str(args.wrap_toggles)],
+                                            env=env, check=True, capture_output=True, text=True,
+                                            timeout=args.timeout).stdout
+                case = {"corpus": f"{kind}-{size_text.strip()}", "bytes": size}
+                case.update({metric: round(value, 2)
+                             for metric, value in json.loads(output.strip().splitlines()[-1]).items()})
+                results["results"].append(case)
+                print(json.dumps(case), flush=True)
+    finally:
+        if server:
+            server.terminate()
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
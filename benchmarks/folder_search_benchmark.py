@@ -0,0 +1,118 @@
+"""
+Time Find in Folder on a generated tree of many small files, headlessly.
+
+    python3 benchmarks/folder_search_benchmark.py [--files 100000] [--workers 1,4,8]
+                                                  [--pattern needle] [--output results.json]
+
+The tree has --files text files of about 40 lines in directories of 1,000,
+spread over two levels, plus what a search should skip: one file in a
+hundred is binary, and a node_modules directory and *.log files (ignored
+by a .gitignore) hold another tenth as many files. One file in fifty
+contains the pattern. The tree is generated once and kept in --tree-dir.
+
+Each worker count is timed with a FolderSearch from the start of the walk
+to on_finished, and reported with the files searched per second and the
+time to the first result; the file cache is warm after the first run, so
+the first worker count also pays for reading the tree from disk.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from folder_search import FolderSearch, compile_bytes_pattern
+
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt".split()
+
+
+def generate(root, files, pattern):
+    marker = os.path.join(root, f".complete-{files}")
+    if os.path.exists(marker):
+        return
+    rng = random.Random(42)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".gitignore"), "w") as ignore_file:
+        ignore_file.write("*.log\n")
+    for i in range(files):
+        directory = os.path.join(root, f"d{i // 10000:02d}", f"d{i // 1000 % 10}")
+        if i % 1000 == 0:
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"f{i}.txt")
+        if i % 100 == 99:
+            with open(path, "wb") as file:
+                file.write(bytes(rng.randrange(256) for _ in range(2048)) + b"\0")
+            continue
+        lines = [" ".join(rng.choice(WORDS) for _ in range(8)) for _ in range(40)]
+        if i % 50 == 0:
+            lines[rng.randrange(40)] += f" {pattern}"
+        with open(path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+    for i in range(files // 10):
+        directory = os.path.join(root, "node_modules" if i % 2 else "logs")
+        os.makedirs(directory, exist_ok=True)
+        name = f"m{i}.txt" if i % 2 else f"l{i}.log"
+        with open(os.path.join(directory, name), "w") as file:
+            file.write(f"{pattern}\n")
+    open(marker, "w").close()
+
+
+def measure(root, pattern, workers):
+    finished = threading.Event()
+    first_result = []
+    started = time.perf_counter()
+
+    def on_results(matches):
+        if not first_result:
+            first_result.append(time.perf_counter())
+
+    search = FolderSearch(root, pattern, on_results, lambda search: finished.set(), workers=workers)
+    search.MAX_MATCHES = 10 ** 9
+    search.start()
+    finished.wait()
+    elapsed = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(search.files_searched / elapsed),
+        "first_result_ms": round((first_result[0] - started) * 1000, 1) if first_result else None,
+        "files_searched": search.files_searched,
+        "files_skipped": search.files_skipped,
+        "matches": search.match_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--workers", default=f"1,4,{min(32, (os.cpu_count() or 1) + 4)}")
+    parser.add_argument("--pattern", default="needle")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tree-dir", default=os.path.join(tempfile.gettempdir(), "texty-folder-search"))
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    root = os.path.join(args.tree_dir, str(args.files))
+    generate(root, args.files, args.pattern)
+    pattern = compile_bytes_pattern(args.pattern)
+    results = {"files": args.files, "runs": []}
+    for workers in (int(count) for count in args.workers.split(",")):
+        runs = [measure(root, pattern, workers) for _ in range(args.repeat)]
+        result = dict(runs[0], seconds=statistics.median(run["seconds"] for run in runs),
+                      files_per_second=statistics.median(run["files_per_second"] for run in runs))
+        results["runs"].append(result)
+        print(f"{workers:3} workers  {result['seconds']:8.3f} s  {result['files_per_second']:8} files/s  "
+              f"first result {result['first_result_ms']} ms  {result['matches']} matches", flush=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measure typing latency in a large Python file with and without highlighting.
+
+    python3 benchmarks/highlight_benchmark.py [--keys 300] [--lines 100000] [--plain]
+
+Each step types one character in the middle of the document and waits for the
+next frame to be painted. Run it with and without --plain and compare; the
+medians should be about the same, as lexing happens on a worker thread and
+only the visible lines are tagged.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import gi
+
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, GLib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from highlight import Highlighter, PythonLexer
+from piece_table import PieceTable
+
+
+SAMPLE = '''@property
+def line_count(self):
+    """Return the number of lines."""
+    return (self.line_ends[-1] if self.line_ends else 0) + 1  # at least one
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--plain", action="store_true", help="type without highlighting")
+    args = parser.parse_args()
+
+    Gtk.init()
+    window = Gtk.Window()
+    window.set_default_size(1000, 600)
+    scrolled_window = Gtk.ScrolledWindow()
+    text_view = Gtk.TextView()
+    buffer = text_view.get_buffer()
+    document = PieceTable()
+    document.attach(buffer)
+    highlighter = Highlighter(text_view, document)
+    sample_lines = SAMPLE.count("\n")
+    buffer.set_text(SAMPLE * (args.lines // sample_lines))
+    if not args.plain:
+        highlighter.set_lexer(PythonLexer())
+    scrolled_window.set_child(text_view)
+    window.set_child(scrolled_window)
+
+    loop = GLib.MainLoop()
+    latencies = []
+    state = {"started": None}
+
+    def type_key():
+        state["started"] = time.perf_counter()
+        buffer.insert_at_cursor("x" if len(latencies) % 10 else "\n")
+        return GLib.SOURCE_REMOVE
+
+    def on_after_paint(frame_clock):
+        if state["started"] is None:
+            return
+        latencies.append((time.perf_counter() - state["started"]) * 1000)
+        state["started"] = None
+        if len(latencies) >= args.keys:
+            loop.quit()
+        else:
+            GLib.idle_add(type_key)
+
+    def begin():
+        middle = buffer.get_iter_at_line(args.lines // 2)[1]
+        buffer.place_cursor(middle)
+        text_view.scroll_to_iter(middle, 0, True, 0, 0.5)
+        window.get_frame_clock().connect("after-paint", on_after_paint)
+        type_key()
+        return GLib.SOURCE_REMOVE
+
+    window.present()
+    # leave time for the initial lexing to finish
+    GLib.timeout_add(500 if args.plain else 5000, begin)
+    loop.run()
+
+    print(json.dumps({
+        "mode": "plain" if args.plain else "highlighted",
+        "keys": len(latencies),
+        "lines": args.lines,
+        "median_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(sorted(latencies)[int(len(latencies) * 0.95) - 1], 3),
+        "max_ms": round(max(latencies), 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Measure texty's startup: time to the first frame, and time to open another window.
+
+    python3 benchmarks/startup_benchmark.py [--app texty2] [--runs 5] [--windows 10]
+
+Each run starts texty in a new process and times, from just before the
+process is spawned, the first frame of its first window; the first run is
+reported as cold, since it's the one that reads texty, PyGObject and GTK
+from disk, and the median of the others as warm. Each run then opens
+--windows more windows through the new_window action, timing each from the
+action to its first frame. Settings go to a memory backend and crash
+journals to a temporary directory, so no session is restored and no dialog
+shown. Prints a JSON summary.
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def run_child(args):
+    import gi
+
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+    from gi.repository import Gio, GLib
+
+    sys.path.insert(0, ROOT)
+    module = importlib.import_module(args.app)
+    import resources
+    resources.register()
+    if args.app == "texty":
+        app = module.TextyApp(application_id="ca.footeware.py.texty")
+    else:
+        app = module.TextyApplication()
+    # a texty already running must not take over the windows
+    app.set_flags(app.get_flags() | Gio.ApplicationFlags.NON_UNIQUE)
+
+    started = float(os.environ["TEXTY_BENCHMARK_STARTED"])
+    result = {"first_frame_ms": None, "new_window_ms": []}
+    state = {"requested": None}
+
+    def open_window():
+        state["requested"] = time.monotonic()
+        if args.app == "texty":
+            app.get_active_window().activate_action("win.new_window", None)
+        else:
+            app.activate_action("new_window", None)
+        return GLib.SOURCE_REMOVE
+
+    def on_first_frame(window):
+        now = time.monotonic()
+        if result["first_frame_ms"] is None:
+            result["first_frame_ms"] = (now - started) * 1000
+        else:
+            result["new_window_ms"].append((now - state["requested"]) * 1000)
+        if len(result["new_window_ms"]) < args.windows:
+            GLib.idle_add(open_window)
+        else:
+            app.quit()
+
+    def on_window_added(app, window):
+        def on_map(window):
+            frame_clock = window.get_frame_clock()
+            handler = None
+
+            def on_after_paint(frame_clock):
+                frame_clock.disconnect(handler)
+                on_first_frame(window)
+            handler = frame_clock.connect("after-paint", on_after_paint)
+        window.connect("map", on_map)
+
+    app.connect("window-added", on_window_added)
+    app.run([sys.argv[0]])
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", choices=("texty", "texty2"), default="texty2")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--windows", type=int, default=10, help="windows opened per run after the first")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    runs = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ,
+                   GSETTINGS_BACKEND="memory",
+                   XDG_CACHE_HOME=cache_dir)
+        env.setdefault("GSETTINGS_SCHEMA_DIR", os.path.join(ROOT, "data"))
+        for _ in range(args.runs):
+            env["TEXTY_BENCHMARK_STARTED"] = repr(time.monotonic())
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child",
+                                     "--app", args.app, "--windows", str(args.windows)],
+                                    env=env, check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    warm = [run["first_frame_ms"] for run in runs[1:]]
+    new_window = sorted(ms for run in runs for ms in run["new_window_ms"])
+    print(json.dumps({
+        "app": args.app,
+        "runs": args.runs,
+        "cold_first_frame_ms": round(runs[0]["first_frame_ms"], 1),
+        "warm_first_frame_ms": round(statistics.median(warm), 1) if warm else None,
+        "new_window_median_ms": round(statistics.median(new_window), 2) if new_window else None,
+        "new_window_p95_ms": round(new_window[int(len(new_window) * 0.95) - 1], 2) if new_window else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Time keeping the word, character and byte counts of a large document up to date, headlessly.
+
+    python3 benchmarks/statistics_benchmark.py [--megabytes 100] [--edits 300] [--output results.json]
+
+The document is --megabytes of generated prose in a PieceTable. The full
+count is what the worker thread does after loading or a bulk change; each
+edit is then applied the way DocumentStatistics applies one, by adjusting
+the blocks and recounting the dirty ones, and timed up to the new totals.
+That is the work done on the main loop per keystroke, and should stay well
+under a frame (16 ms) however big the document is.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from document_stats import BlockStatistics
+from piece_table import PieceTable
+
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt".split()
+
+
+def generate(megabytes):
+    rng = random.Random(42)
+    lines = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(4, 16)))
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def delete_line(document, offset):
+    line = document.offset_to_line(offset)
+    return document.line_to_offset(line), document.line_to_offset(line + 1), ""
+
+
+# each returns the range to replace and what with
+EDITS = {
+    "keystroke": lambda document, offset: (offset, offset, "x"),
+    "paste_4k": lambda document, offset: (offset, offset, "lorem ipsum " * 341),
+    "delete_line": delete_line,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=100)
+    parser.add_argument("--edits", type=int, default=300)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    document = PieceTable(generate(args.megabytes))
+    started = time.perf_counter()
+    blocks = BlockStatistics.count_all(document.snapshot(), "utf-8")
+    full_count_ms = (time.perf_counter() - started) * 1000
+    print(f"full count           {full_count_ms:10.1f} ms  {len(blocks.lengths)} blocks", flush=True)
+    results = {"megabytes": args.megabytes, "characters": len(document), "full_count_ms": round(full_count_ms, 1)}
+
+    rng = random.Random(1)
+    for name, edit in EDITS.items():
+        times = []
+        for _ in range(args.edits):
+            started = time.perf_counter()
+            start, end, text = edit(document, rng.randrange(len(document)))
+            if end > start:
+                document.delete(start, end)
+                blocks.delete(start, end)
+            if text:
+                document.insert(start, text)
+                blocks.insert(start, len(text))
+            blocks.recount(document)
+            blocks.totals()
+            times.append((time.perf_counter() - started) * 1000)
+        result = {"median_ms": round(statistics.median(times), 3), "max_ms": round(max(times), 3)}
+        results[name] = result
+        print(f"{name:20} {result['median_ms']:10.3f} ms median {result['max_ms']:10.3f} ms max", flush=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
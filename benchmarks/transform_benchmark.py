@@ -0,0 +1,71 @@
+"""
+Time the line transforms on a generated log, headlessly.
+
+    python3 benchmarks/transform_benchmark.py [--lines 1000000] [--repeat 3] [--output results.json]
+
+The log has --lines lines of about 60 characters: a timestamp, a level, a
+request number from a small set, so there are duplicates, and some padding.
+Each pipeline is run the way DocumentPage.transform() runs it, computing
+the edits to make to the buffer, and reported with its median time and the
+number of edits, which is what applying the result costs on the main loop.
+No display is needed; GTK isn't imported.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from transform import ChangeCase, Filter, Pipeline, Sort, Substitute, Trim, Unique
+
+
+PIPELINES = {
+    "sort": lambda: [Sort()],
+    "sort_numeric": lambda: [Sort(numeric=True)],
+    "unique": lambda: [Unique()],
+    "keep_errors": lambda: [Filter(r"\bERROR\b")],
+    "remove_debug": lambda: [Filter(r"\bDEBUG\b", keep=False)],
+    "substitute": lambda: [Substitute(r"request=(\d+)", r"req:\1")],
+    "trim": lambda: [Trim()],
+    "upper": lambda: [ChangeCase("upper")],
+    "trim_unique_sort": lambda: [Trim(), Unique(), Sort()],
+}
+
+
+def generate(lines):
+    rng = random.Random(42)
+    levels = ["DEBUG", "INFO", "INFO", "INFO", "WARNING", "ERROR"]
+    return "\n".join(f"{i // 10:08d} {rng.choice(levels):7} request={rng.randrange(5000)}"
+                     + " " * rng.randrange(3) for i in range(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pipelines", default=",".join(PIPELINES))
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    text = generate(args.lines)
+    results = {"lines": args.lines, "characters": len(text), "pipelines": {}}
+    for name in args.pipelines.split(","):
+        times = []
+        for _ in range(args.repeat):
+            pipeline = Pipeline(PIPELINES[name]())
+            started = time.perf_counter()
+            edits = pipeline.run(text)
+            times.append((time.perf_counter() - started) * 1000)
+        result = {"median_ms": round(statistics.median(times), 1), "edits": len(edits)}
+        results["pipelines"][name] = result
+        print(f"{name:18} {result['median_ms']:10.1f} ms {result['edits']:6} edits", flush=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure restyle latency across many zoom steps on a large document.
+
+    python3 benchmarks/zoom_benchmark.py [--steps 400] [--lines 100000] [--stack]
+
+Each step changes the font size and waits for the next frame to be painted.
+With --stack every step adds a new Gtk.CssProvider to the display, the way
+texty used to; otherwise the single StyleManager provider is updated in place.
+Prints a JSON summary; with the shared provider the median of the last steps
+should stay close to that of the first ones.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import gi
+
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, Gdk, GLib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from style import StyleManager
+
+
+def add_provider(font_size):
+    css_provider = Gtk.CssProvider()
+    css_provider.load_from_data(f"textview {{font-size: {font_size}px;}}".encode())
+    Gtk.StyleContext.add_provider_for_display(Gdk.Display.get_default(),
+                                              css_provider,
+                                              Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--stack", action="store_true", help="add a provider per step, like texty used to")
+    args = parser.parse_args()
+
+    Gtk.init()
+    window = Gtk.Window()
+    window.set_default_size(1000, 600)
+    scrolled_window = Gtk.ScrolledWindow()
+    text_view = Gtk.TextView()
+    text_view.get_buffer().set_text("\n".join(f"line {i}: the quick brown fox jumps over the lazy dog"
+                                              for i in range(args.lines)))
+    scrolled_window.set_child(text_view)
+    window.set_child(scrolled_window)
+
+    style_manager = StyleManager.for_display(Gdk.Display.get_default())
+    loop = GLib.MainLoop()
+    latencies = []
+    state = {"step": 0, "started": None}
+
+    def next_step():
+        state["step"] += 1
+        # sweep the sizes up and down so every step really changes something
+        font_size = 12 + (state["step"] % 28)
+        state["started"] = time.perf_counter()
+        if args.stack:
+            add_provider(font_size)
+        else:
+            style_manager.set_font_size(font_size)
+        return GLib.SOURCE_REMOVE
+
+    def on_after_paint(frame_clock):
+        if state["started"] is None:
+            return
+        latencies.append((time.perf_counter() - state["started"]) * 1000)
+        state["started"] = None
+        if len(latencies) >= args.steps:
+            loop.quit()
+        else:
+            GLib.idle_add(next_step)
+
+    def begin():
+        window.get_frame_clock().connect("after-paint", on_after_paint)
+        next_step()
+        return GLib.SOURCE_REMOVE
+
+    window.present()
+    GLib.timeout_add(500, begin)
+    loop.run()
+
+    window_size = min(50, len(latencies) // 2)
+    print(json.dumps({
+        "mode": "stack" if args.stack else "shared",
+        "steps": len(latencies),
+        "lines": args.lines,
+        "first_median_ms": round(statistics.median(latencies[:window_size]), 3),
+        "last_median_ms": round(statistics.median(latencies[-window_size:]), 3),
+        "max_ms": round(max(latencies), 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+
+
+def hash_block(text):
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class ChangeTracker:
+    """
+    Tell whether a PieceTable still holds the content it was last loaded or saved with.
+
+    The saved content is remembered as one hash per BLOCK_SIZE characters, and
+    every edit since widens a single dirty range. The document is unchanged if
+    it has the saved length and the blocks overlapping the dirty range hash the
+    same as before, so answering costs time proportional to the edited region,
+    not to the document.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, document):
+        self.document = document
+        self.length = 0  # current length, kept up to date from the buffer signals
+        self.saved_length = 0
+        self.block_hashes = []  # None while being computed
+        self.dirty_start = None  # every edit since the save lies within [dirty_start, dirty_end)
+        self.dirty_end = None
+        self.generation = 0
+
+    def attach(self, buffer):
+        buffer.connect("insert-text", self.on_insert_text)
+        buffer.connect("delete-range", self.on_delete_range)
+
+    def on_insert_text(self, buffer, location, text, length):
+        self.inserted(location.get_offset(), len(text))
+
+    def on_delete_range(self, buffer, start, end):
+        self.deleted(start.get_offset(), end.get_offset())
+
+    def inserted(self, offset, length):
+        self.length += length
+        if self.dirty_start is None:
+            self.dirty_start, self.dirty_end = offset, offset + length
+            return
+        self.dirty_start = min(self.dirty_start, offset)
+        self.dirty_end = max(self.dirty_end + length if offset <= self.dirty_end else self.dirty_end,
+                             offset + length)
+
+    def deleted(self, start, end):
+        self.length -= end - start
+        if self.dirty_start is None:
+            self.dirty_start = self.dirty_end = start
+            return
+        self.dirty_start = min(self.dirty_start, start)
+        if end <= self.dirty_end:
+            self.dirty_end -= end - start
+        else:
+            self.dirty_end = max(start, self.dirty_start)
+        self.dirty_end = max(self.dirty_end, self.dirty_start)
+
+    def mark_saved(self):
+        """Remember the current content as saved; the block hashes are computed on a worker thread."""
+        self.generation += 1
+        self.length = self.saved_length = len(self.document)
+        self.dirty_start = self.dirty_end = None
+        self.block_hashes = None
+        snapshot = self.document.snapshot()
+        threading.Thread(target=self.hash_snapshot, args=(snapshot, self.generation), daemon=True).start()
+
+    def mark_appended_saved(self, start):
+        """
+        Remember text appended from start on, to a document that was saved, as saved too.
+
+        Only the blocks from the one start falls in are hashed, so following
+        a growing file costs time proportional to what's appended to it.
+        """
+        if self.block_hashes is None or (self.dirty_start is not None and self.dirty_start < start):
+            self.mark_saved()
+            return
+        first = start // self.BLOCK_SIZE
+        self.length = self.saved_length = len(self.document)
+        self.dirty_start = self.dirty_end = None
+        self.block_hashes = self.block_hashes[:first] + [
+            hash_block(self.document.get_text(block, block + self.BLOCK_SIZE))
+            for block in range(first * self.BLOCK_SIZE, self.length, self.BLOCK_SIZE)]
+
+    def hash_snapshot(self, snapshot, generation):
+        # iter_chunks() splits at piece boundaries too; blocks must start at multiples of BLOCK_SIZE
+        hashes = [hash_block(snapshot.get_text(start, start + self.BLOCK_SIZE))
+                  for start in range(0, len(snapshot), self.BLOCK_SIZE)]
+        if generation == self.generation:
+            self.block_hashes = hashes
+
+    def forget(self):
+        """Stop comparing against the saved content, e.g. when it's no longer known what's on disk."""
+        self.generation += 1
+        self.block_hashes = None
+        self.dirty_start, self.dirty_end = 0, self.length
+
+    def may_be_unchanged(self):
+        """A cheap test: if this is False, is_unchanged() certainly is too."""
+        return self.length == self.saved_length
+
+    def is_unchanged(self):
+        """Return whether the content equals the saved content, or None if that isn't known yet."""
+        if self.dirty_start is None:
+            return True
+        if self.length != self.saved_length:
+            return False
+        hashes = self.block_hashes
+        if hashes is None:
+            return None
+        first = self.dirty_start // self.BLOCK_SIZE
+        last = max(self.dirty_end - 1, self.dirty_start) // self.BLOCK_SIZE
+        for block in range(first, min(last + 1, len(hashes))):
+            start = block * self.BLOCK_SIZE
+            if hash_block(self.document.get_text(start, start + self.BLOCK_SIZE)) != hashes[block]:
+                return False
+        # identical: later edits can start a fresh dirty range
+        self.dirty_start = self.dirty_end = None
+        return True
@@ -0,0 +1,135 @@
+import bz2
+import lzma
+import os
+import zlib
+
+
+# magic bytes a compressed file starts with
+MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+)
+
+EXTENSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+
+# the most bytes a magic takes
+MAGIC_SIZE = max(len(magic) for magic, name in MAGIC)
+
+
+def detect_compression(head):
+    """Return the compression, "gzip", "bz2" or "xz", of data starting with head, or None."""
+    for magic, name in MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def detect_file_compression(path):
+    try:
+        with open(path, "rb") as file:
+            return detect_compression(file.read(MAGIC_SIZE))
+    except OSError:
+        return None
+
+
+def compression_for_name(name):
+    """Return the compression the extension of a file name asks for, or None."""
+    return EXTENSIONS.get(os.path.splitext(name)[1].lower())
+
+
+class Decompressor:
+    """
+    Decompress a gzip, bz2 or xz file a chunk at a time.
+
+    Files made of several compressed streams one after another, as gzip
+    and bzip2 allow and parallel compressors write, are decompressed whole.
+    No call returns more than OUTPUT_SIZE bytes, however much the input
+    expands: while needs_input is False, what's left of it gives more.
+    """
+
+    OUTPUT_SIZE = 1024 * 1024
+
+    def __init__(self, compression):
+        self.compression = compression
+        self.pending = b""  # input left over by an earlier call
+        self.new_stream()
+
+    def new_stream(self):
+        if self.compression == "gzip":
+            self.stream = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        elif self.compression == "bz2":
+            self.stream = bz2.BZ2Decompressor()
+        else:
+            self.stream = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+        self.started = False
+        self.capped = False  # the last call stopped at OUTPUT_SIZE
+
+    def has_output(self):
+        """Whether the stream may give more output without more input."""
+        if self.compression == "gzip":
+            return self.capped
+        return not self.stream.needs_input
+
+    @property
+    def needs_input(self):
+        return not self.pending and not self.has_output()
+
+    def decompress(self, data):
+        """
+        Return what data, after what's left of earlier input, decompresses to, at most OUTPUT_SIZE bytes.
+
+        Raises ValueError if it isn't valid.
+        """
+        data = self.pending + data
+        self.pending = b""
+        pieces = []
+        room = self.OUTPUT_SIZE
+        try:
+            while room and (data or self.has_output()):
+                self.started = True
+                piece = self.stream.decompress(data, room)
+                pieces.append(piece)
+                room -= len(piece)
+                self.capped = not room
+                data = self.stream.unconsumed_tail if self.compression == "gzip" else b""
+                if self.stream.eof:
+                    data = self.stream.unused_data
+                    self.new_stream()
+        except (OSError, EOFError, zlib.error, lzma.LZMAError) as e:
+            raise ValueError(f"Invalid {self.compression} data: {e}") from e
+        self.pending = data
+        return b"".join(pieces)
+
+    def finish(self):
+        """Raise ValueError if the file ended in the middle of a stream."""
+        if self.started and not self.stream.eof:
+            raise ValueError(f"The {self.compression} file is truncated")
+
+
+def decompress_all(data, compression):
+    """Decompress the whole of data, raising ValueError if it isn't valid or is truncated."""
+    decompressor = Decompressor(compression)
+    pieces = [decompressor.decompress(data)]
+    while not decompressor.needs_input:
+        pieces.append(decompressor.decompress(b""))
+    decompressor.finish()
+    return b"".join(pieces)
+
+
+class Compressor:
+    """Compress a file a chunk at a time, as gzip, bz2 or xz, at the compressors' default levels."""
+
+    def __init__(self, compression):
+        if compression == "gzip":
+            self.stream = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        elif compression == "bz2":
+            self.stream = bz2.BZ2Compressor()
+        else:
+            self.stream = lzma.LZMACompressor(lzma.FORMAT_XZ)
+
+    def compress(self, data):
+        return self.stream.compress(data)
+
+    def flush(self):
+        return self.stream.flush()
@@ -0,0 +1,161 @@
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from long_lines import join
+
+
+# counts of the text of one block, display splits left out; starts_word and
+# ends_word tell whether a word runs on from the block before or into the next
+BlockCounts = namedtuple("BlockCounts", "words characters size starts_word ends_word")
+
+EMPTY_COUNTS = BlockCounts(0, 0, 0, False, False)
+
+
+def count_block(text, encoding):
+    """Count the words, characters and bytes, in encoding, of a block of the buffer's text."""
+    text = join(text)
+    if not text:
+        return EMPTY_COUNTS
+    return BlockCounts(len(text.split()),
+                       len(text),
+                       len(text.encode(encoding, "replace")),
+                       not text[0].isspace(),
+                       not text[-1].isspace())
+
+
+def count_joins(chain):
+    """Return how many words run on from one to the next of chain, the BlockCounts of consecutive non-empty blocks."""
+    return sum(1 for before, after in zip(chain, chain[1:]) if before.ends_word and after.starts_word)
+
+
+class BlockStatistics:
+    """
+    Word, character and byte counts of a document, kept per block of about BLOCK_SIZE characters.
+
+    insert() and delete() adjust the lengths of the blocks an edit falls in
+    and mark them dirty, and recount() counts only the dirty blocks again,
+    taking what they counted before off the totals and adding what they
+    count now, so keeping the counts up to date while typing costs time
+    proportional to a block, not to the document. The running ends of the
+    blocks, to find the one an offset falls in, are brought up to date
+    lazily from the first block an edit changed, as PieceTable does its
+    totals. Words are runs of non-whitespace, as wc counts them; one cut in
+    two by a block boundary is counted once. Bytes are those of the text in
+    the buffer, with "\n" for every line ending.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, encoding="utf-8"):
+        self.encoding = encoding
+        self.lengths = []  # characters in each block, display splits included
+        self.counts = []  # BlockCounts of each block as last counted
+        self.dirty = set()  # blocks edited since they were counted
+        self.ends = []  # running total of the lengths, correct for the blocks before valid
+        self.valid = 0
+        self.words = self.characters = self.size = 0  # totals of counts
+
+    @classmethod
+    def count_all(cls, reader, encoding, is_cancelled=None):
+        """Count a whole PieceTableReader, from any thread; returns None if is_cancelled() turns True."""
+        statistics = cls(encoding)
+        for start in range(0, len(reader), cls.BLOCK_SIZE):
+            if is_cancelled and is_cancelled():
+                return None
+            text = reader.get_text(start, start + cls.BLOCK_SIZE)
+            statistics.lengths.append(len(text))
+            statistics.counts.append(count_block(text, encoding))
+        statistics.add_totals(0, len(statistics.lengths), 1)
+        return statistics
+
+    def update_ends(self, offset=None, blocks=None):
+        """Bring the running ends up to date until they reach offset, or for the first blocks blocks."""
+        del self.ends[self.valid:]
+        end = self.ends[-1] if self.ends else 0
+        while self.valid < len(self.lengths) and (end < offset if blocks is None else self.valid < blocks):
+            end += self.lengths[self.valid]
+            self.ends.append(end)
+            self.valid += 1
+
+    def insert(self, offset, length):
+        if not self.lengths:
+            self.lengths.append(length)
+            self.counts.append(EMPTY_COUNTS)
+            self.dirty.add(0)
+            return
+        self.update_ends(offset)
+        # text inserted where a block ends goes to that block, so appending grows the last one
+        i = min(bisect_left(self.ends, offset), len(self.lengths) - 1)
+        self.lengths[i] += length
+        self.dirty.add(i)
+        self.valid = min(self.valid, i)
+
+    def delete(self, start, end):
+        self.update_ends(end)
+        first = i = bisect_right(self.ends, start)
+        while i < len(self.ends) and self.ends[i] - self.lengths[i] < end:
+            block_end = self.ends[i]
+            block_start = block_end - self.lengths[i]
+            self.lengths[i] -= min(end, block_end) - max(start, block_start)
+            self.dirty.add(i)
+            i += 1
+        self.valid = min(self.valid, first)
+
+    def dirty_size(self):
+        """Return how many characters recount() would read."""
+        return sum(self.lengths[i] for i in self.dirty)
+
+    def recount(self, document):
+        """Count the dirty blocks again, cutting each run of them into blocks of about BLOCK_SIZE."""
+        runs = []
+        for i in sorted(self.dirty):
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+        self.dirty = set()
+        shift = 0  # blocks the runs counted so far have added, less those they've removed
+        for first, end in runs:
+            first += shift
+            end += shift
+            self.update_ends(blocks=first)
+            start = self.ends[first - 1] if first else 0
+            lengths, counts = self.count_run(document, start, start + sum(self.lengths[first:end]))
+            self.add_totals(first, end, -1)
+            self.lengths[first:end] = lengths
+            self.counts[first:end] = counts
+            self.valid = min(self.valid, first)
+            self.add_totals(first, first + len(lengths), 1)
+            shift += len(lengths) - (end - first)
+
+    def count_run(self, document, start, end):
+        lengths, counts = [], []
+        block_starts = list(range(start, end, self.BLOCK_SIZE))
+        if len(block_starts) > 1 and end - block_starts[-1] < self.BLOCK_SIZE // 2:
+            del block_starts[-1]  # a short remainder joins the block before it
+        for block_start, block_end in zip(block_starts, block_starts[1:] + [end]):
+            text = document.get_text(block_start, block_end)
+            lengths.append(len(text))
+            counts.append(count_block(text, self.encoding))
+        return lengths, counts
+
+    def add_totals(self, first, end, sign):
+        """Add the counts of blocks first to end to the totals sign times, with the words they share with the blocks around."""
+        chain = [counts for counts in self.counts[first:end] if counts.characters]
+        before = first - 1
+        while before >= 0 and not self.counts[before].characters:
+            before -= 1
+        if before >= 0:
+            chain.insert(0, self.counts[before])
+        after = end
+        while after < len(self.counts) and not self.counts[after].characters:
+            after += 1
+        if after < len(self.counts):
+            chain.append(self.counts[after])
+        self.words += sign * (sum(counts.words for counts in self.counts[first:end]) - count_joins(chain))
+        self.characters += sign * sum(counts.characters for counts in self.counts[first:end])
+        self.size += sign * sum(counts.size for counts in self.counts[first:end])
+
+    def totals(self):
+        """Return (words, characters, bytes) of the document; there must be no dirty blocks."""
+        return self.words, self.characters, self.size
@@ -0,0 +1,143 @@
+import codecs
+
+from gi.repository import Gio, GLib
+
+from text_format import is_consistent, to_buffer
+
+
+class FileWatcher:
+    """
+    Watch a file for changes made by other programs, reading only what was appended.
+
+    offset is how many bytes of the file the document holds. When the file
+    monitor reports a change and the file has grown, the TAIL_SIZE bytes
+    before offset are compared with the ones last seen there: if they're the
+    same the file was appended to, and only the bytes from offset on are
+    read, decoded with the document's text format and handed to
+    on_appended(watcher, text), so following a growing log costs I/O and
+    CPU in proportion to what's written to it. Any other change, or text
+    that doesn't decode or mixes line endings, is reported to
+    on_changed(watcher, deleted) instead. So is any growth of a compressed
+    file, as appended bytes can't be decompressed on their own.
+    """
+
+    CHUNK_SIZE = 256 * 1024
+    TAIL_SIZE = 64
+    RATE_LIMIT = 250  # ms between checks of a file that's being written to continuously
+
+    def __init__(self, file, text_format, offset, on_appended, on_changed):
+        self.file = file
+        self.path = file.get_path()
+        self.text_format = text_format
+        self.offset = offset
+        self.on_appended = on_appended
+        self.on_changed = on_changed
+        self.tail = self.read_tail()
+        self.decoder = codecs.getincrementaldecoder(text_format.encoding)()
+        self.pending = ""  # a "\r" held back in case the next append starts with "\n"
+        self.paused = False  # while texty itself writes the file
+        self.reading = False
+        self.recheck = False  # the file changed again while appended bytes were read
+        self.stream = None
+        self.cancellable = Gio.Cancellable()
+        self.monitor = file.monitor_file(Gio.FileMonitorFlags.WATCH_MOVES, self.cancellable)
+        self.monitor.set_rate_limit(self.RATE_LIMIT)
+        self.monitor.connect("changed", self.on_monitor_changed)
+
+    def stop(self):
+        self.cancellable.cancel()
+        self.monitor.cancel()
+
+    def read_tail(self):
+        start = max(self.offset - self.TAIL_SIZE, 0)
+        try:
+            with open(self.path, "rb") as file:
+                file.seek(start)
+                return file.read(self.offset - start)
+        except OSError:
+            return None
+
+    def on_monitor_changed(self, monitor, file, other_file, event):
+        if self.paused or self.cancellable.is_cancelled():
+            return
+        if event in (Gio.FileMonitorEvent.DELETED, Gio.FileMonitorEvent.MOVED_OUT, Gio.FileMonitorEvent.RENAMED):
+            self.on_changed(self, True)
+        elif event in (Gio.FileMonitorEvent.CHANGED,
+                       Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+                       Gio.FileMonitorEvent.CREATED,
+                       Gio.FileMonitorEvent.MOVED_IN):
+            self.check()
+
+    def check(self):
+        if self.reading:
+            self.recheck = True
+            return
+        try:
+            size = self.file.query_info(Gio.FILE_ATTRIBUTE_STANDARD_SIZE, Gio.FileQueryInfoFlags.NONE, None).get_size()
+        except GLib.Error:
+            self.on_changed(self, True)
+            return
+        if size < self.offset or self.read_tail() != self.tail:
+            self.on_changed(self, False)
+        elif size > self.offset:
+            if self.text_format.compression:
+                self.on_changed(self, False)
+            else:
+                self.read_appended()
+
+    def read_appended(self):
+        self.reading = True
+        self.recheck = False
+        self.file.read_async(GLib.PRIORITY_DEFAULT, self.cancellable, self.on_read_ready)
+
+    def on_read_ready(self, file, result):
+        try:
+            self.stream = file.read_finish(result)
+            self.stream.seek(self.offset, GLib.SeekType.SET, self.cancellable)
+        except GLib.Error as error:
+            self.finish_reading(error)
+            return
+        self.read_next_chunk()
+
+    def read_next_chunk(self):
+        self.stream.read_bytes_async(self.CHUNK_SIZE, GLib.PRIORITY_DEFAULT, self.cancellable, self.on_chunk_ready)
+
+    def on_chunk_ready(self, stream, result):
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as error:
+            self.finish_reading(error)
+            return
+        if not data:
+            self.finish_reading(None)
+            return
+        self.offset += len(data)
+        self.tail = (self.tail + data)[-self.TAIL_SIZE:]
+        newline = self.text_format.newline
+        try:
+            text = self.pending + self.decoder.decode(data)
+        except UnicodeDecodeError:
+            self.finish_reading(None, changed=True)
+            return
+        self.pending = ""
+        if text.endswith("\r") and newline == "\r\n":
+            text, self.pending = text[:-1], "\r"
+        if newline is not None and not is_consistent(text, newline):
+            self.finish_reading(None, changed=True)
+            return
+        if text:
+            self.on_appended(self, to_buffer(text, newline))
+        if not self.cancellable.is_cancelled():
+            self.read_next_chunk()
+
+    def finish_reading(self, error, changed=False):
+        if self.stream:
+            self.stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            self.stream = None
+        self.reading = False
+        if self.cancellable.is_cancelled():
+            return
+        if error is not None or changed:
+            self.on_changed(self, False)
+        elif self.recheck:
+            self.check()
@@ -0,0 +1,199 @@
+import fnmatch
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+IGNORED_DIRS = {".git", ".hg", ".svn", ".bzr", "node_modules", "__pycache__", ".venv", ".tox", ".mypy_cache"}
+
+
+def compile_bytes_pattern(text, regex=False, case_sensitive=False):
+    """Compile what the user typed to search file contents with, raising re.error if it's not a valid regular expression."""
+    pattern = text.encode("utf-8")
+    flags = 0 if case_sensitive else re.IGNORECASE
+    return re.compile(pattern if regex else re.escape(pattern), flags | re.MULTILINE)
+
+
+def read_ignore_file(directory):
+    """Return the patterns of directory's .gitignore as (pattern, anchored, directories_only)."""
+    try:
+        with open(os.path.join(directory, ".gitignore"), encoding="utf-8", errors="replace") as ignore_file:
+            lines = ignore_file.read().splitlines()
+    except OSError:
+        return []
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        # negations would need every earlier pattern to be kept around: not worth it here
+        if not line or line.startswith(("#", "!")):
+            continue
+        directories_only = line.endswith("/")
+        line = line.strip("/")
+        if line:
+            patterns.append((line, "/" in line, directories_only))
+    return patterns
+
+
+def is_ignored(relative_path, name, is_dir, rules):
+    """Whether a .gitignore rule, as (base, patterns), applies to the entry at relative_path."""
+    for base, patterns in rules:
+        below = relative_path[len(base) + 1:] if base else relative_path
+        for pattern, anchored, directories_only in patterns:
+            if directories_only and not is_dir:
+                continue
+            if fnmatch.fnmatchcase(below if anchored else name, pattern):
+                return True
+    return False
+
+
+class FolderSearch:
+    """
+    Search the files under a folder for a pattern, on a pool of worker threads.
+
+    Directories are walked with os.scandir on a thread of their own, leaving
+    out IGNORED_DIRS and what .gitignore files ignore, and each file is
+    handed to the pool: small ones are read whole, ones of MMAP_SIZE or
+    more mapped, and a file with a NUL byte in its first BINARY_CHECK_SIZE
+    bytes is taken for binary and skipped. The pattern is a bytes pattern
+    (see compile_bytes_pattern), so files are searched without decoding.
+
+    The matches of each file are passed to on_results(matches) as soon as
+    it's been searched, as (path, line, text) with 0-based lines, from the
+    worker threads; on_finished(search) is called once every file has been
+    searched, the search was cancelled or MAX_MATCHES were found. Nothing
+    here depends on GTK, so the search can be benchmarked headlessly.
+    """
+
+    MMAP_SIZE = 1024 * 1024
+    BINARY_CHECK_SIZE = 8192
+    MAX_MATCHES = 10000
+    MAX_LINE_LENGTH = 300  # characters of a matching line kept for the results
+    QUEUED_FILES = 64  # per worker, so walking doesn't run ahead of searching without bound
+
+    def __init__(self, root, pattern, on_results, on_finished=None, workers=None):
+        self.root = root
+        self.pattern = pattern
+        self.on_results = on_results
+        self.on_finished = on_finished
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.files_searched = 0
+        self.files_skipped = 0  # binary or unreadable
+        self.match_count = 0
+        self.truncated = False  # stopped at MAX_MATCHES
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set() and not self.truncated
+
+    def run(self):
+        slots = threading.BoundedSemaphore(self.workers * self.QUEUED_FILES)
+        with ThreadPoolExecutor(self.workers) as pool:
+            for path in self.walk():
+                if self.cancel_event.is_set():
+                    break
+                slots.acquire()
+                future = pool.submit(self.search_file, path)
+                future.add_done_callback(lambda future: slots.release())
+        if self.on_finished:
+            self.on_finished(self)
+
+    def walk(self):
+        """Yield the paths of the files to search, depth first."""
+        stack = [("", [])]
+        while stack and not self.cancel_event.is_set():
+            relative_dir, rules = stack.pop()
+            directory = os.path.join(self.root, relative_dir)
+            patterns = read_ignore_file(directory)
+            if patterns:
+                rules = rules + [(relative_dir, patterns)]
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            subdirectories = []
+            for entry in entries:
+                relative_path = os.path.join(relative_dir, entry.name) if relative_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = entry.is_file(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir and entry.name in IGNORED_DIRS:
+                    continue
+                if rules and is_ignored(relative_path, entry.name, is_dir, rules):
+                    continue
+                if is_dir:
+                    subdirectories.append((relative_path, rules))
+                elif is_file:
+                    yield entry.path
+            stack.extend(reversed(subdirectories))
+
+    def search_file(self, path):
+        if self.cancel_event.is_set():
+            return
+        try:
+            with open(path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if b"\0" in file.read(self.BINARY_CHECK_SIZE):
+                    self.count(skipped=True)
+                    return
+                if size >= self.MMAP_SIZE:
+                    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        matches = self.find(path, data)
+                else:
+                    file.seek(0)
+                    matches = self.find(path, file.read())
+        except (OSError, ValueError):
+            self.count(skipped=True)
+            return
+        if matches:
+            self.on_results(matches)
+
+    def find(self, path, data):
+        matches = []
+        line = 0
+        counted_to = 0
+        last_line_start = -1
+        for match in self.pattern.finditer(data):
+            if self.cancel_event.is_set():
+                break
+            start = match.start()
+            line += data[counted_to:start].count(b"\n")  # mmap has no count()
+            counted_to = start
+            line_start = data.rfind(b"\n", 0, start) + 1
+            if line_start == last_line_start:
+                continue  # one result per line
+            last_line_start = line_start
+            line_end = data.find(b"\n", start)
+            if line_end < 0:
+                line_end = len(data)
+            line_end = min(line_end, line_start + self.MAX_LINE_LENGTH * 4)
+            text = bytes(data[line_start:line_end]).decode("utf-8", "replace").rstrip("\r")
+            matches.append((path, line, text[:self.MAX_LINE_LENGTH]))
+        return self.count(matches=matches)
+
+    def count(self, matches=None, skipped=False):
+        """Add a file's results to the totals; returns the matches there's still room for."""
+        with self.lock:
+            if skipped:
+                self.files_skipped += 1
+                return None
+            self.files_searched += 1
+            room = self.MAX_MATCHES - self.match_count
+            if len(matches) > room:
+                matches = matches[:room]
+                if not self.truncated:
+                    self.truncated = True
+                    self.cancel_event.set()
+            self.match_count += len(matches)
+            return matches
@@ -0,0 +1,210 @@
+import os
+import re
+import threading
+from functools import partial
+
+from gi.repository import Gtk, Gio, GLib, GObject, Pango
+
+from folder_search import FolderSearch, compile_bytes_pattern
+
+
+class FolderMatch(GObject.Object):
+    __gtype_name__ = "FolderMatch"
+
+    def __init__(self, path, line, text):
+        super().__init__()
+        self.path = path
+        self.line = line
+        self.text = text
+
+
+class FolderSearchPanel(Gtk.Box):
+    """
+    Find in Folder: a side panel listing the lines of the files under a folder that match a search.
+
+    The FolderSearch runs on worker threads; the matches they find are
+    collected under a lock and added to the list once per main loop
+    iteration, so they show up as they're found without flooding the main
+    loop. Activating a match calls on_activate(file, line).
+    """
+
+    def __init__(self, on_activate, on_close):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        self.on_activate = on_activate
+        self.folder = os.getcwd()
+        self.results_folder = self.folder  # the one the listed matches were found in
+        self.search = None
+        self.generation = 0  # bumped by every search, to drop the results of older ones
+        self.lock = threading.Lock()
+        self.pending = []  # matches found but not listed yet
+        self.flush_id = 0
+        self.set_size_request(320, -1)
+        self.set_margin_start(6)
+        self.set_margin_end(6)
+        self.set_margin_top(6)
+        self.set_margin_bottom(6)
+
+        folder_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.folder_button = Gtk.Button()
+        self.folder_button.set_hexpand(True)
+        self.folder_button.connect("clicked", self.on_folder_clicked)
+        folder_box.append(self.folder_button)
+        close_button = Gtk.Button.new_from_icon_name("window-close-symbolic")
+        close_button.set_tooltip_text("Close")
+        close_button.connect("clicked", lambda button: on_close())
+        folder_box.append(close_button)
+        self.append(folder_box)
+
+        find_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_hexpand(True)
+        self.search_entry.set_placeholder_text("Find in Folder")
+        self.search_entry.connect("activate", self.on_search_activated)
+        find_box.append(self.search_entry)
+        self.regex_button = Gtk.ToggleButton(label=".*")
+        self.regex_button.set_tooltip_text("Regular Expression")
+        find_box.append(self.regex_button)
+        self.case_button = Gtk.ToggleButton(label="Aa")
+        self.case_button.set_tooltip_text("Match Case")
+        find_box.append(self.case_button)
+        self.append(find_box)
+
+        status_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.status_label = Gtk.Label(xalign=0)
+        self.status_label.set_hexpand(True)
+        self.status_label.add_css_class("dim-label")
+        status_box.append(self.status_label)
+        self.stop_button = Gtk.Button.new_from_icon_name("process-stop-symbolic")
+        self.stop_button.set_tooltip_text("Stop")
+        self.stop_button.set_sensitive(False)
+        self.stop_button.connect("clicked", lambda button: self.cancel())
+        status_box.append(self.stop_button)
+        self.append(status_box)
+
+        self.store = Gio.ListStore(item_type=FolderMatch)
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_setup_item)
+        factory.connect("bind", self.on_bind_item)
+        self.list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.store), factory=factory)
+        self.list_view.set_single_click_activate(True)
+        self.list_view.connect("activate", self.on_item_activated)
+        scrolled_window = Gtk.ScrolledWindow()
+        scrolled_window.set_vexpand(True)
+        scrolled_window.set_child(self.list_view)
+        self.append(scrolled_window)
+        self.set_folder(self.folder)
+
+    def set_folder(self, folder):
+        self.folder = folder
+        self.folder_button.set_label(os.path.basename(folder) or folder)
+        self.folder_button.set_tooltip_text(folder)
+
+    def focus_entry(self):
+        self.search_entry.grab_focus()
+
+    def on_folder_clicked(self, button):
+        dialog = Gtk.FileDialog.new()
+        dialog.set_title("Find in Folder")
+        dialog.set_initial_folder(Gio.File.new_for_path(self.folder))
+        dialog.select_folder(self.get_root(), None, self.on_folder_dialog_response)
+
+    def on_folder_dialog_response(self, dialog, result):
+        try:
+            folder = dialog.select_folder_finish(result)
+        except GLib.Error:
+            return  # dismissed
+        if folder and folder.get_path():
+            self.set_folder(folder.get_path())
+            if self.search_entry.get_text():
+                self.start()
+
+    def on_search_activated(self, entry):
+        self.start()
+
+    def start(self):
+        self.cancel()
+        self.store.remove_all()
+        text = self.search_entry.get_text()
+        if not text:
+            self.status_label.set_text("")
+            return
+        try:
+            pattern = compile_bytes_pattern(text, self.regex_button.get_active(), self.case_button.get_active())
+        except re.error as e:
+            self.status_label.set_text(f"Invalid regular expression: {e}")
+            return
+        self.results_folder = self.folder
+        with self.lock:
+            self.generation += 1
+        self.search = FolderSearch(self.folder, pattern, partial(self.on_results, self.generation), self.on_finished)
+        self.status_label.set_text("Searching…")
+        self.stop_button.set_sensitive(True)
+        self.search.start()
+
+    def cancel(self):
+        if self.search:
+            self.search.cancel()
+            self.search = None
+            self.stop_button.set_sensitive(False)
+            self.status_label.set_text("Stopped")
+        with self.lock:
+            self.generation += 1
+            self.pending = []
+
+    def on_results(self, generation, matches):
+        # on a worker thread
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.pending.extend(matches)
+            if self.flush_id:
+                return
+            self.flush_id = GLib.idle_add(self.flush)
+
+    def flush(self):
+        with self.lock:
+            matches, self.pending = self.pending, []
+            self.flush_id = 0
+        if self.search:
+            self.store.splice(self.store.get_n_items(), 0,
+                              [FolderMatch(path, line, text) for path, line, text in matches])
+            self.update_status()
+        return GLib.SOURCE_REMOVE
+
+    def on_finished(self, search):
+        # on the walking thread, once the last file has been searched
+        GLib.idle_add(self.on_search_finished, search)
+
+    def on_search_finished(self, search):
+        if search is not self.search:
+            return GLib.SOURCE_REMOVE
+        self.flush()
+        self.search = None
+        self.stop_button.set_sensitive(False)
+        self.update_status(search)
+        return GLib.SOURCE_REMOVE
+
+    def update_status(self, finished=None):
+        search = finished or self.search
+        count = self.store.get_n_items()
+        text = f"{count:,} match" + ("" if count == 1 else "es") + f" in {search.files_searched:,} files"
+        if finished is None:
+            text += "…"
+        elif search.truncated:
+            text = f"First {text}"
+        self.status_label.set_text(text)
+
+    def on_setup_item(self, factory, list_item):
+        label = Gtk.Label(xalign=0)
+        label.set_ellipsize(Pango.EllipsizeMode.END)
+        list_item.set_child(label)
+
+    def on_bind_item(self, factory, list_item):
+        match = list_item.get_item()
+        label = list_item.get_child()
+        label.set_text(f"{os.path.relpath(match.path, self.results_folder)}:{match.line + 1}  {match.text.strip()}")
+        label.set_tooltip_text(match.path)
+
+    def on_item_activated(self, list_view, position):
+        match = self.store.get_item(position)
+        self.on_activate(Gio.File.new_for_path(match.path), match.line)
@@ -0,0 +1,407 @@
+import os
+import re
+import threading
+
+from gi.repository import GLib, Pango
+
+
+TAG_STYLES = {
+    "keyword": {"foreground": "#9141ac", "weight": Pango.Weight.BOLD},
+    "builtin": {"foreground": "#1c71d8"},
+    "function": {"foreground": "#1a5fb4", "weight": Pango.Weight.BOLD},
+    "decorator": {"foreground": "#986a44"},
+    "string": {"foreground": "#26a269"},
+    "number": {"foreground": "#e66100"},
+    "constant": {"foreground": "#c64600", "weight": Pango.Weight.BOLD},
+    "comment": {"foreground": "#77767b", "style": Pango.Style.ITALIC},
+    "key": {"foreground": "#1a5fb4"},
+    "timestamp": {"foreground": "#77767b"},
+    "error": {"foreground": "#e01b24", "weight": Pango.Weight.BOLD},
+    "warning": {"foreground": "#c88800", "weight": Pango.Weight.BOLD},
+    "info": {"foreground": "#2ec27e"},
+    "debug": {"foreground": "#77767b"},
+}
+
+
+class Lexer:
+    """
+    Split text into (start, end, kind) tokens one line at a time.
+
+    A lexer is a regular expression with one named group per kind of token.
+    Lines are lexed in order; lex_line returns the state at the start of the
+    next line too, e.g. that it's inside a string, and lexing can stop early
+    once that state is the same as it was before an edit.
+    """
+
+    name = None
+    extensions = ()
+    pattern = None
+    initial_state = None
+
+    def lex_line(self, line, state):
+        tokens = []
+        for match in self.pattern.finditer(line):
+            kind = match.lastgroup
+            tokens.append((*match.span(kind), kind))
+        return tokens, state
+
+
+class PythonLexer(Lexer):
+    name = "Python"
+    extensions = (".py", ".pyw", ".pyi")
+    pattern = re.compile(r"""
+        (?P<comment>\#.*)
+        | (?P<triple>[rRbBuUfF]{0,2}(?:\'\'\'|\"\"\"))
+        | (?P<string>[rRbBuUfF]{0,2}(?:'(?:[^'\\]|\\.)*'?|"(?:[^"\\]|\\.)*"?))
+        | (?P<decorator>^\s*@[\w.]+)
+        | (?P<name>[^\W\d]\w*)
+        | (?P<number>\b(?:0[xX][0-9a-fA-F_]+|0[oO][0-7_]+|0[bB][01_]+|\d[\d_]*\.?[\d_]*(?:[eE][+-]?\d+)?j?)\b)
+    """, re.VERBOSE)
+    names = dict.fromkeys(("and as assert async await break class continue def del elif else except finally for from "
+                           "global if import in is lambda nonlocal not or pass raise return try while with yield "
+                           "match case").split(), "keyword")
+    names.update(dict.fromkeys("True False None self cls".split(), "constant"))
+    names.update(dict.fromkeys(("abs all any bool bytes dict enumerate filter float getattr hasattr int isinstance "
+                                "len list map max min next object open print range repr reversed set setattr sorted "
+                                "str sum super tuple type zip").split(), "builtin"))
+
+    def lex_line(self, line, state):
+        tokens = []
+        position = 0
+        previous = None
+        if state is not None:
+            # inside a triple-quoted string that started on an earlier line
+            end = self.find_closing(line, 0, state)
+            if end < 0:
+                return [(0, len(line), "string")] if line else [], state
+            tokens.append((0, end, "string"))
+            position = end
+        while True:
+            match = self.pattern.search(line, position)
+            if match is None:
+                return tokens, None
+            kind = match.lastgroup
+            if kind == "triple":
+                delimiter = match.group()[-3:]
+                end = self.find_closing(line, match.end(), delimiter)
+                if end < 0:
+                    tokens.append((match.start(), len(line), "string"))
+                    return tokens, delimiter
+                tokens.append((match.start(), end, "string"))
+                position = end
+                continue
+            if kind == "name":
+                name = match.group()
+                kind = "function" if previous in ("def", "class") else self.names.get(name)
+                previous = name
+                if kind is None:
+                    position = match.end()
+                    continue
+            tokens.append((*match.span(), kind))
+            position = match.end()
+
+    def find_closing(self, line, position, delimiter):
+        """Return the offset just past the closing delimiter, or -1 if the string goes on."""
+        while True:
+            end = line.find(delimiter, position)
+            if end < 0:
+                return -1
+            backslashes = len(line[:end]) - len(line[:end].rstrip("\\"))
+            if backslashes % 2 == 0:
+                return end + 3
+            position = end + 1
+
+
+class JsonLexer(Lexer):
+    name = "JSON"
+    extensions = (".json", ".geojson", ".jsonl", ".ndjson")
+    pattern = re.compile(r"""
+        (?P<key>"(?:[^"\\]|\\.)*"(?=\s*:))
+        | (?P<string>"(?:[^"\\]|\\.)*"?)
+        | (?P<constant>\b(?:true|false|null)\b)
+        | (?P<number>-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b)
+    """, re.VERBOSE)
+
+
+class YamlLexer(Lexer):
+    name = "YAML"
+    extensions = (".yaml", ".yml")
+    pattern = re.compile(r"""
+        (?P<comment>(?:^|(?<=\s))\#.*)
+        | (?P<keyword>^(?:---|\.\.\.)(?=\s|$))
+        | ^\s*(?:-\s+)?(?P<key>[^\s#'"\-][^:#]*?)(?=:(?:\s|$))
+        | (?P<string>'(?:[^']|'')*'?|"(?:[^"\\]|\\.)*"?)
+        | (?P<decorator>[&*][\w-]+|![\w!-]*)
+        | (?P<constant>\b(?:true|false|yes|no|on|off|null|True|False|Yes|No|On|Off|Null|NULL|~)\b)
+        | (?P<number>(?<![\w.-])[-+]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.-]))
+    """, re.VERBOSE)
+
+
+class LogLexer(Lexer):
+    name = "Log"
+    extensions = (".log",)
+    pattern = re.compile(r"""
+        (?P<timestamp>\b\d{4}-\d{2}-\d{2}[T\ ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?
+              |\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b
+              |^[A-Z][a-z]{2}\ [\ \d]\d\ \d{2}:\d{2}:\d{2})
+        | (?P<error>\b(?:FATAL|CRITICAL|ERROR|ERR|SEVERE|Traceback|Exception)\b)
+        | (?P<warning>\b(?:WARNING|WARN)\b)
+        | (?P<info>\b(?:INFO|NOTICE)\b)
+        | (?P<debug>\b(?:DEBUG|TRACE)\b)
+        | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    """, re.VERBOSE)
+
+
+LEXERS = (PythonLexer, JsonLexer, YamlLexer, LogLexer)
+
+
+def lexer_for_file(file):
+    """Return a lexer for the Gio.File going by its name, or None to leave it plain."""
+    if file is None:
+        return None
+    extension = os.path.splitext(file.get_basename() or "")[1].lower()
+    for lexer in LEXERS:
+        if extension in lexer.extensions:
+            return lexer()
+    return None
+
+
+def iter_lines(document, start_line):
+    """Yield the lines of a piece table from start_line on, without their newlines."""
+    pending = ""
+    for chunk in document.iter_chunks(document.line_to_offset(start_line)):
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        yield from lines
+    yield pending
+
+
+class Highlighter:
+    """
+    Syntax highlighting for a text view, lexed on a worker thread.
+
+    The tokens and the lexer state at the start of every line are cached. An
+    edit invalidates the lines it touches, and the worker re-lexes from the
+    first of them until it is past the last and the state it reaches agrees
+    with the cached one again, so typing usually re-lexes a single line.
+    Tags are only applied to the lines in view plus MARGIN lines on either
+    side, and re-applied as the view scrolls.
+    """
+
+    BATCH_SIZE = 2000
+    MARGIN = 100
+
+    def __init__(self, text_view, document):
+        self.text_view = text_view
+        self.buffer = text_view.get_buffer()
+        self.document = document
+        self.lexer = None
+        self.tokens = []  # per line, None until lexed
+        self.states = []  # lexer state at the start of each line
+        self.dirty_start = None  # lines [dirty_start, dirty_end) need lexing
+        self.dirty_end = None
+        self.generation = 0
+        self.lex_id = 0
+        self.tagged = None  # (first, last) lines whose tags are applied
+        self.tag_id = 0
+        self.tags = {kind: self.buffer.create_tag(None, **style) for kind, style in TAG_STYLES.items()}
+        self.buffer.connect("insert-text", self.on_insert_text)
+        self.buffer.connect("delete-range", self.on_delete_range)
+
+    def add_view(self, text_view):
+        """Tag what text_view, another view of the buffer in its scrolled window, shows when it's scrolled."""
+        text_view.get_vadjustment().connect("value-changed", self.on_view_scrolled, text_view)
+
+    def set_view(self, text_view):
+        """Tag the lines text_view shows; tags belong to the buffer, so only one view's lines are tagged."""
+        if text_view is not self.text_view:
+            self.text_view = text_view
+            self.queue_tagging()
+
+    def set_lexer(self, lexer):
+        if lexer is None and self.lexer is None:
+            return
+        if lexer is not None and self.lexer is not None and type(lexer) is type(self.lexer):
+            return
+        self.generation += 1
+        self.lexer = lexer
+        self.untag(0, self.buffer.get_line_count())
+        self.tagged = None
+        if lexer is None:
+            self.tokens, self.states = [], []
+            self.dirty_start = self.dirty_end = None
+            return
+        line_count = self.document.line_count
+        self.tokens = [None] * line_count
+        self.states = [None] * line_count
+        self.states[0] = lexer.initial_state
+        self.dirty_start, self.dirty_end = 0, line_count
+        self.queue_lex()
+
+    def on_insert_text(self, buffer, location, text, length):
+        if self.lexer is None:
+            return
+        line = location.get_line()
+        newlines = text.count("\n")
+        self.tokens[line:line + 1] = [None] * (newlines + 1)
+        if newlines:
+            self.states[line + 1:line + 1] = [None] * newlines
+            self.shift_lines(line, newlines)
+        self.mark_dirty(line, line + newlines + 1)
+
+    def on_delete_range(self, buffer, start, end):
+        if self.lexer is None:
+            return
+        first, last = start.get_line(), end.get_line()
+        self.tokens[first:last + 1] = [None]
+        if last > first:
+            del self.states[first + 1:last + 1]
+            self.shift_lines(first, first - last)
+        self.mark_dirty(first, first + 1)
+
+    def shift_lines(self, line, delta):
+        """Keep line numbers after line pointing at the same text when lines are added or removed."""
+        def shift(n):
+            return n + delta if n > line else n
+        if self.dirty_start is not None:
+            self.dirty_start = max(shift(self.dirty_start), min(self.dirty_start, line))
+            self.dirty_end = max(shift(self.dirty_end), self.dirty_start)
+        if self.tagged:
+            first, last = self.tagged
+            self.tagged = (max(shift(first), min(first, line)), max(shift(last), line))
+
+    def mark_dirty(self, start, end):
+        if self.dirty_start is None:
+            self.dirty_start, self.dirty_end = start, end
+        else:
+            self.dirty_start = min(self.dirty_start, start)
+            self.dirty_end = max(self.dirty_end, end)
+        self.queue_lex()
+
+    def queue_lex(self):
+        self.generation += 1
+        if not self.lex_id:
+            self.lex_id = GLib.idle_add(self.start_lexing)
+
+    def start_lexing(self):
+        self.lex_id = 0
+        if self.lexer is None or self.dirty_start is None:
+            return GLib.SOURCE_REMOVE
+        # copies: the main thread splices the lists on every edit while the worker reads them
+        thread = threading.Thread(target=self.lex_thread,
+                                  args=(self.document.snapshot(),
+                                        self.lexer,
+                                        self.dirty_start,
+                                        self.dirty_end,
+                                        self.states[self.dirty_start],
+                                        self.tokens[self.dirty_end:],
+                                        self.states[self.dirty_end:],
+                                        self.generation),
+                                  daemon=True)
+        thread.start()
+        return GLib.SOURCE_REMOVE
+
+    def lex_thread(self, snapshot, lexer, start, end, state, tokens, states, generation):
+        """Lex from line start on; tokens and states are the cached ones of the lines from end on."""
+        first = start
+        batch_tokens, batch_states = [], []
+        for line_number, line in enumerate(iter_lines(snapshot, start), start):
+            if generation != self.generation:
+                return  # edited meanwhile; the edit queued another run
+            cached = line_number - end
+            if 0 <= cached < len(states) and state == states[cached] and tokens[cached] is not None:
+                break
+            line_tokens, state = lexer.lex_line(line, state)
+            batch_tokens.append(line_tokens)
+            batch_states.append(state)
+            if len(batch_tokens) >= self.BATCH_SIZE:
+                GLib.idle_add(self.on_lexed, generation, first, batch_tokens, batch_states, False)
+                first += len(batch_tokens)
+                batch_tokens, batch_states = [], []
+        GLib.idle_add(self.on_lexed, generation, first, batch_tokens, batch_states, True)
+
+    def on_lexed(self, generation, first, line_tokens, line_states, done):
+        # the lists are only valid for the line numbering they were lexed with
+        if generation != self.generation:
+            return GLib.SOURCE_REMOVE
+        end = first + len(line_tokens)
+        self.tokens[first:end] = line_tokens
+        self.states[first + 1:end + 1] = line_states[:len(self.states) - first - 1]
+        if done:
+            self.dirty_start = self.dirty_end = None
+        else:
+            self.dirty_start = end
+        if self.tagged:
+            visible_first, visible_last = self.tagged
+            if first <= visible_last and end > visible_first:
+                self.tag_lines(max(first, visible_first), min(end - 1, visible_last))
+        else:
+            self.queue_tagging()
+        return GLib.SOURCE_REMOVE
+
+    def on_view_scrolled(self, adjustment, text_view):
+        self.text_view = text_view
+        if self.lexer is not None:
+            self.queue_tagging()
+
+    def queue_tagging(self):
+        if not self.tag_id:
+            self.tag_id = GLib.idle_add(self.update_tags)
+
+    def update_tags(self):
+        """Tag the lines in view and untag the ones that have left it."""
+        self.tag_id = 0
+        if self.lexer is None:
+            return GLib.SOURCE_REMOVE
+        rect = self.text_view.get_visible_rect()
+        _, top = self.text_view.get_iter_at_location(rect.x, rect.y)
+        _, bottom = self.text_view.get_iter_at_location(rect.x, rect.y + rect.height)
+        first = max(0, top.get_line() - self.MARGIN)
+        last = min(bottom.get_line() + self.MARGIN, len(self.tokens) - 1)
+        if self.tagged:
+            old_first, old_last = self.tagged
+            if old_last < first or old_first > last:
+                self.untag(old_first, old_last + 1)
+                self.tag_lines(first, last)
+            else:
+                if old_first < first:
+                    self.untag(old_first, first)
+                if old_last > last:
+                    self.untag(last + 1, old_last + 1)
+                if first < old_first:
+                    self.tag_lines(first, old_first - 1)
+                if last > old_last:
+                    self.tag_lines(old_last + 1, last)
+        else:
+            self.tag_lines(first, last)
+        self.tagged = (first, last)
+        return GLib.SOURCE_REMOVE
+
+    def untag(self, first, end):
+        start_iter = self.line_iter(first)
+        end_iter = self.line_iter(end)
+        for tag in self.tags.values():
+            self.buffer.remove_tag(tag, start_iter, end_iter)
+
+    def line_iter(self, line):
+        if line >= self.buffer.get_line_count():
+            return self.buffer.get_end_iter()
+        return self.buffer.get_iter_at_line(line)[1]
+
+    def tag_lines(self, first, last):
+        """Re-tag lines first to last inclusive."""
+        self.untag(first, last + 1)
+        for line in range(first, min(last + 1, len(self.tokens))):
+            line_tokens = self.tokens[line]
+            if not line_tokens:
+                continue
+            line_start = self.line_iter(line)
+            length = line_start.get_chars_in_line()
+            for start, end, kind in line_tokens:
+                if end > length:
+                    break  # GTK and the lexer disagree about this line, e.g. over a lone \r
+                start_iter = line_start.copy()
+                start_iter.set_line_offset(start)
+                end_iter = line_start.copy()
+                end_iter.set_line_offset(end)
+                self.buffer.apply_tag(self.tags[kind], start_iter, end_iter)
@@ -0,0 +1,233 @@
+import collections
+import json
+import os
+import time
+
+from gi.repository import Gtk, GLib
+
+
+class Instrumentation:
+    """
+    Opt-in timing of texty's hot paths, frames and typing latency, shared by every window.
+
+    Code being timed calls start() and passes what it returns to finish();
+    while instrumentation is off start() returns None and finish() returns
+    at once, so the cost is an attribute check. Each window is attach()ed:
+    its frame clock gives the time each frame took from layout to the end
+    of painting, and a key press the time until the frame that shows it.
+
+    The last SAMPLES durations of each name are kept for the percentiles of
+    the InstrumentationPanel, and every measurement as a trace event, which
+    write_trace() saves in the Trace Event Format that chrome://tracing and
+    Perfetto open. Gauges added with add_gauge() are shown under the
+    percentiles, for what's measured in amounts rather than times. Setting
+    TEXTY_INSTRUMENTATION turns it on at startup; if its value is a path,
+    not "1", the trace is written there on exit.
+    """
+
+    SAMPLES = 500
+    MAX_EVENTS = 200_000
+
+    default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls.default is None:
+            value = os.environ.get("TEXTY_INSTRUMENTATION", "")
+            cls.default = cls(enabled=bool(value), trace_path=value if value not in ("", "0", "1") else None)
+        return cls.default
+
+    def __init__(self, enabled=False, trace_path=None):
+        self.enabled = enabled
+        self.trace_path = trace_path  # written by write_trace() when texty exits
+        self.origin = time.perf_counter_ns()
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=self.SAMPLES))
+        self.events = collections.deque(maxlen=self.MAX_EVENTS)
+        self.gauges = {}  # name: function returning the text to show
+        self.panel = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def start(self):
+        return time.perf_counter_ns() if self.enabled else None
+
+    def finish(self, name, started):
+        if started is None:
+            return
+        self.record(name, started, time.perf_counter_ns())
+
+    def record(self, name, started, finished):
+        self.samples[name].append((finished - started) / 1e6)
+        self.events.append({"name": name,
+                            "ph": "X",
+                            "ts": (started - self.origin) / 1000,
+                            "dur": (finished - started) / 1000,
+                            "pid": os.getpid(),
+                            "tid": 1})
+
+    def add_gauge(self, name, function):
+        self.gauges[name] = function
+
+    def until_next_frame(self, name, widget):
+        """Time from now until widget's next frame has been painted, e.g. the relayout after a change."""
+        started = self.start()
+        frame_clock = widget.get_frame_clock() if started is not None else None
+        if frame_clock is None:
+            return
+        handler = None
+
+        def on_after_paint(frame_clock):
+            frame_clock.disconnect(handler)
+            self.finish(name, started)
+        handler = frame_clock.connect("after-paint", on_after_paint)
+
+    def attach(self, window):
+        state = {"frame": None, "key": None}
+
+        def on_layout(frame_clock):
+            if self.enabled and state["frame"] is None:
+                state["frame"] = time.perf_counter_ns()
+
+        def on_after_paint(frame_clock):
+            finished = time.perf_counter_ns()
+            if state["frame"] is not None:
+                self.record("frame", state["frame"], finished)
+                state["frame"] = None
+            if state["key"] is not None:
+                self.record("keystroke to paint", state["key"], finished)
+                state["key"] = None
+
+        def on_realize(window):
+            frame_clock = window.get_frame_clock()
+            frame_clock.connect("layout", on_layout)
+            frame_clock.connect("paint", on_layout)
+            frame_clock.connect("after-paint", on_after_paint)
+
+        def on_key_pressed(controller, keyval, keycode, modifiers):
+            event = controller.get_current_event()
+            if self.enabled and state["key"] is None and not (event and event.is_modifier()):
+                state["key"] = time.perf_counter_ns()
+            return False
+
+        window.connect("realize", on_realize)
+        key_controller = Gtk.EventControllerKey()
+        key_controller.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        key_controller.connect("key-pressed", on_key_pressed)
+        window.add_controller(key_controller)
+
+    def clear(self):
+        self.samples.clear()
+        self.events.clear()
+
+    def percentiles(self):
+        """Return {name: (count, p50, p95, p99, max)} of the recent samples, in ms."""
+        summary = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+
+            def percentile(p):
+                return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+            summary[name] = (len(ordered), percentile(0.5), percentile(0.95), percentile(0.99), ordered[-1])
+        return summary
+
+    def write_trace(self, path):
+        with open(path, "w", encoding="utf-8") as trace:
+            json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, trace)
+
+    def show_panel(self, parent):
+        if self.panel is None:
+            self.panel = InstrumentationPanel(self)
+        self.panel.set_transient_for(parent)
+        self.panel.present()
+
+    def hide_panel(self):
+        if self.panel:
+            self.panel.set_visible(False)
+
+
+class InstrumentationPanel(Gtk.Window):
+    """Rolling percentiles of the Instrumentation's measurements, refreshed every UPDATE_INTERVAL ms."""
+
+    UPDATE_INTERVAL = 500
+
+    def __init__(self, instrumentation):
+        super().__init__(title="Instrumentation")
+        self.instrumentation = instrumentation
+        self.set_default_size(520, 320)
+        self.set_hide_on_close(True)
+        self.update_id = 0
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        box.set_margin_start(10)
+        box.set_margin_end(10)
+        box.set_margin_top(10)
+        box.set_margin_bottom(10)
+        self.label = Gtk.Label(xalign=0, yalign=0)
+        self.label.add_css_class("monospace")
+        self.label.set_selectable(True)
+        self.label.set_vexpand(True)
+        scrolled_window = Gtk.ScrolledWindow()
+        scrolled_window.set_child(self.label)
+        scrolled_window.set_vexpand(True)
+        box.append(scrolled_window)
+
+        buttons = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        buttons.set_halign(Gtk.Align.END)
+        clear_button = Gtk.Button.new_with_label("Clear")
+        clear_button.connect("clicked", self.on_clear_clicked)
+        buttons.append(clear_button)
+        save_button = Gtk.Button.new_with_label("Save Trace")
+        save_button.connect("clicked", self.on_save_clicked)
+        buttons.append(save_button)
+        box.append(buttons)
+        self.set_child(box)
+
+        self.connect("map", self.on_map)
+        self.connect("unmap", self.on_unmap)
+
+    def on_map(self, window):
+        self.update()
+        if not self.update_id:
+            self.update_id = GLib.timeout_add(self.UPDATE_INTERVAL, self.update)
+
+    def on_unmap(self, window):
+        if self.update_id:
+            GLib.source_remove(self.update_id)
+            self.update_id = 0
+
+    def update(self):
+        lines = [f"{'':24}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  ms"]
+        for name, (count, p50, p95, p99, worst) in sorted(self.instrumentation.percentiles().items()):
+            lines.append(f"{name[:24]:24}{count:>7}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}{worst:>9.2f}")
+        if len(lines) == 1:
+            lines.append("nothing measured yet")
+        if self.instrumentation.gauges:
+            lines.append("")
+        for name, function in sorted(self.instrumentation.gauges.items()):
+            lines.append(f"{name}: {function()}")
+        self.label.set_text("\n".join(lines))
+        return GLib.SOURCE_CONTINUE
+
+    def on_clear_clicked(self, button):
+        self.instrumentation.clear()
+        self.update()
+
+    def on_save_clicked(self, button):
+        dialog = Gtk.FileDialog.new()
+        dialog.set_title("Save Trace")
+        dialog.set_initial_name("texty-trace.json")
+        dialog.save(self, None, self.on_save_dialog_response)
+
+    def on_save_dialog_response(self, dialog, result):
+        try:
+            file = dialog.save_finish(result)
+        except GLib.Error:
+            return  # cancelled
+        try:
+            self.instrumentation.write_trace(file.get_path())
+        except OSError as e:
+            dialog = Gtk.AlertDialog(message="Error saving trace", detail=str(e))
+            dialog.show(self)
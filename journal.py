@@ -0,0 +1,375 @@
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import namedtuple
+
+from gi.repository import Gio, GLib
+
+from compression import decompress_all
+from long_lines import join
+from piece_table import PieceTable
+from text_format import DEFAULT_FORMAT, TextFormat, to_buffer
+
+VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+# what a journal left behind by a crash holds: the text, and the file it was an edited copy of
+RecoveredDocument = namedtuple("RecoveredDocument", "file text_format text journal_path")
+
+
+def get_journal_dir():
+    return os.path.join(GLib.get_user_cache_dir(), "texty", "recovery")
+
+
+def ensure_journal_dir():
+    os.makedirs(get_journal_dir(), exist_ok=True)
+
+
+class JournalWriter:
+    """
+    The thread that does the file I/O of every Journal of the process.
+
+    Work is queued as (function, args) and done in order, so a compaction
+    queued after some records only happens once they have been written.
+    A failure is logged and passed to the on_error(error) given with the
+    work, on the main loop; close() does what's queued before exiting.
+    """
+
+    default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls.default is None:
+            cls.default = cls()
+        return cls.default
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="journal-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, function, *args, on_error=None):
+        self.queue.put((function, args, on_error))
+
+    def close(self):
+        """Wait for the work queued so far, such as deleting the journals of closed documents, to be done."""
+        self.queue.put(None)
+        self.thread.join()
+        JournalWriter.default = None
+
+    def run(self):
+        while True:
+            work = self.queue.get()
+            if work is None:
+                return
+            function, args, on_error = work
+            try:
+                function(*args)
+            except OSError as e:
+                # losing crash recovery is no reason to stop editing, but it's worth knowing
+                logger.warning("journal: %s", e)
+                if on_error:
+                    GLib.idle_add(on_error, e)
+
+
+def write_records(path, header, records):
+    """Append records, and the header first if the journal is new."""
+    ensure_journal_dir()
+    lines = [] if header is None else [json.dumps(header)]
+    lines.extend(json.dumps(record, ensure_ascii=False) for record in records)
+    with open(path, "a", encoding="utf-8") as journal:
+        journal.write("\n".join(lines) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+
+def write_snapshot(path, header, snapshot, snapshot_path, old_snapshot_path):
+    """Replace the journal with a snapshot of the document and a journal with no records yet."""
+    ensure_journal_dir()
+    with open(snapshot_path + ".tmp", "w", encoding="utf-8", newline="") as file:
+        for chunk in snapshot.iter_chunks(chunk_size=1024 * 1024):
+            file.write(chunk)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+    with open(path + ".tmp", "w", encoding="utf-8") as journal:
+        journal.write(json.dumps(header) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+    # until this rename the old journal, which doesn't refer to the new snapshot, is the valid one
+    os.replace(path + ".tmp", path)
+    remove_files(old_snapshot_path)
+
+
+def remove_files(*paths):
+    for path in paths:
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class Journal:
+    """
+    Crash recovery for a PieceTable: an append-only log of its edits since it was last saved.
+
+    The log is a JSON header line followed by one line per edit, ["i", offset,
+    text] or ["d", start, end], replayed on top of the file the document was
+    loaded from or saved to, of which the header records the path, size and
+    modification time. Edits are collected from the buffer signals, where
+    typing merges into the previous record, and handed to the JournalWriter
+    thread once FLUSH_DELAY ms have passed. Once COMPACT_SIZE characters have
+    been logged, the document is written out as a snapshot instead, and the
+    edits after it are replayed on top of that. So is a document with display
+    splits, whose offsets aren't those of the file, on the first flush.
+
+    No file exists until the first edit; saving or closing deletes it. If
+    writing fails, on_error(error), when set, is called the first time.
+    """
+
+    FLUSH_DELAY = 1000
+    COMPACT_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, document):
+        self.document = document
+        self.writer = JournalWriter.get_default()
+        self.active = False  # whether edits are being logged
+        self.id = None  # names the journal file, once there is one
+        self.header = None
+        self.header_written = False
+        self.snapshot_path = None
+        self.records = []
+        self.logged_size = 0
+        self.flush_id = 0
+        self.splits = False
+        self.on_error = None
+        self.failed = False  # a write has failed since the last reset()
+
+    @property
+    def path(self):
+        return os.path.join(get_journal_dir(), f"{self.id}.journal")
+
+    def attach(self, buffer):
+        buffer.connect("insert-text", self.on_insert_text)
+        buffer.connect("delete-range", self.on_delete_range)
+
+    def suspend(self):
+        """Stop logging, e.g. while a file is loading, and forget what was logged."""
+        self.discard()
+        self.active = False
+
+    def reset(self, file=None, text_format=DEFAULT_FORMAT, splits=False):
+        """
+        Start a new log; the document must equal the contents of file, or be empty if it's None.
+
+        splits tells that the document has display splits besides, see LineSplitter.
+        """
+        self.discard()
+        self.active = True
+        self.failed = False
+        self.splits = splits
+        path = file.get_path() if file else None
+        size = mtime = None
+        if path:
+            try:
+                stat = os.stat(path)
+                size, mtime = stat.st_size, stat.st_mtime_ns
+            except OSError:
+                pass
+        self.header = {"texty-journal": VERSION,
+                       "pid": os.getpid(),
+                       "path": path,
+                       "size": size,
+                       "mtime": mtime,
+                       "encoding": text_format.encoding,
+                       "bom": text_format.bom.hex(),
+                       "newline": text_format.newline,
+                       "compression": text_format.compression,
+                       "base": "file" if path else "empty",
+                       "splits": splits}
+
+    def rebase(self):
+        """Log the whole document now, because it no longer matches the file the log is based on."""
+        if not self.active:
+            return
+        if self.id is None:
+            self.id = uuid.uuid4().hex
+        self.compact()
+
+    def discard(self):
+        if self.flush_id:
+            GLib.source_remove(self.flush_id)
+            self.flush_id = 0
+        if self.id is not None:
+            self.writer.submit(remove_files, self.path, self.snapshot_path)
+        self.id = None
+        self.header_written = False
+        self.snapshot_path = None
+        self.records = []
+        self.logged_size = 0
+
+    def on_insert_text(self, buffer, location, text, length):
+        if not self.active:
+            return
+        offset = location.get_offset()
+        last = self.records[-1] if self.records else None
+        if last and last[0] == "i" and last[1] + len(last[2]) == offset:
+            last[2] += text
+        else:
+            self.records.append(["i", offset, text])
+        self.logged(len(text))
+
+    def on_delete_range(self, buffer, start, end):
+        if not self.active:
+            return
+        start, end = start.get_offset(), end.get_offset()
+        last = self.records[-1] if self.records else None
+        if last and last[0] == "d" and last[1] == end:
+            last[1] = start  # backspacing
+        elif last and last[0] == "d" and last[1] == start:
+            last[2] += end - start  # deleting forwards
+        else:
+            self.records.append(["d", start, end])
+        self.logged(16)
+
+    def logged(self, size):
+        self.logged_size += size
+        if not self.flush_id:
+            self.flush_id = GLib.timeout_add(self.FLUSH_DELAY, self.on_flush_timeout)
+
+    def on_flush_timeout(self):
+        self.flush_id = 0
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        """Hand the edits logged so far to the writer thread."""
+        if self.flush_id:
+            GLib.source_remove(self.flush_id)
+            self.flush_id = 0
+        if not self.active or not self.records:
+            return
+        if self.id is None:
+            self.id = uuid.uuid4().hex
+        if self.logged_size > self.COMPACT_SIZE or (self.splits and not self.header_written):
+            self.compact()
+            return
+        records, self.records = self.records, []
+        self.writer.submit(write_records, self.path, None if self.header_written else self.header, records,
+                           on_error=self.on_write_error)
+        self.header_written = True
+
+    def compact(self):
+        self.records = []
+        self.logged_size = 0
+        old_snapshot_path = self.snapshot_path
+        # a new name each time, so the old journal stays valid until it's replaced
+        self.snapshot_path = os.path.join(get_journal_dir(), f"{self.id}.{uuid.uuid4().hex[:8]}.snapshot")
+        self.header = dict(self.header, base="snapshot", snapshot=os.path.basename(self.snapshot_path))
+        self.writer.submit(write_snapshot,
+                           self.path,
+                           self.header,
+                           self.document.snapshot(),
+                           self.snapshot_path,
+                           old_snapshot_path,
+                           on_error=self.on_write_error)
+        self.header_written = True
+
+    def on_write_error(self, error):
+        if not self.failed:
+            self.failed = True
+            if self.on_error:
+                self.on_error(error)
+        return GLib.SOURCE_REMOVE
+
+
+def is_running(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def find_orphaned_journals():
+    """Return the journals whose texty is no longer running: the ones a crash left behind."""
+    ensure_journal_dir()
+    journals = []
+    for name in os.listdir(get_journal_dir()):
+        if not name.endswith(".journal"):
+            continue
+        path = os.path.join(get_journal_dir(), name)
+        try:
+            with open(path, encoding="utf-8") as journal:
+                header = json.loads(journal.readline())
+        except (OSError, ValueError):
+            continue
+        if header.get("texty-journal") == VERSION and not is_running(header.get("pid", 0)):
+            journals.append(path)
+    return journals
+
+
+def read_journal(path):
+    """
+    Replay a journal, returning a RecoveredDocument.
+
+    Raises OSError if the journal can't be read, and ValueError if it can't be
+    replayed, e.g. because the file it's based on has changed since.
+    """
+    with open(path, encoding="utf-8") as journal:
+        lines = journal.read().split("\n")
+    header = json.loads(lines[0])
+    text_format = TextFormat(header["encoding"], bytes.fromhex(header["bom"]), header["newline"],
+                             header.get("compression"))
+    if header["base"] == "snapshot":
+        snapshot_path = os.path.join(os.path.dirname(path), header["snapshot"])
+        with open(snapshot_path, encoding="utf-8", newline="") as snapshot:
+            text = snapshot.read()
+    elif header["base"] == "file":
+        stat = os.stat(header["path"])
+        if stat.st_size != header["size"] or stat.st_mtime_ns != header["mtime"]:
+            raise ValueError(f"{header['path']} has changed since")
+        with open(header["path"], "rb") as file:
+            data = file.read()
+        if text_format.compression:
+            data = decompress_all(data, text_format.compression)
+        text = to_buffer(data[len(text_format.bom):].decode(text_format.encoding), text_format.newline)
+    else:
+        text = ""
+    document = PieceTable(text)
+    for line in lines[1:]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break  # the last line may have been cut short by the crash
+        if record[0] == "i":
+            document.insert(record[1], record[2])
+        else:
+            document.delete(record[1], record[2])
+    file = Gio.File.new_for_path(header["path"]) if header["path"] else None
+    text = document.get_text()
+    if header.get("splits"):
+        text = join(text)
+    return RecoveredDocument(file, text_format, text, path)
+
+
+def discard_journal(path):
+    """Delete a journal left behind by a crash, and its snapshot."""
+    snapshot_path = None
+    try:
+        with open(path, encoding="utf-8") as journal:
+            header = json.loads(journal.readline())
+        if header.get("snapshot"):
+            snapshot_path = os.path.join(os.path.dirname(path), header["snapshot"])
+    except (OSError, ValueError):
+        pass
+    remove_files(path, snapshot_path)
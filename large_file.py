@@ -0,0 +1,252 @@
+import mmap
+import threading
+from array import array
+from bisect import bisect_right
+
+from gi.repository import Gtk, Gdk, GLib, Pango
+
+from text_format import SAMPLE_SIZE, detect_encoding
+
+
+class MappedFile:
+    """
+    A read-only, memory-mapped file addressed by byte offsets and lines.
+
+    Nothing is read up front: lines are found with mmap.find/rfind around the
+    offset being displayed. A sparse line index, one checkpoint per
+    INDEX_BLOCK bytes, is built on a worker thread so that jumping to a line
+    number only has to scan forward from the nearest checkpoint.
+
+    The encoding is guessed from the start of the file as when loading it,
+    and lines end at its encoding of "\n": two or four bytes in UTF-16 and
+    UTF-32, at offsets aligned to those code units.
+    """
+
+    INDEX_BLOCK = 64 * 1024
+    MAX_LINE_CHARS = 4096  # longer lines are cut short when displayed
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.mm)
+        self.encoding, self.bom = detect_encoding(self.mm[:SAMPLE_SIZE])
+        self.newline = "\n".encode(self.encoding)
+        # checkpoint k: line number check_lines[k] starts at byte check_offsets[k]
+        self.check_lines = array("Q", [0])
+        self.check_offsets = array("Q", [0])
+        self.line_count = None  # known once the index is complete
+        self.stop_event = threading.Event()
+        self.index_thread = None
+
+    def start_indexing(self, on_indexed=None):
+        """Build the line index in the background, calling on_indexed() on the main loop when done."""
+        self.index_thread = threading.Thread(target=self.build_index, args=(on_indexed,), daemon=True)
+        self.index_thread.start()
+
+    def build_index(self, on_indexed):
+        lines = 0
+        try:
+            for start in range(0, self.size, self.INDEX_BLOCK):
+                if self.stop_event.is_set():
+                    return
+                end = min(start + self.INDEX_BLOCK, self.size)
+                newline = self.find_newline(start, end)
+                if newline != -1 and newline + len(self.newline) < self.size:
+                    # offsets first: readers bisect check_lines and then index check_offsets
+                    self.check_offsets.append(newline + len(self.newline))
+                    self.check_lines.append(lines + 1)
+                lines += self.count_newlines(start, end)
+        except ValueError:
+            return  # unmapped while indexing
+        if self.size and self.mm[self.size - len(self.newline):] != self.newline:
+            lines += 1
+        self.line_count = max(lines, 1)
+        if on_indexed:
+            GLib.idle_add(on_indexed)
+
+    def close(self):
+        self.stop_event.set()
+        if self.index_thread:
+            self.index_thread.join()
+        self.mm.close()
+
+    def is_aligned(self, offset):
+        return (offset - len(self.bom)) % len(self.newline) == 0
+
+    def find_newline(self, start, end=None):
+        """Return the offset of the first newline from start on, or -1."""
+        end = self.size if end is None else end
+        newline = self.mm.find(self.newline, start, end)
+        while newline != -1 and not self.is_aligned(newline):
+            newline = self.mm.find(self.newline, newline + 1, end)
+        return newline
+
+    def count_newlines(self, start, end):
+        # INDEX_BLOCK and the BOMs are multiples of a code unit, so a newline
+        # is never cut in two by a block; a misaligned match, like the bytes of
+        # U+0A00 in UTF-16, is rare enough to be left miscounted
+        return self.mm[start:end].count(self.newline)
+
+    def line_start(self, offset):
+        """Return the offset of the start of the line containing offset."""
+        newline = self.mm.rfind(self.newline, 0, offset)
+        while newline != -1 and not self.is_aligned(newline):
+            newline = self.mm.rfind(self.newline, 0, newline + len(self.newline) - 1)
+        return 0 if newline == -1 else newline + len(self.newline)
+
+    def next_line_start(self, offset):
+        newline = self.find_newline(offset)
+        return self.size if newline == -1 else newline + len(self.newline)
+
+    def previous_line_start(self, offset):
+        if offset == 0:
+            return 0
+        return self.line_start(offset - 1)
+
+    def offset_of_line(self, line):
+        """Return the offset of a 0-based line, or None if the index hasn't reached it yet."""
+        k = bisect_right(self.check_lines, line) - 1
+        if k == len(self.check_lines) - 1 and self.line_count is None and line != self.check_lines[k]:
+            return None
+        offset = self.check_offsets[k]
+        for _ in range(line - self.check_lines[k]):
+            if offset >= self.size:
+                break
+            offset = self.next_line_start(offset)
+        return offset
+
+    def line_of_offset(self, offset):
+        """Return the 0-based line containing offset, or None if the index hasn't reached it yet."""
+        k = min(bisect_right(self.check_offsets, offset), len(self.check_lines)) - 1
+        if k == len(self.check_lines) - 1 and self.line_count is None and offset != self.check_offsets[k]:
+            return None
+        return self.check_lines[k] + self.count_newlines(self.check_offsets[k], offset)
+
+    def read_lines(self, offset, count):
+        """Return up to count lines starting at offset, decoded for display."""
+        lines = []
+        while count > 0 and offset < self.size:
+            end = self.next_line_start(offset)
+            line = self.mm[max(offset, len(self.bom)):min(end, offset + self.MAX_LINE_CHARS)]
+            lines.append(line.decode(self.encoding, errors="replace").rstrip("\r\n"))
+            offset = end
+            count -= 1
+        return "\n".join(lines)
+
+
+class LargeFileView(Gtk.Box):
+    """
+    A read-only viewer showing only the lines of a MappedFile that fit on screen.
+
+    The scrollbar spans the file's bytes; dragging it, scrolling or using the
+    navigation keys moves the first visible line and re-reads just the page of
+    lines that is then visible.
+    """
+
+    SCROLL_LINES = 3
+
+    def __init__(self, mapped_file):
+        super().__init__(orientation=Gtk.Orientation.HORIZONTAL)
+        self.mapped_file = mapped_file
+        self.top = 0  # byte offset of the first visible line
+        self.visible_lines = 50
+
+        self.text_view = Gtk.TextView.new()
+        self.text_view.set_editable(False)
+        self.text_view.set_cursor_visible(False)
+        self.text_view.set_wrap_mode(Gtk.WrapMode.NONE)
+        self.text_view.set_hexpand(True)
+        self.text_view.set_vexpand(True)
+        self.text_view.set_left_margin(10)
+        self.text_view.set_right_margin(10)
+        self.text_view.set_top_margin(10)
+        self.text_view.set_bottom_margin(10)
+        self.append(self.text_view)
+
+        self.adjustment = Gtk.Adjustment.new(0, 0, max(mapped_file.size, 1), 1, 1, 1)
+        self.adjustment_handler = self.adjustment.connect("value-changed", self.on_adjustment_value_changed)
+        scrollbar = Gtk.Scrollbar.new(Gtk.Orientation.VERTICAL, self.adjustment)
+        self.append(scrollbar)
+
+        scroll_controller = Gtk.EventControllerScroll.new(Gtk.EventControllerScrollFlags.VERTICAL)
+        scroll_controller.connect("scroll", self.on_scroll)
+        self.text_view.add_controller(scroll_controller)
+
+        key_controller = Gtk.EventControllerKey.new()
+        key_controller.connect("key-pressed", self.on_key_pressed)
+        self.text_view.add_controller(key_controller)
+
+        self.render()
+
+    def do_size_allocate(self, width, height, baseline):
+        Gtk.Box.do_size_allocate(self, width, height, baseline)
+        metrics = self.text_view.get_pango_context().get_metrics(None, None)
+        line_height = max(metrics.get_height() / Pango.SCALE, 1)
+        visible_lines = max(int(height / line_height), 1)
+        if visible_lines != self.visible_lines:
+            self.visible_lines = visible_lines
+            # never touch the buffer in the middle of allocation
+            GLib.idle_add(self.render)
+
+    def render(self):
+        text = self.mapped_file.read_lines(self.top, self.visible_lines)
+        self.text_view.get_buffer().set_text(text)
+        with self.adjustment.handler_block(self.adjustment_handler):
+            self.adjustment.set_value(self.top)
+        return GLib.SOURCE_REMOVE
+
+    def scroll_to_offset(self, offset):
+        self.top = self.mapped_file.line_start(min(max(offset, 0), self.mapped_file.size))
+        self.render()
+
+    def scroll_lines(self, count):
+        offset = self.top
+        for _ in range(abs(count)):
+            if count > 0:
+                next_offset = self.mapped_file.next_line_start(offset)
+                if next_offset >= self.mapped_file.size:
+                    break
+                offset = next_offset
+            else:
+                offset = self.mapped_file.previous_line_start(offset)
+        if offset != self.top:
+            self.top = offset
+            self.render()
+
+    def goto_line(self, line):
+        """Show the 0-based line at the top of the view, returning False if it isn't indexed yet."""
+        offset = self.mapped_file.offset_of_line(line)
+        if offset is None:
+            return False
+        self.scroll_to_offset(offset)
+        return True
+
+    def on_adjustment_value_changed(self, adjustment):
+        self.scroll_to_offset(int(adjustment.get_value()))
+
+    def on_scroll(self, controller, dx, dy):
+        self.scroll_lines(round(dy * self.SCROLL_LINES))
+        return True
+
+    def on_key_pressed(self, controller, keyval, keycode, state):
+        ctrl = state & Gdk.ModifierType.CONTROL_MASK
+        if keyval == Gdk.KEY_Down:
+            self.scroll_lines(1)
+        elif keyval == Gdk.KEY_Up:
+            self.scroll_lines(-1)
+        elif keyval == Gdk.KEY_Page_Down:
+            self.scroll_lines(self.visible_lines - 1)
+        elif keyval == Gdk.KEY_Page_Up:
+            self.scroll_lines(-(self.visible_lines - 1))
+        elif keyval == Gdk.KEY_Home and ctrl:
+            self.scroll_to_offset(0)
+        elif keyval == Gdk.KEY_End and ctrl:
+            self.scroll_to_offset(self.mapped_file.size)
+            self.scroll_lines(-(self.visible_lines - 1))
+        else:
+            return False
+        return True
+
+    def close(self):
+        self.mapped_file.close()
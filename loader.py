@@ -0,0 +1,215 @@
+import codecs
+
+from gi.repository import Gio, GLib
+
+from compression import Decompressor, detect_compression
+from long_lines import SPLIT, LineSplitter
+from text_format import TextFormat, detect_encoding, detect_newline, is_consistent, to_buffer
+
+
+# what to decode with instead when a guessed encoding turns out wrong further into the file
+FALLBACK_ENCODINGS = {"utf-8": "cp1252", "cp1252": "latin-1"}
+
+
+class FileLoader:
+    """
+    Load a Gio.File into a Gtk.TextBuffer without blocking the main loop.
+
+    The file is read in CHUNK_SIZE pieces with Gio.InputStream.read_bytes_async.
+    Each chunk is decoded incrementally and appended to the buffer from an idle
+    callback, and only then is the next chunk requested, so no more than one
+    chunk is held in memory besides the buffer itself.
+
+    The encoding is guessed from the first chunk and the line ending from the
+    first one found; both end up in text_format. Line endings are converted
+    to "\n" on the way in. Should a later chunk not decode, or mix line
+    endings, loading starts over with a fallback encoding, or keeping the
+    line endings as they are, so that saving writes back the same bytes.
+
+    With split_lines set, lines too long to lay out quickly are cut into
+    segments by a LineSplitter; splits counts the cuts. A file with a U+2029
+    of its own is loaded again without, as saving couldn't tell it apart.
+
+    A gzip, bz2 or xz file, told by its magic bytes, is decompressed on the
+    way in, COMPRESSED_CHUNK_SIZE at a time as what it decompresses to is
+    several times bigger, and no more than Decompressor.OUTPUT_SIZE bytes
+    per chunk inserted however much it expands; progress is then of the
+    compressed bytes read.
+    """
+
+    CHUNK_SIZE = 256 * 1024
+    COMPRESSED_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, file, buffer, on_progress=None, on_finished=None, encoding=None, split_lines=False):
+        self.file = file
+        self.buffer = buffer
+        self.on_progress = on_progress  # on_progress(loader, fraction)
+        self.on_finished = on_finished  # on_finished(loader, error or None)
+        self.cancellable = Gio.Cancellable()
+        self.encoding = encoding  # guessed from the first chunk unless given
+        self.guessed = encoding is None
+        self.bom = b""
+        self.newline = None
+        self.newline_known = False  # newline None once known means mixed line endings
+        self.decoder = None
+        self.pending = ""  # a "\r" held back in case the next chunk starts with "\n"
+        self.stream = None
+        self.size = 0
+        self.bytes_read = 0
+        self.compression = None
+        self.compression_known = False
+        self.decompressor = None
+        self.compressed_read = 0
+        self.splitter = LineSplitter() if split_lines else None
+        self.finished = False
+
+    @property
+    def splits(self):
+        return self.splitter.count if self.splitter else 0
+
+    @property
+    def text_format(self):
+        return TextFormat(self.encoding, self.bom, self.newline if self.newline_known else "\n", self.compression)
+
+    def start(self):
+        # loading is not something the user should be able to undo
+        self.buffer.begin_irreversible_action()
+        self.buffer.set_text("")
+        self.file.read_async(GLib.PRIORITY_DEFAULT, self.cancellable, self.on_read_ready)
+
+    def cancel(self):
+        self.cancellable.cancel()
+
+    def on_read_ready(self, file, result):
+        try:
+            self.stream = file.read_finish(result)
+            info = self.stream.query_info(Gio.FILE_ATTRIBUTE_STANDARD_SIZE, self.cancellable)
+            self.size = info.get_size()
+        except GLib.Error as error:
+            self.finish(error)
+            return
+        self.read_next_chunk()
+
+    def read_next_chunk(self):
+        if self.decompressor and not self.decompressor.needs_input:
+            # what has been read decompresses to more than one slice: take the next
+            self.process_chunk(b"", False)
+            return
+        self.stream.read_bytes_async(self.COMPRESSED_CHUNK_SIZE if self.decompressor else self.CHUNK_SIZE,
+                                     GLib.PRIORITY_DEFAULT,
+                                     self.cancellable,
+                                     self.on_chunk_ready)
+
+    def on_chunk_ready(self, stream, result):
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as error:
+            self.finish(error)
+            return
+        self.process_chunk(data, len(data) == 0)
+
+    def process_chunk(self, data, final):
+        if not self.compression_known:
+            self.compression = detect_compression(data)
+            self.compression_known = True
+            if self.compression:
+                self.decompressor = Decompressor(self.compression)
+        if self.decompressor:
+            self.compressed_read += len(data)
+            try:
+                data = self.decompressor.decompress(data)
+                if final:
+                    self.decompressor.finish()
+            except ValueError as e:
+                self.finish(GLib.Error.new_literal(Gio.io_error_quark(), str(e), Gio.IOErrorEnum.INVALID_DATA))
+                return
+            if not data and not final:
+                self.read_next_chunk()
+                return
+        if self.decoder is None:
+            if self.encoding is None:
+                self.encoding, self.bom = detect_encoding(data)
+            data = data[len(self.bom):]
+            self.decoder = codecs.getincrementaldecoder(self.encoding)()
+        self.bytes_read += len(data)
+        try:
+            text = self.pending + self.decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            fallback = FALLBACK_ENCODINGS.get(self.encoding)
+            if self.guessed and not self.bom and fallback:
+                self.restart(fallback)
+            else:
+                self.finish(GLib.Error.new_literal(Gio.io_error_quark(), str(e), Gio.IOErrorEnum.INVALID_DATA))
+            return
+        self.pending = ""
+        if text.endswith("\r") and not final:
+            text, self.pending = text[:-1], "\r"
+        if not self.newline_known:
+            self.newline = detect_newline(text)
+            self.newline_known = self.newline is not None
+        if self.newline in ("\r\n", "\r") and not is_consistent(text, self.newline):
+            # converting "\n" back to newline on save would change the other line endings
+            self.restart(self.encoding, keep_newlines=True)
+            return
+        text = to_buffer(text, self.newline)
+        if self.splitter:
+            if SPLIT in text:
+                self.splitter = None
+                self.restart(self.encoding, keep_newlines=self.newline_known and self.newline is None)
+                return
+            text = self.splitter.split(text, final)
+        GLib.idle_add(self.insert_chunk, text, final, priority=GLib.PRIORITY_DEFAULT_IDLE)
+
+    def restart(self, encoding, keep_newlines=False):
+        """Load the file again from the start with what the first attempt found out."""
+        self.stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+        self.stream = None
+        self.encoding = encoding
+        self.decoder = None
+        self.pending = ""
+        self.newline = None
+        self.newline_known = keep_newlines
+        self.bytes_read = 0
+        self.compressed_read = 0
+        if self.decompressor:
+            self.decompressor = Decompressor(self.compression)
+        if self.splitter:
+            self.splitter = LineSplitter()
+        self.buffer.set_text("")
+        self.file.read_async(GLib.PRIORITY_DEFAULT, self.cancellable, self.on_read_ready)
+
+    def insert_chunk(self, text, final):
+        if self.cancellable.is_cancelled():
+            self.finish(GLib.Error.new_literal(Gio.io_error_quark(), "Operation was cancelled",
+                                               Gio.IOErrorEnum.CANCELLED))
+            return GLib.SOURCE_REMOVE
+        if text:
+            self.buffer.insert(self.buffer.get_end_iter(), text)
+        if self.on_progress and self.size > 0:
+            read = self.compressed_read if self.decompressor else self.bytes_read
+            self.on_progress(self, min(read / self.size, 1.0))
+        if final:
+            self.finish(None)
+        else:
+            self.read_next_chunk()
+        return GLib.SOURCE_REMOVE
+
+    def finish(self, error):
+        if self.finished:
+            return
+        self.finished = True
+        if self.stream:
+            self.stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+        self.buffer.end_irreversible_action()
+        if error is None:
+            self.buffer.place_cursor(self.buffer.get_start_iter())
+        if self.on_finished:
+            self.on_finished(self, error)
+
+
+def is_cancelled_error(error):
+    return error.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED)
+
+
+def is_not_found_error(error):
+    return error.matches(Gio.io_error_quark(), Gio.IOErrorEnum.NOT_FOUND)
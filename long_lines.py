@@ -0,0 +1,67 @@
+import re
+
+# U+2029 PARAGRAPH SEPARATOR: GtkTextView lays out the text on either side of it separately
+SPLIT = "\u2029"
+
+
+def join(text):
+    """Remove the display splits from text."""
+    return text.replace(SPLIT, "")
+
+
+class LineSplitter:
+    """
+    Cut lines longer than SEGMENT_LENGTH characters into segments, for display.
+
+    GtkTextView lays out a line as one Pango layout, so a minified file or a
+    log with a line of megabytes takes seconds to show and re-lays out all
+    of it on every keystroke. A SPLIT inserted every SEGMENT_LENGTH
+    characters makes each segment a paragraph of its own; where possible the
+    cut goes after a space or punctuation in the last SEARCH_LENGTH
+    characters of the segment. SPLIT isn't a line ending to the PieceTable,
+    so line numbers stay those of the file, and join() removes the splits
+    before the text is written back.
+
+    Text can be split a chunk at a time: the end of the last line, which may
+    go on in the next chunk, is held back until it's known where to cut it,
+    so the result is the same however the text is chunked.
+    """
+
+    SEGMENT_LENGTH = 5000
+    SEARCH_LENGTH = 500
+
+    LONG_RUN = re.compile(r"[^\n]{%d,}" % (SEGMENT_LENGTH + 1))
+    LAST_BREAK = re.compile(r".*[ \t,;:)\]}>]")
+
+    def __init__(self):
+        self.held = ""
+        self.fixed = 0  # characters at the start of held that were split already
+        self.count = 0  # splits made
+
+    def split(self, text, final=False):
+        text = self.held + text
+        pieces = []
+        start = 0
+        for match in self.LONG_RUN.finditer(text):
+            run_start, run_end = match.span()
+            while run_end - run_start > self.SEGMENT_LENGTH:
+                limit = run_start + self.SEGMENT_LENGTH
+                found = self.LAST_BREAK.match(text, limit - self.SEARCH_LENGTH, limit)
+                cut = max(found.end() if found else limit, self.fixed)
+                pieces.append(text[start:cut])
+                pieces.append(SPLIT)
+                start = run_start = cut
+                self.count += 1
+        keep = len(text) if final else max(text.rfind("\n") + 1, start)
+        pieces.append(text[start:keep])
+        self.held = text[keep:]
+        fixed, self.fixed = self.fixed, 0
+        return "".join(pieces)[fixed:]
+
+    @classmethod
+    def split_appended(cls, tail, text):
+        """Split text appended after tail, the last segment of a split document, and return it."""
+        splitter = cls()
+        splitter.held = tail
+        splitter.fixed = len(tail)
+        return splitter.split(text, final=True)
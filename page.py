@@ -0,0 +1,1045 @@
+import os
+import re
+import threading
+
+from gi.repository import Gtk, Adw, GObject, GLib
+
+from large_file import LargeFileView, MappedFile
+from change_tracker import ChangeTracker
+from compression import compression_for_name, detect_file_compression
+from file_watcher import FileWatcher
+from highlight import Highlighter, lexer_for_file
+from instrumentation import Instrumentation
+from journal import Journal
+from loader import FileLoader, is_cancelled_error, is_not_found_error
+from long_lines import LineSplitter, SPLIT, join
+from piece_table import PieceTable
+from saver import FileSaver
+from search import SearchBar
+from status_bar import DocumentStatistics, StatusBar
+from text_format import DEFAULT_FORMAT
+from transform import ChangeCase, Filter, Pipeline, Sort, Substitute, TransformCancelled, Trim, Unique
+from undo import UndoManager
+from settings_store import SettingsStore
+
+
+class DocumentPage(Gtk.Box):
+    """
+    One document of a window, shown in a tab: its text view and the file it's loaded from and saved to.
+
+    A page can be created for a file without reading it: the file is loaded
+    by ensure_loaded(), once the page is first shown. A page that is clean,
+    backed by a file and hasn't been shown for UNLOAD_DELAY seconds is
+    unloaded, its text dropped and read from the file again when it's next
+    shown, so tabs left in the background cost a text view, not their text.
+
+    While a file is loaded its FileWatcher reports changes other programs
+    make to it: text appended to a clean document is appended to it too,
+    and the view kept at the end if follow is set; any other change, or one
+    to a document with unsaved changes, asks whether to reload.
+
+    Lines too long for GtkTextView to lay out quickly are split into
+    segments as the file loads (see LineSplitter); the splits are left out
+    of what's saved or copied, and the document isn't highlighted.
+
+    The buffer can be shown by more than one text view: a second pane of
+    the page (split()) or a LinkedPage in another window. They all edit
+    the one copy of the text, so its undo history, modified state and title
+    are shared; toasts and dialogs go to the window of the last focused view.
+    """
+
+    __gtype_name__ = "DocumentPage"
+
+    UNLOAD_DELAY = 120
+
+    title = GObject.Property(type=str, default="Untitled")
+    subtitle = GObject.Property(type=str, default="a minimal text editor")
+    loading = GObject.Property(type=bool, default=False)
+
+    def __init__(self, wrap=True):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        self.settings = SettingsStore.get_default()
+        self.instrumentation = Instrumentation.get_default()
+        self.load_started = self.save_started = None
+
+        # shown while a file is loading or being transformed
+        self.load_progress_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        self.load_progress_box.set_margin_start(10)
+        self.load_progress_box.set_margin_end(10)
+        self.load_progress_box.set_margin_top(5)
+        self.load_progress_box.set_margin_bottom(5)
+        self.load_progress_bar = Gtk.ProgressBar()
+        self.load_progress_bar.set_hexpand(True)
+        self.load_progress_bar.set_valign(Gtk.Align.CENTER)
+        self.load_progress_box.append(self.load_progress_bar)
+        cancel_load_button = Gtk.Button.new_with_label("Cancel")
+        cancel_load_button.connect("clicked", self.on_cancel_load_clicked)
+        self.load_progress_box.append(cancel_load_button)
+        self.load_progress_box.set_visible(False)
+        self.append(self.load_progress_box)
+
+        self.scrolled_window = Gtk.ScrolledWindow()
+        self.scrolled_window.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        self.text_view = Gtk.TextView.new()
+        self.scrolled_window.set_child(self.text_view)
+        self.append(self.scrolled_window)
+        self.wrap = wrap
+        self.views = []  # every text view on the buffer: this one, split panes' and linked pages'
+        self.active_view = self.text_view  # the one last focused
+        self.paned = None  # holds scrolled_window and split_view's while split
+        self.split_view = None
+        self.linked_pages = []  # LinkedPages showing the document in other windows
+
+        self.current_file = None
+        self.loader = None  # FileLoader of the file being opened, if any
+        self.saver = None  # FileSaver of the save in progress, if any
+        self.transform_cancel = None  # threading.Event of the transform running, if any
+        self.large_file_view = None  # replaces the text view while a large file is open
+        self.pending_file = None  # file to load once the page is shown
+        self.pending_offset = 0  # cursor offset to restore once it has loaded
+        self.pending_line = None  # line to go to once it has loaded
+        self.unload_id = 0
+        self.closed = False
+        self.watcher = None  # FileWatcher of current_file while its text is loaded
+        self.follow = False  # scroll to the end when text is appended to the file
+        self.reload_dialog = None
+        self.changed_on_disk = False  # ask to reload once the page is shown
+        self.display_splits = False  # whether over-long lines were split
+
+        self.buffer = self.text_view.get_buffer()
+        self.document = PieceTable()
+        self.document.attach(self.buffer)
+        self.change_tracker = ChangeTracker(self.document)
+        self.change_tracker.attach(self.buffer)
+        self.journal = Journal(self.document)
+        self.journal.on_error = self.on_journal_error
+        self.journal.attach(self.buffer)
+        self.journal.reset()
+        self.undo_manager = UndoManager(self.buffer,
+                                        self.settings.get_int("undo-memory-limit") * 1024 * 1024,
+                                        self.settings.get_boolean("undo-spill-to-disk"))
+        self.undo_manager.on_error = self.on_undo_error
+        self.undo_manager.attach()
+        self.change_check_id = 0
+        self.buffer.connect("changed", self.on_buffer_changed)
+        self.buffer.connect("modified-changed", self.on_modified_changed)
+
+        self.search_bar = None  # built by find(): most documents are never searched
+        self.highlighter = Highlighter(self.text_view, self.document)
+        self.setup_view(self.text_view)
+        self.statistics = DocumentStatistics(self.buffer, self.document)
+        self.status_bar = StatusBar(self.buffer, self.document, self.statistics)
+        self.append(self.status_bar)
+        self.text_format = DEFAULT_FORMAT  # encoding and line endings to save with
+
+    @property
+    def owner(self):
+        """The DocumentPage holding the document: this one, unlike for a LinkedPage."""
+        return self
+
+    def setup_view(self, text_view):
+        """Make text_view, already in its scrolled window, one of the views of the buffer."""
+        text_view.set_hexpand(True)
+        text_view.set_vexpand(True)
+        text_view.set_left_margin(10)
+        text_view.set_right_margin(10)
+        text_view.set_top_margin(10)
+        text_view.set_bottom_margin(10)
+        text_view.set_wrap_mode(Gtk.WrapMode.WORD if self.wrap else Gtk.WrapMode.NONE)
+        text_view.set_editable(self.text_view.get_editable())
+        # ahead of the text view's own bindings, which would use the buffer's undo
+        undo_shortcuts = Gtk.ShortcutController()
+        undo_shortcuts.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        for trigger, callback in (("<Control>z", self.on_undo_shortcut),
+                                  ("<Control><Shift>z", self.on_redo_shortcut),
+                                  ("<Control>y", self.on_redo_shortcut)):
+            undo_shortcuts.add_shortcut(Gtk.Shortcut.new(Gtk.ShortcutTrigger.parse_string(trigger),
+                                                         Gtk.CallbackAction.new(callback)))
+        text_view.add_controller(undo_shortcuts)
+        text_view.connect("copy-clipboard", self.on_copy_clipboard)
+        text_view.connect("cut-clipboard", self.on_cut_clipboard)
+        focus_controller = Gtk.EventControllerFocus()
+        focus_controller.connect("enter", self.on_view_focused, text_view)
+        text_view.add_controller(focus_controller)
+        self.highlighter.add_view(text_view)
+        self.views.append(text_view)
+
+    def create_view(self):
+        """Return a new text view of the buffer in a scrolled window, for a split pane or a LinkedPage."""
+        scrolled_window = Gtk.ScrolledWindow()
+        scrolled_window.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        text_view = Gtk.TextView.new_with_buffer(self.buffer)
+        scrolled_window.set_child(text_view)
+        self.setup_view(text_view)
+        text_view.scroll_to_mark(self.buffer.get_insert(), 0, True, 0, 0.3)
+        return scrolled_window, text_view
+
+    def remove_view(self, text_view):
+        self.views.remove(text_view)
+        if self.active_view is text_view:
+            self.active_view = self.text_view
+        self.highlighter.set_view(self.active_view)
+
+    def on_view_focused(self, controller, text_view):
+        self.set_active_view(text_view)
+
+    def set_active_view(self, text_view):
+        self.active_view = text_view
+        self.highlighter.set_view(text_view)
+
+    def get_active_root(self):
+        """The window the document was last worked on in, which may be a LinkedPage's."""
+        return self.active_view.get_root() or self.get_root()
+
+    def show_toast(self, message):
+        window = self.get_active_root()
+        if window:
+            window.show_toast(message)
+
+    def set_wrap(self, wrap):
+        # linked pages follow the wrap mode of their own windows
+        self.wrap = wrap
+        self.instrumentation.until_next_frame("wrap toggle", self.text_view)
+        for text_view in (self.text_view, self.split_view):
+            if text_view:
+                text_view.set_wrap_mode(Gtk.WrapMode.WORD if wrap else Gtk.WrapMode.NONE)
+
+    def set_editable(self, editable):
+        for text_view in self.views:
+            text_view.set_editable(editable)
+
+    def focus_text(self):
+        if self.large_file_view:
+            self.large_file_view.text_view.grab_focus()
+        else:
+            (self.split_view if self.active_view is self.split_view else self.text_view).grab_focus()
+
+    def split(self, orientation):
+        """Show the document in two panes, side by side or one above the other, as two views of the buffer."""
+        if self.large_file_view:
+            self.show_toast("Large files can't be split")
+            return
+        if self.paned:
+            self.paned.set_orientation(orientation)
+            return
+        scrolled_window, self.split_view = self.create_view()
+        self.paned = Gtk.Paned(orientation=orientation)
+        self.paned.set_vexpand(True)
+        self.insert_child_after(self.paned, self.scrolled_window)
+        self.remove(self.scrolled_window)
+        self.paned.set_start_child(self.scrolled_window)
+        self.paned.set_end_child(scrolled_window)
+        self.split_view.grab_focus()
+
+    def unsplit(self):
+        if not self.paned:
+            return
+        self.remove_view(self.split_view)
+        self.paned.set_start_child(None)
+        self.paned.set_end_child(None)
+        self.insert_child_after(self.scrolled_window, self.paned)
+        self.remove(self.paned)
+        self.paned = self.split_view = None
+        self.text_view.grab_focus()
+
+    def is_blank(self):
+        """Whether this is an untouched new document, which opening a file may as well replace."""
+        return (not self.current_file and not self.pending_file and not self.loader and not self.linked_pages
+                and not self.buffer.get_modified() and self.buffer.get_char_count() == 0)
+
+    def update_title(self):
+        file = self.current_file or self.pending_file
+        if file:
+            title = file.get_basename()
+            subtitle = file.get_path() or file.get_uri()
+            if self.large_file_view:
+                subtitle += " (read-only)"
+        else:
+            title = "Untitled"
+            subtitle = "a minimal text editor"
+        self.title = f"* {title}" if self.buffer.get_modified() else title
+        self.subtitle = subtitle
+
+    def set_file(self, file):
+        """Load file once the page is shown, instead of now."""
+        self.current_file = None
+        self.pending_file = file
+        self.update_title()
+
+    def ensure_loaded(self):
+        if self.pending_file:
+            file, self.pending_file = self.pending_file, None
+            self.load_file(file)
+
+    def on_shown(self):
+        if self.unload_id:
+            GLib.source_remove(self.unload_id)
+            self.unload_id = 0
+        self.ensure_loaded()
+        if self.changed_on_disk:
+            self.prompt_reload()
+
+    def on_hidden(self):
+        if not self.unload_id and not self.closed:
+            self.unload_id = GLib.timeout_add_seconds(self.UNLOAD_DELAY, self.on_unload_timeout)
+
+    def on_unload_timeout(self):
+        self.unload_id = 0
+        if self.can_unload():
+            self.unload()
+        return GLib.SOURCE_REMOVE
+
+    def can_unload(self):
+        return (self.current_file is not None and self.current_file.get_path() is not None
+                and not self.loader and not self.saver and not self.large_file_view
+                and not self.transform_cancel and not self.linked_pages and not self.has_unsaved_changes())
+
+    def unload(self):
+        """Drop the text of a clean document; it's read from its file again when the page is next shown."""
+        file = self.current_file
+        self.pending_offset = self.buffer.get_iter_at_mark(self.buffer.get_insert()).get_offset()
+        self.unwatch()
+        self.journal.suspend()
+        self.undo_manager.suspend()
+        self.statistics.suspend()
+        self.highlighter.set_lexer(None)
+        self.buffer.begin_irreversible_action()
+        self.buffer.set_text("")
+        self.buffer.end_irreversible_action()
+        self.document.reset()
+        self.mark_saved()
+        self.set_file(file)
+
+    def close(self):
+        """Stop whatever the page is doing, before it's destroyed."""
+        self.closed = True
+        if self.unload_id:
+            GLib.source_remove(self.unload_id)
+            self.unload_id = 0
+        if self.loader:
+            self.loader.cancel()
+        self.cancel_transform()
+        self.unwatch()
+        self.close_large_file()
+        if self.search_bar:
+            self.search_bar.engine.cancel()
+        self.journal.suspend()
+        self.undo_manager.close()
+        self.statistics.suspend()
+        for linked_page in list(self.linked_pages):
+            linked_page.close()
+
+    def save_file(self, on_saved=None):
+        if self.current_file and not self.has_unsaved_changes():
+            self.show_toast("No changes to save")
+            if on_saved:
+                on_saved(True)
+            return
+        if self.current_file:
+            self.save_to_file(self.current_file, on_saved)
+        else:
+            self.save_as(on_saved)
+
+    def save_as(self, on_saved=None):
+        dialog = Gtk.FileDialog.new()
+        dialog.set_title("Save File")
+        dialog.save(self.get_active_root(), None, self.on_save_dialog_response, on_saved)
+
+    def on_save_dialog_response(self, dialog, result, on_saved=None):
+        try:
+            file = dialog.save_finish(result)
+            if file:
+                self.save_to_file(file, on_saved)
+            else:
+                self.show_toast("Save operation cancelled")
+        except GLib.Error as error:
+            self.show_toast(f"Error saving file: {error.message}")
+
+    def save_to_file(self, file, on_saved=None):
+        """
+        Start saving the buffer to file.
+
+        The save runs asynchronously; on_saved, if given, is called with
+        True or False once it has succeeded or failed.
+        """
+        if self.saver:
+            self.show_toast("A save is already in progress")
+            return
+        if self.large_file_view:
+            self.show_toast("Large files are opened read-only")
+            return
+        if self.watcher:
+            self.watcher.paused = True  # texty's own write isn't an external change
+        text_format = self.text_format
+        if not (self.current_file and file.equal(self.current_file)):
+            # "Save As" notes.txt.gz compresses, notes.txt doesn't
+            text_format = text_format._replace(compression=compression_for_name(file.get_basename()))
+        self.save_started = self.instrumentation.start()
+        self.saver = FileSaver(file, self.document, self.on_save_finished, on_saved,
+                               text_format=text_format, strip_splits=self.display_splits)
+        self.saver.start()
+
+    def on_save_finished(self, saver, error, on_saved):
+        self.saver = None
+        self.instrumentation.finish("save_to_file", self.save_started)
+        if error is None:
+            file = saver.file
+            self.current_file = file
+            self.set_text_format(saver.text_format)
+            self.highlighter.set_lexer(self.lexer_for(file))
+            self.journal.reset(file, self.text_format, self.display_splits)
+            if saver.version == self.document.version:
+                # nothing was typed while the save ran
+                self.mark_saved()
+            else:
+                self.change_tracker.forget()
+                self.journal.rebase()
+            self.update_title()
+            self.watch(file)
+            self.show_toast(f"File saved: {file.get_basename()}")
+        else:
+            if self.watcher:
+                self.watcher.paused = False
+            self.show_toast(f"Error saving file: {error.message}")
+        if on_saved:
+            on_saved(error is None)
+
+    def on_save_finished_before_close(self, saver, error, on_saved):
+        self.on_save_finished(saver, error, on_saved)
+        # a failed save keeps the window open, showing the error, to try again or save elsewhere
+        window = self.get_root()
+        if window and error is None:
+            window.close()
+
+    def on_undo_error(self, error):
+        self.show_toast(f"Error keeping the undo history on disk, earlier steps were dropped: {error}")
+
+    def on_journal_error(self, error):
+        self.show_toast(f"Error writing crash recovery journal: {error}")
+
+    def lexer_for(self, file):
+        # lexing a line of megabytes on every edit would undo what splitting it is for
+        return None if self.display_splits else lexer_for_file(file)
+
+    def on_copy_clipboard(self, text_view):
+        if self.display_splits:
+            self.copy_selection()
+            text_view.stop_emission_by_name("copy-clipboard")
+
+    def on_cut_clipboard(self, text_view):
+        if self.display_splits:
+            if self.copy_selection():
+                self.buffer.delete_selection(True, text_view.get_editable())
+            text_view.stop_emission_by_name("cut-clipboard")
+
+    def copy_selection(self):
+        """Copy the selection without display splits; return whether there was one."""
+        bounds = self.buffer.get_selection_bounds()
+        if not bounds:
+            return False
+        self.active_view.get_clipboard().set(join(bounds[0].get_slice(bounds[1])))
+        return True
+
+    def undo(self):
+        if not self.large_file_view and self.text_view.get_editable():
+            self.undo_manager.undo()
+            self.active_view.scroll_to_mark(self.buffer.get_insert(), 0, False, 0, 0)
+
+    def redo(self):
+        if not self.large_file_view and self.text_view.get_editable():
+            self.undo_manager.redo()
+            self.active_view.scroll_to_mark(self.buffer.get_insert(), 0, False, 0, 0)
+
+    def on_undo_shortcut(self, widget, args):
+        self.undo()
+        return True
+
+    def on_redo_shortcut(self, widget, args):
+        self.redo()
+        return True
+
+    def on_buffer_changed(self, buffer):
+        started = self.instrumentation.start()
+        # editing back to the saved text makes the document clean again
+        if buffer.get_modified() and not self.change_check_id and self.change_tracker.may_be_unchanged():
+            self.change_check_id = GLib.timeout_add(250, self.on_change_check_timeout)
+        self.instrumentation.finish("on_buffer_changed", started)
+
+    def on_change_check_timeout(self):
+        self.change_check_id = 0
+        if self.change_tracker.is_unchanged():
+            self.buffer.set_modified(False)
+        return GLib.SOURCE_REMOVE
+
+    def on_modified_changed(self, buffer):
+        self.update_title()
+
+    def mark_saved(self):
+        self.change_tracker.mark_saved()
+        self.buffer.set_modified(False)
+
+    def has_unsaved_changes(self):
+        if not self.buffer.get_modified():
+            return False
+        if self.change_tracker.is_unchanged():
+            self.buffer.set_modified(False)
+            return False
+        return True
+
+    def set_text_format(self, text_format):
+        self.text_format = text_format
+        self.statistics.set_text_format(text_format)
+        self.status_bar.set_text_format(text_format)
+        for linked_page in self.linked_pages:
+            linked_page.status_bar.set_text_format(text_format)
+
+    def restore(self, recovered):
+        """Show a document recovered from a crash journal, as unsaved changes to its file."""
+        self.journal.suspend()
+        self.undo_manager.suspend()
+        self.statistics.suspend()
+        self.highlighter.set_lexer(None)
+        text = recovered.text
+        self.display_splits = False
+        if SPLIT not in text:
+            splitter = LineSplitter()
+            text = splitter.split(text, final=True)
+            self.display_splits = splitter.count > 0
+        self.buffer.begin_irreversible_action()
+        self.buffer.set_text(text)
+        self.buffer.end_irreversible_action()
+        self.buffer.place_cursor(self.buffer.get_start_iter())
+        self.current_file = recovered.file
+        self.pending_file = None
+        self.set_text_format(recovered.text_format)
+        self.highlighter.set_lexer(self.lexer_for(recovered.file))
+        self.change_tracker.forget()
+        self.buffer.set_modified(True)
+        self.update_title()
+        self.journal.reset(recovered.file, recovered.text_format, self.display_splits)
+        self.journal.rebase()
+        self.undo_manager.reset()
+        self.statistics.reset()
+
+    def load_file(self, file):
+        if self.loader:
+            self.loader.cancel()
+        self.cancel_transform()
+        self.unwatch()
+        self.close_large_file()
+        self.highlighter.set_lexer(None)
+        self.journal.suspend()
+        self.undo_manager.suspend()
+        self.statistics.suspend()
+        self.load_started = self.instrumentation.start()
+        threshold = self.settings.get_int("large-file-threshold") * 1024 * 1024
+        path = file.get_path()
+        if (path and threshold > 0 and os.path.isfile(path) and os.path.getsize(path) > threshold
+                and not detect_file_compression(path)):
+            self.open_large_file(file)
+            self.instrumentation.finish("load_file", self.load_started)
+            return
+        self.set_editable(False)
+        self.load_progress_bar.set_fraction(0)
+        self.load_progress_box.set_visible(True)
+        self.loading = True
+        self.loader = FileLoader(file, self.buffer, self.on_load_progress, self.on_load_finished, split_lines=True)
+        self.loader.start()
+
+    def on_load_progress(self, loader, fraction):
+        self.load_progress_bar.set_fraction(fraction)
+
+    def on_cancel_load_clicked(self, button):
+        if self.loader:
+            self.loader.cancel()
+        self.cancel_transform()
+
+    def on_load_finished(self, loader, error):
+        if loader is not self.loader:
+            return  # superseded by another load
+        self.loader = None
+        self.loading = False
+        self.instrumentation.finish("load_file", self.load_started)
+        self.load_progress_box.set_visible(False)
+        self.set_editable(True)
+        if error is None:
+            file = loader.file
+            self.current_file = file
+            self.set_text_format(loader.text_format)
+            self.display_splits = loader.splits > 0
+            self.journal.reset(file, loader.text_format, self.display_splits)
+            self.highlighter.set_lexer(self.lexer_for(file))
+            self.watch(file, None if loader.compression else len(loader.bom) + loader.bytes_read)
+            if self.pending_offset:
+                # reloaded after being unloaded: put the cursor back
+                self.buffer.place_cursor(self.buffer.get_iter_at_offset(self.pending_offset))
+                self.text_view.scroll_to_mark(self.buffer.get_insert(), 0, True, 0, 0.3)
+                self.pending_offset = 0
+            elif self.get_mapped():
+                # files opened in background tabs load quietly
+                self.show_toast(f"File opened: {file.get_basename()}")
+            if self.display_splits and self.get_mapped():
+                self.show_toast(f"Lines over {LineSplitter.SEGMENT_LENGTH:,} characters are shown in segments")
+        elif is_not_found_error(error) and not self.pending_offset:
+            # e.g. "texty notes.txt" for a file yet to be written: saving creates it
+            self.buffer.set_text("")
+            self.current_file = loader.file
+            self.display_splits = False
+            self.set_text_format(DEFAULT_FORMAT)
+            self.journal.reset()
+            self.highlighter.set_lexer(lexer_for_file(loader.file))
+        else:
+            # never leave a partially loaded file behind a real file name
+            self.buffer.set_text("")
+            self.current_file = None
+            self.pending_offset = 0
+            self.display_splits = False
+            self.set_text_format(DEFAULT_FORMAT)
+            self.journal.reset()
+            if is_cancelled_error(error):
+                self.show_toast("Open operation cancelled")
+            else:
+                self.show_toast(f"Error opening file: {error.message}")
+        self.undo_manager.reset()
+        self.statistics.reset()
+        self.mark_saved()
+        self.update_title()
+        self.text_view.grab_focus()
+        line, self.pending_line = self.pending_line, None
+        if line is not None and error is None:
+            self.go_to_line(line)
+
+    def open_large_file(self, file):
+        try:
+            mapped_file = MappedFile(file.get_path())
+        except (OSError, ValueError) as e:
+            # as when loading fails: load_file() has suspended the journal, undo and statistics
+            self.buffer.set_text("")
+            self.current_file = None
+            self.pending_offset = 0
+            self.display_splits = False
+            self.set_text_format(DEFAULT_FORMAT)
+            self.journal.reset()
+            self.undo_manager.reset()
+            self.statistics.reset()
+            self.mark_saved()
+            self.update_title()
+            self.show_toast(f"Error opening file: {str(e)}")
+            return
+        mapped_file.start_indexing()
+        self.unsplit()
+        self.unwatch()
+        self.buffer.set_text("")
+        self.large_file_view = LargeFileView(mapped_file)
+        self.scrolled_window.set_visible(False)
+        self.status_bar.set_visible(False)
+        self.insert_child_after(self.large_file_view, self.scrolled_window)
+        self.current_file = file
+        self.mark_saved()
+        self.update_title()
+        self.show_toast(f"Large file opened read-only: {file.get_basename()}")
+        self.large_file_view.text_view.grab_focus()
+
+    def close_large_file(self):
+        if self.large_file_view:
+            self.remove(self.large_file_view)
+            self.large_file_view.close()
+            self.large_file_view = None
+            self.scrolled_window.set_visible(True)
+            self.status_bar.set_visible(True)
+
+    def watch(self, file, offset=None):
+        """Watch file, of which the document holds the first offset bytes (all of them by default)."""
+        self.unwatch()
+        path = file.get_path()
+        if not path:
+            return
+        try:
+            if offset is None:
+                offset = os.path.getsize(path)
+            self.watcher = FileWatcher(file, self.text_format, offset, self.on_file_appended, self.on_file_changed)
+        except (OSError, GLib.Error):
+            self.watcher = None
+
+    def unwatch(self):
+        self.changed_on_disk = False
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def on_file_appended(self, watcher, text):
+        if watcher is not self.watcher:
+            return
+        if self.saver or self.has_unsaved_changes():
+            self.on_file_changed(watcher, False)
+            return
+        start = self.buffer.get_char_count()
+        self.journal.suspend()
+        # the history only refers to text before the end, so it stays valid
+        if self.display_splits:
+            end = self.buffer.get_end_iter()
+            tail_start = end.copy()
+            tail_start.set_line_offset(0)
+            text = LineSplitter.split_appended(tail_start.get_slice(end), text)
+        self.undo_manager.pause()
+        self.buffer.insert(self.buffer.get_end_iter(), text)
+        self.undo_manager.resume()
+        self.change_tracker.mark_appended_saved(start)
+        self.buffer.set_modified(False)
+        self.journal.reset(self.current_file, self.text_format, self.display_splits)
+        if self.follow:
+            self.buffer.place_cursor(self.buffer.get_end_iter())
+            for text_view in self.views:
+                text_view.scroll_to_mark(self.buffer.get_insert(), 0, False, 0, 0)
+
+    def on_file_changed(self, watcher, deleted):
+        if watcher is not self.watcher:
+            return
+        if deleted:
+            # what's in the buffer is all that's left of it: saving writes it back
+            self.unwatch()
+            self.change_tracker.forget()
+            self.buffer.set_modified(True)
+            self.journal.rebase()
+            self.show_toast(f"{self.current_file.get_basename()} was deleted or moved")
+        elif self.get_mapped():
+            self.prompt_reload()
+        else:
+            self.changed_on_disk = True
+
+    def prompt_reload(self):
+        self.changed_on_disk = False
+        if self.reload_dialog or not self.current_file:
+            return
+        self.reload_dialog = Adw.MessageDialog.new(self.get_active_root())
+        self.reload_dialog.set_heading("File Changed")
+        self.reload_dialog.set_body(f"{self.current_file.get_basename()} was changed by another program. "
+                                    "Reload it? Unsaved changes will be lost.")
+        self.reload_dialog.add_response("keep", "Keep Current Text")
+        self.reload_dialog.add_response("reload", "Reload")
+        self.reload_dialog.set_default_response("reload")
+        self.reload_dialog.set_close_response("keep")
+        self.reload_dialog.connect("response", self.on_reload_response)
+        self.reload_dialog.present()
+
+    def on_reload_response(self, dialog, response):
+        self.reload_dialog = None
+        if self.closed or not self.current_file:
+            return
+        if response == "reload":
+            self.pending_offset = self.buffer.get_iter_at_mark(self.buffer.get_insert()).get_offset()
+            self.load_file(self.current_file)
+        else:
+            # the text no longer matches the file: stop following it until it's saved or reloaded
+            self.unwatch()
+            self.change_tracker.forget()
+            self.buffer.set_modified(True)
+            self.journal.rebase()
+
+    def find(self, replace=False):
+        if self.large_file_view:
+            return
+        if self.search_bar is None:
+            self.search_bar = SearchBar(self.text_view, self.document)
+            self.insert_child_after(self.search_bar, self.load_progress_box)
+        self.search_bar.show(replace)
+
+    def prompt_go_to_line(self, text_view=None):
+        if self.large_file_view:
+            line_count = self.large_file_view.mapped_file.line_count
+        else:
+            line_count = self.document.line_count
+        entry = Gtk.Entry()
+        entry.set_input_purpose(Gtk.InputPurpose.DIGITS)
+        entry.set_placeholder_text(f"1 to {line_count:,}" if line_count else "Line number")
+        entry.set_activates_default(True)
+        dialog = Adw.MessageDialog.new((text_view or self).get_root())
+        dialog.set_heading("Go to Line")
+        dialog.set_extra_child(entry)
+        dialog.add_response("cancel", "Cancel")
+        dialog.add_response("go", "Go")
+        dialog.set_default_response("go")
+        dialog.set_close_response("cancel")
+        dialog.connect("response", self.on_go_to_line_response, entry, text_view)
+        dialog.present()
+
+    def on_go_to_line_response(self, dialog, response, entry, text_view):
+        if response != "go":
+            return
+        try:
+            line = int(entry.get_text().replace(",", "").strip()) - 1
+        except ValueError:
+            self.show_toast("Not a line number")
+            return
+        self.go_to_line(max(line, 0), text_view)
+
+    def show_line(self, line, text_view=None):
+        """Go to the 0-based line now, or once the file has loaded if it hasn't yet."""
+        if self.loader or self.pending_file:
+            self.pending_line = line
+        else:
+            self.go_to_line(line, text_view)
+
+    def go_to_line(self, line, text_view=None):
+        """Move the cursor to the start of the 0-based line and scroll text_view, or the active view, to it."""
+        if self.large_file_view:
+            if not self.large_file_view.goto_line(line):
+                self.show_toast(f"Line {line + 1} isn't indexed yet")
+            return
+        line = min(line, self.document.line_count - 1)
+        self.buffer.place_cursor(self.buffer.get_iter_at_offset(self.document.line_to_offset(line)))
+        text_view = text_view or self.active_view
+        text_view.scroll_to_mark(self.buffer.get_insert(), 0, True, 0, 0.3)
+        text_view.grab_focus()
+
+    def prompt_transform(self, text_view=None):
+        """Ask how to transform the selected lines, or every line if none are selected."""
+        if self.large_file_view:
+            self.show_toast("Large files are opened read-only")
+            return
+        grid = Gtk.Grid(row_spacing=6, column_spacing=6)
+        trim_button = Gtk.CheckButton(label="Trim whitespace")
+        grid.attach(trim_button, 0, 0, 2, 1)
+        filter_drop_down = Gtk.DropDown.new_from_strings(["Keep all lines", "Keep lines matching",
+                                                          "Remove lines matching"])
+        grid.attach(filter_drop_down, 0, 1, 1, 1)
+        filter_entry = Gtk.Entry(placeholder_text="Regular expression", hexpand=True)
+        grid.attach(filter_entry, 1, 1, 1, 1)
+        find_entry = Gtk.Entry(placeholder_text="Replace (regular expression)")
+        grid.attach(find_entry, 0, 2, 1, 1)
+        replacement_entry = Gtk.Entry(placeholder_text="With", hexpand=True)
+        grid.attach(replacement_entry, 1, 2, 1, 1)
+        case_drop_down = Gtk.DropDown.new_from_strings(["Keep case", "UPPER CASE", "lower case", "Title Case"])
+        grid.attach(case_drop_down, 0, 3, 2, 1)
+        unique_button = Gtk.CheckButton(label="Remove duplicate lines")
+        grid.attach(unique_button, 0, 4, 2, 1)
+        sort_drop_down = Gtk.DropDown.new_from_strings(["Don't sort", "Sort A to Z", "Sort Z to A",
+                                                        "Sort numerically"])
+        grid.attach(sort_drop_down, 0, 5, 2, 1)
+        dialog = Adw.MessageDialog.new((text_view or self).get_root())
+        dialog.set_heading("Transform Lines")
+        dialog.set_body("Applied in this order to the selected lines, or to every line if none are selected.")
+        dialog.set_extra_child(grid)
+        dialog.add_response("cancel", "Cancel")
+        dialog.add_response("transform", "Transform")
+        dialog.set_default_response("transform")
+        dialog.set_close_response("cancel")
+
+        def on_response(dialog, response):
+            if response != "transform":
+                return
+            steps = []
+            try:
+                if trim_button.get_active():
+                    steps.append(Trim())
+                if filter_drop_down.get_selected() and filter_entry.get_text():
+                    steps.append(Filter(filter_entry.get_text(), keep=filter_drop_down.get_selected() == 1))
+                if find_entry.get_text():
+                    steps.append(Substitute(find_entry.get_text(), replacement_entry.get_text()))
+            except re.error as e:
+                self.show_toast(f"Invalid regular expression: {e}")
+                return
+            if case_drop_down.get_selected():
+                steps.append(ChangeCase(("upper", "lower", "title")[case_drop_down.get_selected() - 1]))
+            if unique_button.get_active():
+                steps.append(Unique())
+            if sort_drop_down.get_selected():
+                steps.append(Sort(reverse=sort_drop_down.get_selected() == 2,
+                                  numeric=sort_drop_down.get_selected() == 3))
+            if steps:
+                self.transform(Pipeline(steps))
+        dialog.connect("response", on_response)
+        dialog.present()
+
+    def transform(self, pipeline):
+        """
+        Run pipeline over the selected lines, or the whole document, on a worker thread.
+
+        The text view is read-only meanwhile, so the edits the worker comes
+        back with still fit the buffer; they're made as one user action,
+        one undo step.
+        """
+        if self.loader or self.saver or self.transform_cancel:
+            self.show_toast("Wait for the current operation to finish")
+            return
+        bounds = self.buffer.get_selection_bounds()
+        first = self.document.offset_to_line(bounds[0].get_offset()) if bounds else 0
+        last = self.document.offset_to_line(bounds[1].get_offset()) if bounds else self.document.line_count - 1
+        if bounds and last > first and self.document.line_to_offset(last) == bounds[1].get_offset():
+            last -= 1  # the selection ends at the start of the line after it
+        if last > first and self.document.line_to_offset(last) == len(self.document):
+            last -= 1  # keep the final newline where it is
+        start = self.document.line_to_offset(first)
+        end = (self.document.line_to_offset(last + 1) - 1 if last + 1 < self.document.line_count
+               else len(self.document))
+        self.transform_cancel = threading.Event()
+        self.set_editable(False)
+        self.load_progress_bar.set_fraction(0)
+        self.load_progress_box.set_visible(True)
+        self.loading = True
+        started = self.instrumentation.start()
+        threading.Thread(target=self.transform_thread,
+                         args=(pipeline, self.document.snapshot(), start, end, self.display_splits,
+                               self.transform_cancel, started),
+                         daemon=True).start()
+
+    def transform_thread(self, pipeline, snapshot, start, end, splits, cancel_event, started):
+        def on_progress(fraction):
+            GLib.idle_add(self.on_transform_progress, cancel_event, fraction)
+        text = snapshot.get_text(start, end)
+        try:
+            if splits:
+                # segment offsets change with the text: replace it whole
+                result = LineSplitter().split(pipeline.apply(join(text), on_progress, cancel_event), final=True)
+                edits = [(0, len(text), result)] if result != text else []
+            else:
+                edits = pipeline.run(text, on_progress, cancel_event)
+        except TransformCancelled:
+            edits = None
+        GLib.idle_add(self.on_transform_finished, cancel_event, start, edits, started)
+
+    def on_transform_progress(self, cancel_event, fraction):
+        if cancel_event is self.transform_cancel:
+            self.load_progress_bar.set_fraction(fraction)
+        return GLib.SOURCE_REMOVE
+
+    def cancel_transform(self):
+        if self.transform_cancel:
+            self.transform_cancel.set()
+
+    def on_transform_finished(self, cancel_event, start, edits, started):
+        if cancel_event is not self.transform_cancel:
+            return GLib.SOURCE_REMOVE
+        self.transform_cancel = None
+        self.loading = False
+        self.load_progress_box.set_visible(False)
+        self.set_editable(True)
+        if cancel_event.is_set() or edits is None:
+            if not self.closed:
+                self.show_toast("Transform cancelled")
+            return GLib.SOURCE_REMOVE
+        if not edits:
+            self.show_toast("No lines changed")
+            return GLib.SOURCE_REMOVE
+        self.buffer.begin_user_action()
+        # from the end, so the offsets of the edits still to make stay valid
+        for edit_start, edit_end, replacement in reversed(edits):
+            location = self.buffer.get_iter_at_offset(start + edit_start)
+            if edit_end > edit_start:
+                self.buffer.delete(location, self.buffer.get_iter_at_offset(start + edit_end))
+            if replacement:
+                self.buffer.insert(location, replacement)
+        self.buffer.end_user_action()
+        self.instrumentation.finish("transform", started)
+        self.active_view.scroll_to_mark(self.buffer.get_insert(), 0, False, 0, 0)
+        return GLib.SOURCE_REMOVE
+
+
+class LinkedPage(Gtk.Box):
+    """
+    Another view of a DocumentPage's document, in a tab of another window.
+
+    Its text view shows the source page's buffer, so the document is held
+    once, and the text, undo history and modified state are the same in
+    both; the title is the source's, and saving saves the source. Closing
+    a LinkedPage just removes its view; if the source is closed first, it
+    moves to the LinkedPage's window in its place (see DocumentTabs.hand_over).
+    """
+
+    __gtype_name__ = "LinkedPage"
+
+    title = GObject.Property(type=str, default="Untitled")
+    subtitle = GObject.Property(type=str, default="a minimal text editor")
+    loading = GObject.Property(type=bool, default=False)
+
+    pending_file = None
+    loader = None
+    saver = None
+    large_file_view = None
+
+    def __init__(self, source, wrap=True):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        self.source = source
+        self.follow = False  # the source's applies
+        self.linked_pages = []
+        self.search_bar = None
+        self.bindings = [source.bind_property(name, self, name, GObject.BindingFlags.SYNC_CREATE)
+                         for name in ("title", "subtitle", "loading")]
+        self.scrolled_window, self.text_view = source.create_view()
+        self.set_wrap(wrap)
+        self.append(self.scrolled_window)
+        self.status_bar = StatusBar(source.buffer, source.document, source.statistics)
+        self.status_bar.set_text_format(source.text_format)
+        self.append(self.status_bar)
+        source.linked_pages.append(self)
+
+    @property
+    def owner(self):
+        return self.source
+
+    @property
+    def current_file(self):
+        return self.source.current_file
+
+    def is_blank(self):
+        return False
+
+    def has_unsaved_changes(self):
+        # the source asks about them when it's closed
+        return False
+
+    def on_shown(self):
+        pass
+
+    def on_hidden(self):
+        pass
+
+    def show_toast(self, message):
+        window = self.get_root()
+        if window:
+            window.show_toast(message)
+
+    def set_wrap(self, wrap):
+        self.text_view.set_wrap_mode(Gtk.WrapMode.WORD if wrap else Gtk.WrapMode.NONE)
+
+    def focus_text(self):
+        self.text_view.grab_focus()
+
+    def split(self, orientation):
+        self.show_toast("Split the document in its first window")
+
+    def unsplit(self):
+        pass
+
+    def save_file(self, on_saved=None):
+        self.source.save_file(on_saved)
+
+    def save_as(self, on_saved=None):
+        self.source.save_as(on_saved)
+
+    def find(self, replace=False):
+        if self.search_bar is None:
+            self.search_bar = SearchBar(self.text_view, self.source.document)
+            self.prepend(self.search_bar)
+        self.search_bar.show(replace)
+
+    def prompt_go_to_line(self):
+        self.source.prompt_go_to_line(self.text_view)
+
+    def prompt_transform(self):
+        self.source.prompt_transform(self.text_view)
+
+    def show_line(self, line):
+        self.source.show_line(line, self.text_view)
+
+    def close(self):
+        if self not in self.source.linked_pages:
+            return
+        self.source.linked_pages.remove(self)
+        self.source.remove_view(self.text_view)
+        if self.search_bar:
+            self.search_bar.detach()
+        self.status_bar.detach()
+        for binding in self.bindings:
+            binding.unbind()
+        self.bindings = []
@@ -0,0 +1,282 @@
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+# array typecode for an append-only buffer of characters
+CHAR_TYPECODE = "w" if sys.version_info >= (3, 13) else "u"
+
+# inserts at least this long are kept as their own immutable source string
+# instead of being copied into the append buffer
+LARGE_INSERT = 4096
+
+ADD = 0  # index of the append buffer among the sources
+
+
+def newline_positions(text, base=0):
+    """Return an array of the positions of every newline in text, offset by base."""
+    parts = text.split("\n")
+    if len(parts) == 1:
+        return array("Q")
+    positions = accumulate((len(part) + 1 for part in parts[:-1]), initial=base - 1)
+    next(positions)
+    return array("Q", positions)
+
+
+class PieceTableReader:
+    """
+    The read-only half of a piece table.
+
+    A document is a list of pieces (source, start, length), each a run of one
+    of the source strings. Running totals of characters and newlines per piece,
+    together with the newline positions of every source, make offset to line
+    and line to offset lookups two binary searches.
+    """
+
+    def __init__(self, sources, newlines, pieces, char_ends, line_ends):
+        self.sources = sources  # ADD is an append-only character array, the rest are str
+        self.newlines = newlines  # newline positions in each source
+        self.pieces = pieces
+        self.char_ends = char_ends  # characters up to and including each piece
+        self.line_ends = line_ends  # newlines up to and including each piece
+
+    def __len__(self):
+        return self.char_ends[-1] if self.char_ends else 0
+
+    @property
+    def line_count(self):
+        return (self.line_ends[-1] if self.line_ends else 0) + 1
+
+    def slice_source(self, source, start, end):
+        text = self.sources[source][start:end]
+        return text if source != ADD else text.tounicode()
+
+    def count_newlines(self, source, start, end):
+        newlines = self.newlines[source]
+        return bisect_left(newlines, end) - bisect_left(newlines, start)
+
+    def iter_chunks(self, start=0, end=None, chunk_size=64 * 1024):
+        """Yield the text between start and end in order, at most chunk_size characters at a time."""
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            return
+        i = bisect_right(self.char_ends, start)
+        piece_start = self.char_ends[i - 1] if i else 0
+        while piece_start < end:
+            source, source_start, length = self.pieces[i]
+            first = source_start + max(start - piece_start, 0)
+            last = source_start + min(end - piece_start, length)
+            for chunk_start in range(first, last, chunk_size):
+                yield self.slice_source(source, chunk_start, min(chunk_start + chunk_size, last))
+            piece_start += length
+            i += 1
+
+    def get_text(self, start=0, end=None):
+        return "".join(self.iter_chunks(start, end))
+
+    def offset_to_line(self, offset):
+        """Return the 0-based line containing the character offset."""
+        offset = max(0, min(offset, len(self)))
+        i = bisect_right(self.char_ends, offset)
+        if i == len(self.pieces):
+            return self.line_count - 1
+        piece_start = self.char_ends[i - 1] if i else 0
+        lines_before = self.line_ends[i - 1] if i else 0
+        source, source_start, length = self.pieces[i]
+        return lines_before + self.count_newlines(source, source_start, source_start + offset - piece_start)
+
+    def line_to_offset(self, line):
+        """Return the character offset of the start of the 0-based line."""
+        if line <= 0:
+            return 0
+        i = bisect_left(self.line_ends, line)
+        if i == len(self.pieces):
+            return len(self)
+        piece_start = self.char_ends[i - 1] if i else 0
+        lines_before = self.line_ends[i - 1] if i else 0
+        source, source_start, length = self.pieces[i]
+        newlines = self.newlines[source]
+        newline = newlines[bisect_left(newlines, source_start) + line - lines_before - 1]
+        return piece_start + newline - source_start + 1
+
+    def get_line(self, line):
+        """Return the text of the 0-based line, without its newline."""
+        start = self.line_to_offset(line)
+        if line + 1 >= self.line_count:
+            return self.get_text(start)
+        return self.get_text(start, self.line_to_offset(line + 1) - 1)
+
+
+class PieceTable(PieceTableReader):
+    """
+    A piece table document model, kept in step with a Gtk.TextBuffer by attach().
+
+    Small inserts such as typing are appended to a shared character array and
+    consecutive ones are merged into a single piece; large inserts, such as the
+    chunks of a file being loaded, become sources of their own. Nothing is ever
+    removed from a source, so snapshot() is a cheap copy of the piece list that
+    stays valid, and readable from another thread, while editing continues.
+
+    The running totals are kept in plain lists, not a tree: an edit only
+    marks them stale from the piece it changed on, and they're recomputed
+    from there the next time something past it is asked for, such as len(),
+    line_count, snapshot() or a lookup further on. Only the lookups are
+    O(log n); after an edit near the start of a document of many pieces,
+    bringing the totals up to date costs time proportional to the pieces
+    after it. Typing stays cheap, as consecutive inserts merge into one
+    piece; so does a run of edits working front to back, like a replace-all,
+    as each one only needs the totals before it.
+    """
+
+    def __init__(self, text=""):
+        super().__init__([], [], [], [], [])
+        self.valid = 0  # running totals are correct for pieces before this index
+        self.version = 0  # incremented on every change
+        self.reset(text)
+
+    def reset(self, text=""):
+        self.sources = [array(CHAR_TYPECODE)]
+        self.newlines = [array("Q")]
+        self.pieces = []
+        self.char_ends = []
+        self.line_ends = []
+        self.valid = 0
+        self.version += 1
+        if text:
+            self.insert(0, text)
+
+    def attach(self, buffer):
+        """Mirror every change made to a Gtk.TextBuffer."""
+        self.reset(buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True))
+        buffer.connect("insert-text", self.on_insert_text)
+        buffer.connect("delete-range", self.on_delete_range)
+
+    def on_insert_text(self, buffer, location, text, length):
+        self.insert(location.get_offset(), text)
+
+    def on_delete_range(self, buffer, start, end):
+        self.delete(start.get_offset(), end.get_offset())
+
+    def update_totals(self, offset=None):
+        """
+        Bring the running totals up to date.
+
+        With an offset, stop at the piece containing it: edits only need the
+        totals before them, so a run of edits working front to back through
+        the document, like a replace-all, brings them up to date a stretch at
+        a time instead of recomputing the tail after every edit.
+        """
+        if self.valid == len(self.pieces) == len(self.char_ends):
+            return
+        del self.char_ends[self.valid:]
+        del self.line_ends[self.valid:]
+        chars = self.char_ends[-1] if self.char_ends else 0
+        lines = self.line_ends[-1] if self.line_ends else 0
+        while self.valid < len(self.pieces) and (offset is None or chars <= offset):
+            source, start, length = self.pieces[self.valid]
+            chars += length
+            lines += self.count_newlines(source, start, start + length)
+            self.char_ends.append(chars)
+            self.line_ends.append(lines)
+            self.valid += 1
+
+    def invalidate(self, index):
+        self.valid = min(self.valid, index)
+        self.version += 1
+
+    def __len__(self):
+        self.update_totals()
+        return super().__len__()
+
+    @property
+    def line_count(self):
+        self.update_totals()
+        return super().line_count
+
+    def add_source(self, text):
+        if len(text) >= LARGE_INSERT:
+            self.sources.append(text)
+            self.newlines.append(newline_positions(text))
+            return len(self.sources) - 1, 0
+        add = self.sources[ADD]
+        start = len(add)
+        add.fromunicode(text)
+        self.newlines[ADD].extend(newline_positions(text, start))
+        return ADD, start
+
+    def is_appendable(self, index, source, start):
+        """Whether new text at source/start directly continues the piece at index."""
+        if index < 0 or source != ADD:
+            return False
+        piece_source, piece_start, length = self.pieces[index]
+        return piece_source == ADD and piece_start + length == start
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        self.update_totals(offset)
+        source, start = self.add_source(text)
+        piece = (source, start, len(text))
+        if not self.char_ends or offset >= self.char_ends[-1]:
+            # past the totals, which then cover the whole document
+            i, split = len(self.pieces), 0
+        else:
+            i = bisect_right(self.char_ends, offset)
+            split = offset - (self.char_ends[i - 1] if i else 0)
+        if split == 0:
+            if self.is_appendable(i - 1, source, start):
+                piece_source, piece_start, length = self.pieces[i - 1]
+                self.pieces[i - 1] = (piece_source, piece_start, length + len(text))
+                self.invalidate(i - 1)
+            else:
+                self.pieces.insert(i, piece)
+                self.invalidate(i)
+        else:
+            piece_source, piece_start, length = self.pieces[i]
+            self.pieces[i:i + 1] = [(piece_source, piece_start, split),
+                                    piece,
+                                    (piece_source, piece_start + split, length - split)]
+            self.invalidate(i)
+
+    def delete(self, start, end):
+        if start >= end:
+            return
+        self.update_totals(end - 1)
+        end = min(end, self.char_ends[-1] if self.char_ends else 0)
+        if start >= end:
+            return
+        i = bisect_right(self.char_ends, start)
+        j = bisect_right(self.char_ends, end - 1)
+        replacement = []
+        source, source_start, length = self.pieces[i]
+        piece_start = self.char_ends[i - 1] if i else 0
+        if start > piece_start:
+            replacement.append((source, source_start, start - piece_start))
+        source, source_start, length = self.pieces[j]
+        piece_start = self.char_ends[j - 1] if j else 0
+        if end < self.char_ends[j]:
+            cut = end - piece_start
+            replacement.append((source, source_start + cut, length - cut))
+        self.pieces[i:j + 1] = replacement
+        self.invalidate(i)
+
+    def offset_to_line(self, offset):
+        self.update_totals()
+        return super().offset_to_line(offset)
+
+    def line_to_offset(self, line):
+        self.update_totals()
+        return super().line_to_offset(line)
+
+    def iter_chunks(self, start=0, end=None, chunk_size=64 * 1024):
+        self.update_totals()
+        return super().iter_chunks(start, end, chunk_size)
+
+    def snapshot(self):
+        """Return a read-only view of the document as it is now."""
+        self.update_totals()
+        return PieceTableReader(list(self.sources),
+                                list(self.newlines),
+                                list(self.pieces),
+                                list(self.char_ends),
+                                list(self.line_ends))
@@ -0,0 +1,36 @@
+import os
+
+from gi.repository import Gio, Gtk
+
+RESOURCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "texty.gresource")
+RESOURCE_PATH = "/ca/footeware/py/texty"
+
+resource = None
+builders = {}
+
+
+def register():
+    """
+    Load texty's GResource bundle, once per process.
+
+    data/texty.gresource holds the .ui files and the icon, and is built from
+    data/texty.gresource.xml with
+
+        glib-compile-resources --sourcedir=data data/texty.gresource.xml
+
+    Registered before the application starts up, it also provides the icon:
+    GtkApplication adds RESOURCE_PATH/icons to the icon theme by itself.
+    """
+    global resource
+    if resource is None:
+        resource = Gio.Resource.load(RESOURCE_FILE)
+        Gio.resources_register(resource)
+    return resource
+
+
+def get_object(ui_file, name):
+    """Return an object of one of the bundled .ui files, parsed on first use and shared from then on."""
+    if ui_file not in builders:
+        register()
+        builders[ui_file] = Gtk.Builder.new_from_resource(f"{RESOURCE_PATH}/{ui_file}")
+    return builders[ui_file].get_object(name)
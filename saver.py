@@ -0,0 +1,139 @@
+import codecs
+
+from gi.repository import Gio, GLib
+
+from compression import Compressor
+from long_lines import join
+from text_format import DEFAULT_FORMAT, from_buffer
+
+
+class FileSaver:
+    """
+    Save a PieceTable document to a Gio.File without blocking the main loop.
+
+    A snapshot of the document is written in CHUNK_SIZE character slices
+    through the stream returned by Gio.File.replace_async, one slice at a time,
+    so only a single slice of the document is ever copied out. Editing can go on
+    meanwhile; version records which edit the saved file corresponds to. Gio
+    writes to a temporary file, syncs it and renames it over the target when the
+    stream is closed, so the file on disk is either the old or the new version,
+    never a torn mix of both.
+
+    Slices are encoded as they are written, in the encoding, byte order mark
+    and line endings of text_format, so a file that was loaded and saved
+    unchanged is written back byte for byte. With strip_splits set, the
+    display splits of a document with over-long lines are left out.
+
+    If text_format has a compression the encoded slices go through a
+    Compressor, COMPRESSED_CHUNK_SIZE characters at a time so compressing
+    one doesn't hold up the main loop for long.
+    """
+
+    CHUNK_SIZE = 256 * 1024
+    COMPRESSED_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, file, document, on_finished=None, *user_data, text_format=DEFAULT_FORMAT, strip_splits=False):
+        self.file = file
+        self.text_format = text_format
+        self.strip_splits = strip_splits
+        self.snapshot = document.snapshot()
+        self.version = document.version
+        self.on_finished = on_finished  # on_finished(saver, error or None, *user_data)
+        self.user_data = user_data
+        self.cancellable = Gio.Cancellable()
+        self.stream = None
+        self.chunks = self.iter_encoded()
+        self.pending = None
+        self.finished = False
+
+    def start(self):
+        self.file.replace_async(None,
+                                False,
+                                Gio.FileCreateFlags.NONE,
+                                GLib.PRIORITY_DEFAULT,
+                                self.cancellable,
+                                self.on_replace_ready)
+
+    def cancel(self):
+        self.cancellable.cancel()
+
+    def on_replace_ready(self, file, result):
+        try:
+            self.stream = file.replace_finish(result)
+        except GLib.Error as error:
+            self.finish(error)
+            return
+        self.write_next_chunk()
+
+    def iter_encoded(self):
+        if not self.text_format.compression:
+            yield from self.iter_text(self.CHUNK_SIZE)
+            return
+        compressor = Compressor(self.text_format.compression)
+        for data in self.iter_text(self.COMPRESSED_CHUNK_SIZE):
+            yield compressor.compress(data)
+        yield compressor.flush()
+
+    def iter_text(self, chunk_size):
+        encoder = codecs.getincrementalencoder(self.text_format.encoding)()
+        if self.text_format.bom:
+            yield self.text_format.bom
+        for text in self.snapshot.iter_chunks(chunk_size=chunk_size):
+            if self.strip_splits:
+                text = join(text)
+            yield encoder.encode(from_buffer(text, self.text_format.newline))
+        yield encoder.encode("", True)
+
+    def write_next_chunk(self):
+        try:
+            data = next(self.chunks, None)
+            while data == b"":
+                # a compressor may take in a lot before it gives anything out
+                data = next(self.chunks, None)
+        except UnicodeEncodeError as e:
+            message = f"{e.object[e.start:e.end]!r} can't be saved as {codecs.lookup(e.encoding).name.upper()}"
+            self.finish(GLib.Error.new_literal(Gio.io_error_quark(), message, Gio.IOErrorEnum.INVALID_DATA))
+            return
+        if data is None:
+            self.stream.close_async(GLib.PRIORITY_DEFAULT, self.cancellable, self.on_close_ready)
+            return
+        self.write_bytes(data)
+
+    def write_bytes(self, data):
+        self.pending = data
+        self.stream.write_bytes_async(GLib.Bytes.new(data),
+                                      GLib.PRIORITY_DEFAULT,
+                                      self.cancellable,
+                                      self.on_write_ready)
+
+    def on_write_ready(self, stream, result):
+        try:
+            written = stream.write_bytes_finish(result)
+        except GLib.Error as error:
+            self.finish(error)
+            return
+        if written < len(self.pending):
+            self.write_bytes(self.pending[written:])
+        else:
+            self.pending = None
+            self.write_next_chunk()
+
+    def on_close_ready(self, stream, result):
+        try:
+            stream.close_finish(result)
+        except GLib.Error as error:
+            self.finish(error)
+            return
+        self.finish(None)
+
+    def finish(self, error):
+        if self.finished:
+            return
+        self.finished = True
+        if error is not None and self.stream and not self.stream.is_closed():
+            # closing a cancelled replace stream discards the temporary file
+            cancellable = Gio.Cancellable()
+            cancellable.cancel()
+            self.stream.close_async(GLib.PRIORITY_DEFAULT, cancellable, None)
+        if self.on_finished:
+            self.on_finished(self, error, *self.user_data)
@@ -0,0 +1,500 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+from gi.repository import Gtk, GLib
+
+
+def compile_pattern(text, regex=False, case_sensitive=False):
+    """Compile what the user typed, raising re.error if it's not a valid regular expression."""
+    flags = 0 if case_sensitive else re.IGNORECASE
+    return re.compile(text if regex else re.escape(text), flags)
+
+
+def find_matches(document, pattern, start=0, end=None, cancel_event=None, block_size=1024 * 1024):
+    """
+    Yield the (start, end) offsets of the non-empty matches of pattern in a piece table.
+
+    The text is searched a block of whole lines at a time, so start should be
+    the start of a line and matches never span lines.
+    """
+    offset = start
+    pending = ""
+    for chunk in document.iter_chunks(start, end, block_size):
+        if cancel_event and cancel_event.is_set():
+            return
+        text = pending + chunk
+        cut = text.rfind("\n") + 1
+        if cut == 0 and len(text) < 4 * block_size:
+            pending = text
+            continue
+        if cut == 0:
+            cut = len(text)  # a very long line; searching it in pieces is the lesser evil
+        block, pending = text[:cut], text[cut:]
+        for match in pattern.finditer(block):
+            if match.end() > match.start():
+                yield offset + match.start(), offset + match.end()
+        offset += cut
+    for match in pattern.finditer(pending):
+        if match.end() > match.start():
+            yield offset + match.start(), offset + match.end()
+
+
+class MatchIndex:
+    """The sorted, non-overlapping matches of a search, kept in step with edits."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def clear(self):
+        self.starts = []
+        self.ends = []
+
+    def extend(self, matches):
+        """Add matches that all lie after the ones already indexed."""
+        for start, end in matches:
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def replace_range(self, start, end, matches):
+        """Replace the matches overlapping [start, end) with a fresh search of that range."""
+        i = bisect_right(self.ends, start)
+        j = bisect_left(self.starts, end)
+        self.starts[i:j] = [match[0] for match in matches]
+        self.ends[i:j] = [match[1] for match in matches]
+
+    def edited(self, offset, removed, inserted):
+        """Drop the matches touching an edit and shift the ones after it."""
+        i = bisect_left(self.ends, offset)
+        j = bisect_right(self.starts, offset + removed)
+        delta = inserted - removed
+        self.starts[i:] = [start + delta for start in self.starts[j:]]
+        self.ends[i:] = [end + delta for end in self.ends[j:]]
+
+    def between(self, start, end):
+        """Return the matches overlapping [start, end)."""
+        i = bisect_right(self.ends, start)
+        j = bisect_left(self.starts, end)
+        return list(zip(self.starts[i:j], self.ends[i:j]))
+
+    def find(self, start, end):
+        """Return the index of the match exactly covering [start, end), or -1."""
+        i = bisect_left(self.starts, start)
+        if i < len(self.starts) and self.starts[i] == start and self.ends[i] == end:
+            return i
+        return -1
+
+    def next_after(self, offset):
+        """Return the first match starting at or after offset, wrapping around, or None."""
+        if not self.starts:
+            return None
+        i = bisect_left(self.starts, offset) % len(self.starts)
+        return self.starts[i], self.ends[i]
+
+    def previous_before(self, offset):
+        """Return the last match ending at or before offset, wrapping around, or None."""
+        if not self.starts:
+            return None
+        i = bisect_right(self.ends, offset) - 1
+        return self.starts[i], self.ends[i]
+
+
+class SearchEngine:
+    """
+    Keep a MatchIndex of a pattern up to date for a PieceTable and its Gtk.TextBuffer.
+
+    A new pattern is searched on a worker thread against a snapshot of the
+    document, and matches stream back to the main loop in batches. After an
+    edit, the touched matches are dropped at once and, when typing pauses, only
+    the edited lines are searched again, also on a worker thread.
+    """
+
+    BATCH_SIZE = 2000
+    RESCAN_DELAY = 150
+
+    def __init__(self, document, buffer, on_changed):
+        self.document = document
+        self.on_changed = on_changed
+        self.index = MatchIndex()
+        self.pattern = None
+        self.generation = 0  # bumped to discard the results of older searches
+        self.cancel_event = threading.Event()
+        self.full_search = False  # whether the whole document is being searched
+        self.dirty_start = None  # edits not searched yet lie within [dirty_start, dirty_end)
+        self.dirty_end = None
+        self.rescan_id = 0
+        self.suspended = False
+        buffer.connect("insert-text", self.on_insert_text)
+        buffer.connect("delete-range", self.on_delete_range)
+
+    def set_pattern(self, pattern):
+        self.pattern = pattern
+        self.restart()
+
+    def restart(self):
+        """Throw away all matches and search the whole document again."""
+        self.cancel()
+        self.index.clear()
+        self.dirty_start = self.dirty_end = None
+        if self.pattern is not None:
+            self.full_search = True
+            self.search(0, None)
+        self.on_changed()
+
+    def cancel(self):
+        self.generation += 1
+        self.cancel_event.set()
+        self.full_search = False
+        if self.rescan_id:
+            GLib.source_remove(self.rescan_id)
+            self.rescan_id = 0
+
+    def search(self, start, end):
+        self.cancel_event = threading.Event()
+        thread = threading.Thread(target=self.search_thread,
+                                  args=(self.document.snapshot(),
+                                        self.document.version,
+                                        self.pattern,
+                                        start,
+                                        end,
+                                        self.generation,
+                                        self.cancel_event),
+                                  daemon=True)
+        thread.start()
+
+    def search_thread(self, snapshot, version, pattern, start, end, generation, cancel_event):
+        batch = []
+        for match in find_matches(snapshot, pattern, start, end, cancel_event):
+            batch.append(match)
+            if end is None and len(batch) >= self.BATCH_SIZE:
+                GLib.idle_add(self.on_matches_found, generation, version, start, end, batch, False)
+                batch = []
+        if not cancel_event.is_set():
+            GLib.idle_add(self.on_matches_found, generation, version, start, end, batch, True)
+
+    def on_matches_found(self, generation, version, start, end, matches, done):
+        # results of a snapshot that has since been edited are useless; the edit rescheduled a search
+        if generation != self.generation or version != self.document.version:
+            return GLib.SOURCE_REMOVE
+        if end is None:
+            self.index.extend(matches)
+            if done:
+                self.full_search = False
+        else:
+            self.index.replace_range(start, end, matches)
+            self.dirty_start = self.dirty_end = None
+        self.on_changed()
+        return GLib.SOURCE_REMOVE
+
+    def detach(self, buffer):
+        """Stop searching and following buffer, for an engine that goes away before it does."""
+        self.cancel()
+        buffer.disconnect_by_func(self.on_insert_text)
+        buffer.disconnect_by_func(self.on_delete_range)
+
+    def on_insert_text(self, buffer, location, text, length):
+        self.edited(location.get_offset(), 0, len(text))
+
+    def on_delete_range(self, buffer, start, end):
+        self.edited(start.get_offset(), end.get_offset() - start.get_offset(), 0)
+
+    def edited(self, offset, removed, inserted):
+        if self.pattern is None or self.suspended:
+            return
+        if self.full_search:
+            # the streamed results would no longer line up; start over once typing pauses
+            self.cancel()
+            self.index.clear()
+            self.dirty_start, self.dirty_end = 0, len(self.document)
+        else:
+            self.index.edited(offset, removed, inserted)
+            if self.dirty_start is None:
+                self.dirty_start, self.dirty_end = offset, offset + inserted
+            else:
+                if self.dirty_end >= offset + removed:
+                    self.dirty_end += inserted - removed
+                else:
+                    self.dirty_end = offset + inserted
+                self.dirty_start = min(self.dirty_start, offset)
+                self.dirty_end = max(self.dirty_end, offset + inserted)
+        if self.rescan_id:
+            GLib.source_remove(self.rescan_id)
+        self.rescan_id = GLib.timeout_add(self.RESCAN_DELAY, self.on_rescan_timeout)
+        self.on_changed()
+
+    def on_rescan_timeout(self):
+        self.rescan_id = 0
+        if self.dirty_start is None:
+            return GLib.SOURCE_REMOVE
+        if self.dirty_start == 0 and self.dirty_end >= len(self.document):
+            self.restart()
+            return GLib.SOURCE_REMOVE
+        # search whole lines, so that matches next to the edit are found again too
+        start = self.document.line_to_offset(self.document.offset_to_line(self.dirty_start))
+        end_line = self.document.offset_to_line(self.dirty_end) + 1
+        end = self.document.line_to_offset(end_line) if end_line < self.document.line_count else len(self.document)
+        self.generation += 1
+        self.search(start, end)
+        return GLib.SOURCE_REMOVE
+
+
+class SearchBar(Gtk.SearchBar):
+    """
+    Find and replace for a text view.
+
+    Matches come from a SearchEngine; only those in the visible part of the
+    view, plus a margin, are highlighted, and the highlights follow scrolling.
+    Replace All is a single user action: one undo step.
+    """
+
+    HIGHLIGHT_MARGIN = 50  # lines above and below the visible ones
+
+    def __init__(self, text_view, document):
+        super().__init__()
+        self.text_view = text_view
+        self.buffer = text_view.get_buffer()
+        self.pattern = None
+        self.highlighted = None  # (start, end) offsets of the range currently highlighted
+        self.highlight_id = 0
+        self.engine = SearchEngine(document, self.buffer, self.on_matches_changed)
+        self.match_tag = self.buffer.create_tag(None, background="rgba(246, 211, 45, 0.5)")
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+
+        find_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_hexpand(True)
+        self.search_entry.connect("search-changed", self.on_search_changed)
+        self.search_entry.connect("activate", self.on_next_clicked)
+        self.search_entry.connect("next-match", self.on_next_clicked)
+        self.search_entry.connect("previous-match", self.on_previous_clicked)
+        find_box.append(self.search_entry)
+        self.regex_button = Gtk.ToggleButton(label=".*")
+        self.regex_button.set_tooltip_text("Regular Expression")
+        self.regex_button.connect("toggled", self.on_search_changed)
+        find_box.append(self.regex_button)
+        self.case_button = Gtk.ToggleButton(label="Aa")
+        self.case_button.set_tooltip_text("Match Case")
+        self.case_button.connect("toggled", self.on_search_changed)
+        find_box.append(self.case_button)
+        previous_button = Gtk.Button.new_from_icon_name("go-up-symbolic")
+        previous_button.set_tooltip_text("Previous Match")
+        previous_button.connect("clicked", self.on_previous_clicked)
+        find_box.append(previous_button)
+        next_button = Gtk.Button.new_from_icon_name("go-down-symbolic")
+        next_button.set_tooltip_text("Next Match")
+        next_button.connect("clicked", self.on_next_clicked)
+        find_box.append(next_button)
+        self.count_label = Gtk.Label()
+        self.count_label.set_width_chars(12)
+        find_box.append(self.count_label)
+        box.append(find_box)
+
+        self.replace_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.replace_entry = Gtk.Entry()
+        self.replace_entry.set_placeholder_text("Replace with")
+        self.replace_entry.set_hexpand(True)
+        self.replace_entry.connect("activate", self.on_replace_clicked)
+        self.replace_box.append(self.replace_entry)
+        replace_button = Gtk.Button.new_with_label("Replace")
+        replace_button.connect("clicked", self.on_replace_clicked)
+        self.replace_box.append(replace_button)
+        replace_all_button = Gtk.Button.new_with_label("Replace All")
+        replace_all_button.connect("clicked", self.on_replace_all_clicked)
+        self.replace_box.append(replace_all_button)
+        box.append(self.replace_box)
+
+        self.set_child(box)
+        self.connect_entry(self.search_entry)
+        self.connect("notify::search-mode-enabled", self.on_search_mode_changed)
+        text_view.get_vadjustment().connect("value-changed", self.on_view_scrolled)
+
+    def show(self, replace=False):
+        self.replace_box.set_visible(replace)
+        bounds = self.buffer.get_selection_bounds()
+        if bounds:
+            selected = self.buffer.get_text(bounds[0], bounds[1], True)
+            if "\n" not in selected and len(selected) < 256:
+                self.search_entry.set_text(selected)
+        self.set_search_mode(True)
+        self.search_entry.grab_focus()
+
+    def on_search_mode_changed(self, search_bar, param):
+        if not self.get_search_mode():
+            self.pattern = None
+            self.engine.set_pattern(None)
+            self.text_view.grab_focus()
+
+    def on_search_changed(self, widget):
+        text = self.search_entry.get_text()
+        if not text:
+            self.pattern = None
+            self.engine.set_pattern(None)
+            return
+        try:
+            self.pattern = compile_pattern(text, self.regex_button.get_active(), self.case_button.get_active())
+        except re.error as e:
+            self.pattern = None
+            self.engine.set_pattern(None)
+            self.count_label.set_text("Invalid")
+            self.count_label.set_tooltip_text(str(e))
+            return
+        self.count_label.set_tooltip_text(None)
+        self.engine.set_pattern(self.pattern)
+
+    def on_matches_changed(self):
+        if self.pattern is None:
+            self.count_label.set_text("")
+        else:
+            count = len(self.engine.index)
+            suffix = "…" if self.engine.full_search else ""
+            self.count_label.set_text(f"{count}{suffix} match" + ("" if count == 1 else "es"))
+        self.queue_highlight()
+
+    def detach(self):
+        """Remove the search and its highlights from a buffer that other views go on showing."""
+        self.engine.detach(self.buffer)
+        if self.highlight_id:
+            GLib.source_remove(self.highlight_id)
+            self.highlight_id = 0
+        self.buffer.get_tag_table().remove(self.match_tag)
+
+    def on_view_scrolled(self, adjustment):
+        if self.pattern is not None:
+            self.queue_highlight()
+
+    def queue_highlight(self):
+        if not self.highlight_id:
+            self.highlight_id = GLib.idle_add(self.highlight_visible)
+
+    def highlight_visible(self):
+        self.highlight_id = 0
+        if self.highlighted:
+            # edits move highlights around, so clear them everywhere; that's cheap when there are few
+            self.buffer.remove_tag(self.match_tag, *self.buffer.get_bounds())
+            self.highlighted = None
+        if self.pattern is None:
+            return GLib.SOURCE_REMOVE
+        rect = self.text_view.get_visible_rect()
+        _, top = self.text_view.get_iter_at_location(rect.x, rect.y)
+        _, bottom = self.text_view.get_iter_at_location(rect.x + rect.width, rect.y + rect.height)
+        top.backward_lines(self.HIGHLIGHT_MARGIN)
+        bottom.forward_lines(self.HIGHLIGHT_MARGIN)
+        bottom.forward_to_line_end()
+        start, end = top.get_offset(), bottom.get_offset()
+        for match_start, match_end in self.engine.index.between(start, end):
+            self.buffer.apply_tag(self.match_tag,
+                                  self.buffer.get_iter_at_offset(match_start),
+                                  self.buffer.get_iter_at_offset(match_end))
+        self.highlighted = (start, end)
+        return GLib.SOURCE_REMOVE
+
+    def select_match(self, match):
+        if match is None:
+            return
+        start, end = match
+        self.buffer.select_range(self.buffer.get_iter_at_offset(start), self.buffer.get_iter_at_offset(end))
+        self.text_view.scroll_to_mark(self.buffer.get_insert(), 0.2, False, 0, 0)
+
+    def on_next_clicked(self, widget):
+        bounds = self.buffer.get_selection_bounds()
+        offset = bounds[1].get_offset() if bounds else self.buffer.get_iter_at_mark(self.buffer.get_insert()).get_offset()
+        self.select_match(self.engine.index.next_after(offset))
+
+    def on_previous_clicked(self, widget):
+        bounds = self.buffer.get_selection_bounds()
+        offset = bounds[0].get_offset() if bounds else self.buffer.get_iter_at_mark(self.buffer.get_insert()).get_offset()
+        self.select_match(self.engine.index.previous_before(offset))
+
+    def get_template(self):
+        """
+        Return what the replace entry holds, or None, telling why in the count label, if it's not a valid template.
+
+        A template is checked against the pattern before anything is
+        replaced, so a bad group reference can't stop a replace-all halfway.
+        """
+        template = self.replace_entry.get_text()
+        if self.regex_button.get_active():
+            try:
+                self.pattern.sub(template, "")
+            except (re.error, IndexError) as e:  # an unknown group name is an IndexError before Python 3.12
+                self.count_label.set_text("Invalid replacement")
+                self.count_label.set_tooltip_text(str(e))
+                return None
+        self.count_label.set_tooltip_text(None)
+        return template
+
+    def replacement_for(self, start, end, template):
+        """
+        Return what to replace the match between start and end with, or None if it no longer matches.
+
+        A regular expression is matched again at start within the lines
+        around it, so lookarounds, anchors and \\b see the same context as
+        when it was found.
+        """
+        if not self.regex_button.get_active():
+            return template
+        document = self.engine.document
+        context_start = document.line_to_offset(max(document.offset_to_line(start) - 1, 0))
+        context_end = document.line_to_offset(document.offset_to_line(end) + 2)
+        match = self.pattern.match(document.get_text(context_start, context_end), start - context_start)
+        if match is None or match.end() != end - context_start:
+            return None
+        return match.expand(template)
+
+    def on_replace_clicked(self, widget):
+        if self.pattern is None:
+            return
+        template = self.get_template()
+        if template is None:
+            return
+        bounds = self.buffer.get_selection_bounds()
+        if bounds and self.engine.index.find(bounds[0].get_offset(), bounds[1].get_offset()) != -1:
+            start, end = bounds
+            replacement = self.replacement_for(start.get_offset(), end.get_offset(), template)
+            if replacement is None:
+                self.count_label.set_text("No longer matches")
+            else:
+                self.buffer.begin_user_action()
+                self.buffer.delete(start, end)
+                self.buffer.insert(start, replacement)
+                self.buffer.end_user_action()
+        self.on_next_clicked(widget)
+
+    def on_replace_all_clicked(self, widget):
+        if self.pattern is None or self.engine.full_search:
+            return
+        matches = list(zip(self.engine.index.starts, self.engine.index.ends))
+        if not matches:
+            return
+        template = self.get_template()
+        if template is None:
+            return
+        # worked out before any edit, so every match is expanded in its original context
+        replacements = [self.replacement_for(start, end, template) for start, end in matches]
+        # front to back, tracking the shift: the document's running totals then only
+        # need bringing up to date between one match and the next
+        self.engine.suspended = True
+        self.buffer.begin_user_action()
+        delta = 0
+        replaced = 0
+        try:
+            for (start, end), replacement in zip(matches, replacements):
+                if replacement is None:
+                    continue
+                start_iter = self.buffer.get_iter_at_offset(start + delta)
+                end_iter = self.buffer.get_iter_at_offset(end + delta)
+                self.buffer.delete(start_iter, end_iter)
+                self.buffer.insert(start_iter, replacement)
+                delta += len(replacement) - (end - start)
+                replaced += 1
+        finally:
+            self.buffer.end_user_action()
+            self.engine.suspended = False
+            self.engine.restart()
+        skipped = len(matches) - replaced
+        self.count_label.set_text(f"{replaced} replaced" + (f", {skipped} no longer matched" if skipped else ""))
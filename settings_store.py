@@ -0,0 +1,97 @@
+from gi.repository import Gio, GLib
+
+
+class SettingsStore:
+    """
+    Write-behind persistence for texty's GSettings, shared by every window.
+
+    The Gio.Settings is kept in delay mode, so setting a key only records it.
+    Pending changes are applied in one write once FLUSH_DELAY ms pass without
+    further changes, but no later than MAX_DELAY ms after the first one, and
+    always on flush(), which windows call from close-request. A window drag
+    therefore costs a handful of backend writes instead of one per
+    notification; write_count counts them.
+    """
+
+    FLUSH_DELAY = 500
+    MAX_DELAY = 2000
+
+    default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls.default is None:
+            cls.default = cls(Gio.Settings.new("ca.footeware.py.texty"))
+        return cls.default
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.settings.delay()
+        self.flush_timeout_id = 0
+        self.max_delay_id = 0
+        self.flush_idle_id = 0
+        self.write_count = 0
+
+    def get_int(self, key):
+        return self.settings.get_int(key)
+
+    def get_boolean(self, key):
+        return self.settings.get_boolean(key)
+
+    def get_strv(self, key):
+        return self.settings.get_strv(key)
+
+    def get_default_value(self, key):
+        return self.settings.get_default_value(key)
+
+    def set_int(self, key, value):
+        if self.settings.get_int(key) != value:
+            self.settings.set_int(key, value)
+            self.schedule_flush()
+
+    def set_boolean(self, key, value):
+        if self.settings.get_boolean(key) != value:
+            self.settings.set_boolean(key, value)
+            self.schedule_flush()
+
+    def set_strv(self, key, value):
+        if self.settings.get_strv(key) != value:
+            self.settings.set_strv(key, value)
+            self.schedule_flush()
+
+    def schedule_flush(self):
+        if self.flush_timeout_id:
+            GLib.source_remove(self.flush_timeout_id)
+        self.flush_timeout_id = GLib.timeout_add(self.FLUSH_DELAY, self.on_flush_timeout)
+        if not self.max_delay_id:
+            self.max_delay_id = GLib.timeout_add(self.MAX_DELAY, self.on_max_delay_timeout)
+
+    def on_flush_timeout(self):
+        self.flush_timeout_id = 0
+        self.queue_flush()
+        return GLib.SOURCE_REMOVE
+
+    def on_max_delay_timeout(self):
+        self.max_delay_id = 0
+        self.queue_flush()
+        return GLib.SOURCE_REMOVE
+
+    def queue_flush(self):
+        # write when the main loop has nothing better to do
+        if not self.flush_idle_id:
+            self.flush_idle_id = GLib.idle_add(self.on_flush_idle, priority=GLib.PRIORITY_LOW)
+
+    def on_flush_idle(self):
+        self.flush_idle_id = 0
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        """Write any pending changes now."""
+        for source_id in (self.flush_timeout_id, self.max_delay_id, self.flush_idle_id):
+            if source_id:
+                GLib.source_remove(source_id)
+        self.flush_timeout_id = self.max_delay_id = self.flush_idle_id = 0
+        if self.settings.get_has_unapplied():
+            self.settings.apply()
+            self.write_count += 1
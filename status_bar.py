@@ -0,0 +1,242 @@
+import threading
+
+from gi.repository import Gtk, GLib
+
+from document_stats import BlockStatistics
+from text_format import DEFAULT_FORMAT, describe
+
+
+class DocumentStatistics:
+    """
+    Word, character, line and byte counts of a document, for the status bars showing it.
+
+    Edits adjust a BlockStatistics, whose dirty blocks are counted again once
+    per main loop iteration. Changes too big for that, like a replace-all, a
+    transform or loading a file, are counted from a snapshot on a worker
+    thread instead; edits made meanwhile are replayed on its result. Each
+    listener is called once the counts have changed.
+    """
+
+    BULK_SIZE = 512 * 1024  # dirty characters counted on a worker thread instead
+    MAX_EDITS = 256  # edits in one main loop iteration after which the whole document is counted again
+
+    def __init__(self, buffer, document):
+        self.document = document
+        self.text_format = DEFAULT_FORMAT
+        self.blocks = BlockStatistics()
+        self.totals = (0, 0, 0)  # words, characters and bytes as last counted, None while suspended
+        self.listeners = []
+        self.active = True
+        self.stale = False  # the blocks have stopped following the edits: count everything again
+        self.replay = None  # edits made since the snapshot being counted was taken
+        self.edits = 0
+        self.generation = 0
+        self.update_id = 0
+        buffer.connect("insert-text", self.on_insert_text)
+        buffer.connect("delete-range", self.on_delete_range)
+
+    def on_insert_text(self, buffer, location, text, length):
+        self.edited(True, location.get_offset(), len(text))
+
+    def on_delete_range(self, buffer, start, end):
+        self.edited(False, start.get_offset(), end.get_offset())
+
+    def edited(self, inserted, start, end):
+        if not self.active:
+            return
+        self.edits += 1
+        if self.edits > self.MAX_EDITS:
+            self.stale = True
+        if self.replay is not None:
+            self.replay.append((inserted, start, end))
+        elif not self.stale:
+            apply_edit(self.blocks, inserted, start, end)
+        self.queue_update()
+
+    def suspend(self):
+        """Stop counting, e.g. while a file is loading."""
+        self.active = False
+        self.generation += 1
+        self.replay = None
+        self.stale = False
+        self.blocks = BlockStatistics(self.text_format.encoding)
+        self.set_totals(None)
+
+    def reset(self):
+        """Count the whole document again, and follow its edits from now on."""
+        self.active = True
+        self.stale = True
+        self.queue_update()
+
+    def set_text_format(self, text_format):
+        encoding_changed = text_format.encoding != self.text_format.encoding
+        self.text_format = text_format
+        self.blocks.encoding = text_format.encoding
+        if encoding_changed and self.active:
+            self.reset()
+        else:
+            self.notify()
+
+    def queue_update(self):
+        if not self.update_id:
+            self.update_id = GLib.idle_add(self.update)
+
+    def update(self):
+        self.update_id = 0
+        self.edits = 0
+        if not self.active or self.replay is not None:
+            return GLib.SOURCE_REMOVE  # on_counted() updates once the worker thread is done
+        if self.stale or self.blocks.dirty_size() > self.BULK_SIZE:
+            self.start_counting()
+            return GLib.SOURCE_REMOVE
+        self.blocks.recount(self.document)
+        self.set_totals(self.blocks.totals())
+        return GLib.SOURCE_REMOVE
+
+    def start_counting(self):
+        self.stale = False
+        self.replay = []
+        self.generation += 1
+        threading.Thread(target=self.count_thread,
+                         args=(self.document.snapshot(), self.text_format.encoding, self.generation),
+                         daemon=True).start()
+
+    def count_thread(self, snapshot, encoding, generation):
+        blocks = BlockStatistics.count_all(snapshot, encoding, lambda: generation != self.generation)
+        if blocks is not None:
+            GLib.idle_add(self.on_counted, generation, blocks)
+
+    def on_counted(self, generation, blocks):
+        if generation != self.generation:
+            return GLib.SOURCE_REMOVE
+        replay, self.replay = self.replay, None
+        if self.stale:
+            self.queue_update()
+            return GLib.SOURCE_REMOVE
+        blocks.encoding = self.text_format.encoding
+        for edit in replay:
+            apply_edit(blocks, *edit)
+        self.blocks = blocks
+        return self.update()
+
+    def set_totals(self, totals):
+        if totals != self.totals:
+            self.totals = totals
+            self.notify()
+
+    def notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def get_counts(self):
+        """Return (words, characters, lines, bytes) as they'd be saved, or None while suspended."""
+        if self.totals is None:
+            return None
+        words, characters, size = self.totals
+        lines = self.document.line_count
+        encoding, bom, newline = self.text_format.encoding, self.text_format.bom, self.text_format.newline
+        # the buffer holds "\n" for every line ending the file has
+        newline_size = len(newline.encode(encoding)) - len("\n".encode(encoding)) if newline else 0
+        return words, characters, lines, len(bom) + size + (lines - 1) * newline_size
+
+
+def apply_edit(blocks, inserted, start, end):
+    if inserted:
+        blocks.insert(start, end)
+    else:
+        blocks.delete(start, end)
+
+
+class StatusBar(Gtk.Box):
+    """
+    Cursor line and column, line count, selection size and DocumentStatistics of a text buffer.
+
+    Positions are looked up in the document's PieceTable, whose line index is
+    kept up to date as the buffer is edited, so an update costs O(log n)
+    however long the document is; updates are batched into one per main loop
+    iteration.
+    """
+
+    def __init__(self, buffer, document, statistics):
+        super().__init__(orientation=Gtk.Orientation.HORIZONTAL, spacing=18)
+        self.buffer = buffer
+        self.document = document
+        self.statistics = statistics
+        self.update_id = 0
+        self.set_margin_start(10)
+        self.set_margin_end(10)
+        self.set_margin_top(3)
+        self.set_margin_bottom(3)
+        self.add_css_class("dim-label")
+
+        self.position_label = Gtk.Label(xalign=0)
+        self.position_label.set_hexpand(True)
+        self.append(self.position_label)
+        self.selection_label = Gtk.Label()
+        self.append(self.selection_label)
+        self.statistics_label = Gtk.Label()
+        self.append(self.statistics_label)
+        self.lines_label = Gtk.Label()
+        self.append(self.lines_label)
+        self.format_label = Gtk.Label()
+        self.append(self.format_label)
+        self.set_text_format(DEFAULT_FORMAT)
+
+        buffer.connect("notify::cursor-position", self.on_buffer_changed)
+        buffer.connect("mark-set", self.on_mark_set)
+        buffer.connect("changed", self.on_buffer_changed)
+        statistics.listeners.append(self.queue_update)
+        self.update()
+
+    def set_text_format(self, text_format):
+        self.format_label.set_text(describe(text_format))
+
+    def detach(self):
+        """Stop following the buffer, which outlives this status bar."""
+        self.buffer.disconnect_by_func(self.on_buffer_changed)
+        self.buffer.disconnect_by_func(self.on_mark_set)
+        self.statistics.listeners.remove(self.queue_update)
+        if self.update_id:
+            GLib.source_remove(self.update_id)
+            self.update_id = 0
+
+    def on_mark_set(self, buffer, location, mark):
+        if mark == buffer.get_selection_bound():
+            self.queue_update()
+
+    def on_buffer_changed(self, buffer, *args):
+        self.queue_update()
+
+    def queue_update(self):
+        if not self.update_id:
+            self.update_id = GLib.idle_add(self.update)
+
+    def update(self):
+        self.update_id = 0
+        cursor = self.buffer.get_iter_at_mark(self.buffer.get_insert()).get_offset()
+        bound = self.buffer.get_iter_at_mark(self.buffer.get_selection_bound()).get_offset()
+        line = self.document.offset_to_line(cursor)
+        column = cursor - self.document.line_to_offset(line)
+        self.position_label.set_text(f"Ln {line + 1}, Col {column + 1}")
+        if cursor != bound:
+            characters = abs(cursor - bound)
+            lines = abs(line - self.document.offset_to_line(bound)) + 1
+            text = f"{characters:,} selected"
+            if lines > 1:
+                text += f" ({lines:,} lines)"
+            self.selection_label.set_text(text)
+        else:
+            self.selection_label.set_text("")
+        counts = self.statistics.get_counts()
+        if counts:
+            words, characters, _, size = counts
+            self.statistics_label.set_text(f"{words:,} word" + ("" if words == 1 else "s")
+                                           + f" · {characters:,} character" + ("" if characters == 1 else "s")
+                                           + f" · {GLib.format_size(size)}")
+            self.statistics_label.set_tooltip_text(f"{size:,} bytes")
+        else:
+            self.statistics_label.set_text("")
+            self.statistics_label.set_tooltip_text(None)
+        line_count = self.document.line_count
+        self.lines_label.set_text(f"{line_count:,} line" + ("" if line_count == 1 else "s"))
+        return GLib.SOURCE_REMOVE
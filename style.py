@@ -0,0 +1,44 @@
+from gi.repository import Gtk
+
+
+class StyleManager:
+    """
+    The single application CssProvider of a display.
+
+    Adding a provider to a display makes GTK re-resolve the styles of every
+    widget on it, and providers can't be told apart once added, so instead of
+    adding one per font size change a StyleManager adds one provider, once, and
+    reloads its CSS in place.
+    """
+
+    MIN_FONT_SIZE = 8
+    MAX_FONT_SIZE = 72
+    ZOOM_STEP = 2
+
+    managers = {}
+
+    @classmethod
+    def for_display(cls, display):
+        manager = cls.managers.get(display)
+        if manager is None:
+            manager = cls.managers[display] = cls(display)
+        return manager
+
+    def __init__(self, display):
+        self.font_size = None
+        self.provider = Gtk.CssProvider()
+        Gtk.StyleContext.add_provider_for_display(display,
+                                                  self.provider,
+                                                  Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+
+    def set_font_size(self, font_size):
+        """Set the text view font size in pixels, returning the size actually used."""
+        font_size = max(self.MIN_FONT_SIZE, min(font_size, self.MAX_FONT_SIZE))
+        if font_size != self.font_size:
+            self.font_size = font_size
+            css = f"textview {{font-size: {font_size}px;}}"
+            if hasattr(self.provider, "load_from_string"):  # GTK 4.12+
+                self.provider.load_from_string(css)
+            else:
+                self.provider.load_from_data(css.encode())
+        return font_size
@@ -0,0 +1,317 @@
+import os
+
+from gi.repository import Adw, Gio, GObject
+
+from page import DocumentPage, LinkedPage
+from settings_store import SettingsStore
+
+
+class DocumentTabs:
+    """
+    The DocumentPages of a window, one per tab of its Adw.TabView.
+
+    Keeps the window title in step with the selected page, tells pages when
+    they're shown and hidden so they load lazily and unload when idle, asks
+    before closing a tab or the window with unsaved changes, and records the
+    open files as the session to restore on the next start.
+
+    A tab can also hold a LinkedPage, a view of a document whose
+    DocumentPage is in another window; closing that DocumentPage's tab
+    moves it into the window of its first LinkedPage instead of closing it.
+    """
+
+    def __init__(self, window, tab_view, window_title):
+        self.window = window
+        self.tab_view = tab_view
+        self.window_title = window_title
+        self.settings = SettingsStore.get_default()
+        self.wrap = self.settings.get_boolean("wrap-mode")
+        self.follow = False
+        self.selected_page = None
+        self.title_bindings = []
+        self.closing = False
+        self.discard_confirmed = False  # the unsaved changes of the window's pages may be lost
+        # Ctrl+Home and Ctrl+End move the cursor in the text, not between tabs
+        self.tab_view.remove_shortcuts(Adw.TabViewShortcuts.CONTROL_HOME |
+                                       Adw.TabViewShortcuts.CONTROL_END |
+                                       Adw.TabViewShortcuts.CONTROL_SHIFT_HOME |
+                                       Adw.TabViewShortcuts.CONTROL_SHIFT_END)
+        self.tab_view.connect("notify::selected-page", self.on_selected_page_changed)
+        self.tab_view.connect("close-page", self.on_close_page)
+        self.tab_view.connect("page-detached", self.on_page_detached)
+
+    def get_pages(self):
+        return [self.tab_view.get_nth_page(i).get_child() for i in range(self.tab_view.get_n_pages())]
+
+    @property
+    def current(self):
+        tab_page = self.tab_view.get_selected_page()
+        return tab_page.get_child() if tab_page else None
+
+    def add(self, file=None, select=True, load=False):
+        """Add a page, for file if given, which is loaded now if load is set, else once the page is shown."""
+        page = DocumentPage(self.wrap)
+        page.follow = self.follow
+        if file and load:
+            page.load_file(file)
+        elif file:
+            page.set_file(file)
+        return self.append(page, select)
+
+    def add_view_of(self, page):
+        """Add a tab showing the document of page, from another window, in place of a blank document."""
+        blank = self.current if self.current and self.current.is_blank() else None
+        linked_page = self.append(LinkedPage(page.owner, self.wrap), True)
+        if blank:
+            self.tab_view.close_page(self.tab_view.get_page(blank))
+        return linked_page
+
+    def append(self, page, select):
+        tab_page = self.tab_view.append(page)
+        page.bind_property("title", tab_page, "title", GObject.BindingFlags.SYNC_CREATE)
+        page.bind_property("subtitle", tab_page, "tooltip", GObject.BindingFlags.SYNC_CREATE)
+        page.bind_property("loading", tab_page, "loading", GObject.BindingFlags.SYNC_CREATE)
+        if select:
+            self.tab_view.set_selected_page(tab_page)
+        return page
+
+    def open(self, file, select=True, load=False):
+        """Open file: in its tab if it's open already, else in a new one or in place of a blank document."""
+        for page in self.get_pages():
+            opened = page.current_file or page.pending_file
+            if opened and opened.equal(file):
+                if select:
+                    self.select(page)
+                return page
+        page = self.current
+        if page and page.is_blank():
+            page.load_file(file)
+            if select:
+                self.select(page)
+            return page
+        return self.add(file, select, load)
+
+    def open_at(self, file, line):
+        """Open file, as open() does, with the cursor on its 0-based line."""
+        self.open(file).show_line(line)
+
+    def open_all(self, files):
+        """
+        Open several files at once, e.g. from the command line, showing the last.
+
+        They're all loaded right away: each FileLoader reads asynchronously,
+        so their chunks interleave on the main loop instead of one file
+        waiting for the other.
+        """
+        for i, file in enumerate(files):
+            self.open(file, select=i == len(files) - 1, load=True)
+
+    def select(self, page):
+        self.tab_view.set_selected_page(self.tab_view.get_page(page))
+
+    def close_current(self):
+        tab_page = self.tab_view.get_selected_page()
+        if tab_page:
+            self.tab_view.close_page(tab_page)
+
+    def set_wrap(self, wrap):
+        self.wrap = wrap
+        for page in self.get_pages():
+            page.set_wrap(wrap)
+
+    def set_follow(self, follow):
+        self.follow = follow
+        for page in self.get_pages():
+            page.follow = follow
+
+    def on_selected_page_changed(self, tab_view, param):
+        if self.selected_page:
+            self.selected_page.on_hidden()
+        self.unbind_title()
+        self.selected_page = self.current
+        if self.selected_page is None:
+            return
+        self.title_bindings = [
+            self.selected_page.bind_property("title", self.window_title, "title", GObject.BindingFlags.SYNC_CREATE),
+            self.selected_page.bind_property("subtitle", self.window_title, "subtitle", GObject.BindingFlags.SYNC_CREATE),
+        ]
+        self.selected_page.on_shown()
+        self.selected_page.focus_text()
+
+    def unbind_title(self):
+        for binding in self.title_bindings:
+            binding.unbind()
+        self.title_bindings = []
+
+    def on_close_page(self, tab_view, tab_page):
+        page = tab_page.get_child()
+        if page.saver:
+            self.window.show_toast("Wait for the save to finish")
+            self.tab_view.close_page_finish(tab_page, False)
+        elif page.linked_pages:
+            # still open elsewhere: nothing to save or lose
+            self.tab_view.close_page_finish(tab_page, False)
+            self.hand_over(page)
+        elif page.has_unsaved_changes():
+            self.prompt_save_changes(tab_page)
+        else:
+            self.finish_closing(tab_page)
+        return True  # closing is confirmed by finish_closing
+
+    def prompt_save_changes(self, tab_page):
+        dialog = Adw.MessageDialog.new(self.window)
+        dialog.set_heading("Save changes?")
+        dialog.set_body(f"{tab_page.get_child().title.removeprefix('* ')} has unsaved changes. Do you want to save them?")
+        dialog.add_response("cancel", "Cancel")
+        dialog.add_response("discard", "Discard")
+        dialog.add_response("save", "Save")
+        dialog.set_default_response("save")
+        dialog.set_close_response("cancel")
+        dialog.connect("response", self.on_save_changes_response, tab_page)
+        dialog.present()
+
+    def on_save_changes_response(self, dialog, response, tab_page):
+        page = tab_page.get_child()
+        if response == "save":
+            def on_saved(success):
+                if success:
+                    self.finish_closing(tab_page)
+                else:
+                    self.tab_view.close_page_finish(tab_page, False)
+            page.save_file(on_saved)
+        elif response == "discard":
+            self.finish_closing(tab_page)
+        else:
+            self.tab_view.close_page_finish(tab_page, False)
+
+    def finish_closing(self, tab_page):
+        if self.tab_view.get_n_pages() == 1:
+            # a window always has a document to type into
+            self.add()
+        tab_page.get_child().close()
+        self.tab_view.close_page_finish(tab_page, True)
+
+    def hand_over(self, page):
+        """Move page, being closed while it has LinkedPages, in place of one, preferably in another window."""
+        linked_page = next((linked_page for linked_page in page.linked_pages
+                            if linked_page.get_root() is not self.window), page.linked_pages[0])
+        tabs = linked_page.get_root().tabs
+        linked_tab_page = tabs.tab_view.get_page(linked_page)
+        selected = tabs.tab_view.get_selected_page() is linked_tab_page
+        position = tabs.tab_view.get_page_position(linked_tab_page)
+        if tabs is self:
+            self.tab_view.reorder_page(self.tab_view.get_page(page), position)
+        else:
+            if self.tab_view.get_n_pages() == 1 and not self.closing:
+                self.add()
+            self.tab_view.transfer_page(self.tab_view.get_page(page), tabs.tab_view, position)
+        page.set_wrap(tabs.wrap)
+        page.follow = tabs.follow
+        if selected:
+            tabs.select(page)
+        tabs.tab_view.close_page(linked_tab_page)
+
+    def on_page_detached(self, tab_view, tab_page, position):
+        if tab_page.get_child() is self.selected_page:
+            self.unbind_title()
+            self.selected_page = None
+        if tab_view.get_n_pages() == 0 and not self.closing:
+            # its last tab was dragged to another window
+            self.window.close()
+
+    def prepare_close(self):
+        """
+        Get every page ready for the window to close.
+
+        Returns False if a save is still running, in which case the window
+        is closed again once it has finished, or if pages have unsaved
+        changes, in which case the user is asked what to do with them first.
+        Until then every page, and its crash-recovery journal, is left as is.
+        """
+        pages = self.get_pages()
+        saving = [page for page in pages if page.saver]
+        for page in saving:
+            # let the save complete, then close
+            page.saver.on_finished = page.on_save_finished_before_close
+        if saving:
+            self.discard_confirmed = False
+            return False
+        unsaved = [page for page in pages if page.has_unsaved_changes() and not self.is_open_elsewhere(page)]
+        if unsaved and not self.discard_confirmed:
+            self.prompt_save_before_close(unsaved)
+            return False
+        for page in pages:
+            if page.loader:
+                page.loader.cancel()
+        self.closing = True
+        if pages:
+            self.save_session()
+        for page in pages:
+            if self.is_open_elsewhere(page):
+                self.hand_over(page)
+            else:
+                page.close()
+        return True
+
+    def is_open_elsewhere(self, page):
+        """Whether page has a LinkedPage in another window, which it's handed over to instead of being closed."""
+        return any(linked_page.get_root() is not self.window for linked_page in page.linked_pages)
+
+    def prompt_save_before_close(self, pages):
+        names = ", ".join(page.title.removeprefix("* ") for page in pages)
+        dialog = Adw.MessageDialog.new(self.window)
+        dialog.set_heading("Save changes?")
+        dialog.set_body(f"{names} {'has' if len(pages) == 1 else 'have'} unsaved changes. "
+                        "Do you want to save them?")
+        dialog.add_response("cancel", "Cancel")
+        dialog.add_response("discard", "Discard")
+        dialog.add_response("save", "Save")
+        dialog.set_default_response("save")
+        dialog.set_close_response("cancel")
+        dialog.connect("response", self.on_save_before_close_response, pages)
+        dialog.present()
+
+    def on_save_before_close_response(self, dialog, response, pages):
+        if response == "save":
+            self.save_before_close(pages)
+        elif response == "discard":
+            self.discard_confirmed = True
+            self.window.close()
+
+    def save_before_close(self, pages):
+        """Save pages one after the other, then close the window; a save that fails or is cancelled keeps it open."""
+        if not pages:
+            self.window.close()
+            return
+
+        def on_saved(success):
+            if success:
+                self.save_before_close(pages[1:])
+        pages[0].save_file(on_saved)
+
+    def save_session(self):
+        # the last window closed is the one whose files are reopened
+        paths = []
+        selected = 0
+        for page in self.get_pages():
+            file = page.current_file or page.pending_file
+            if file and file.get_path():
+                if page is self.current:
+                    selected = len(paths)
+                paths.append(file.get_path())
+        self.settings.set_strv("open-files", paths)
+        self.settings.set_int("selected-file", selected)
+
+    def restore_session(self):
+        """Add a tab for each file open when texty was last closed; only the selected one is loaded."""
+        paths = self.settings.get_strv("open-files")
+        selected = self.settings.get_int("selected-file")
+        selected_path = paths[selected] if 0 <= selected < len(paths) else None
+        paths = [path for path in paths if os.path.isfile(path)]
+        if not paths:
+            return
+        blank = self.current if self.current and self.current.is_blank() else None
+        pages = [self.add(Gio.File.new_for_path(path), select=False) for path in paths]
+        self.select(pages[paths.index(selected_path)] if selected_path in paths else pages[0])
+        if blank:
+            self.tab_view.close_page(self.tab_view.get_page(blank))
@@ -0,0 +1,84 @@
+import time
+
+from change_tracker import ChangeTracker
+from piece_table import PieceTable
+
+
+def saved_tracker(text, block_size=8):
+    document = PieceTable(text)
+    tracker = ChangeTracker(document)
+    tracker.BLOCK_SIZE = block_size
+    tracker.mark_saved()
+    deadline = time.monotonic() + 5
+    while tracker.block_hashes is None and time.monotonic() < deadline:
+        time.sleep(0.001)  # hashed on a worker thread
+    assert tracker.block_hashes is not None
+    return document, tracker
+
+
+def insert(document, tracker, offset, text):
+    document.insert(offset, text)
+    tracker.inserted(offset, len(text))
+
+
+def delete(document, tracker, start, end):
+    document.delete(start, end)
+    tracker.deleted(start, end)
+
+
+def test_unchanged_after_save():
+    document, tracker = saved_tracker("some saved text\n")
+    assert tracker.is_unchanged()
+
+
+def test_insert_widens_the_dirty_range():
+    document, tracker = saved_tracker("0123456789" * 4)
+    insert(document, tracker, 12, "ab")
+    assert (tracker.dirty_start, tracker.dirty_end) == (12, 14)
+    insert(document, tracker, 5, "c")
+    assert (tracker.dirty_start, tracker.dirty_end) == (5, 15)
+    assert not tracker.may_be_unchanged()
+    assert tracker.is_unchanged() is False
+
+
+def test_delete_shrinks_the_dirty_range():
+    document, tracker = saved_tracker("0123456789" * 4)
+    insert(document, tracker, 10, "abcd")
+    delete(document, tracker, 11, 13)
+    assert (tracker.dirty_start, tracker.dirty_end) == (10, 12)
+
+
+def test_typing_and_deleting_back_is_unchanged():
+    document, tracker = saved_tracker("0123456789" * 4)
+    insert(document, tracker, 20, "typo")
+    delete(document, tracker, 20, 24)
+    assert tracker.may_be_unchanged()
+    assert tracker.is_unchanged() is True
+    assert tracker.dirty_start is None
+
+
+def test_same_length_edit_is_detected():
+    document, tracker = saved_tracker("0123456789" * 4)
+    delete(document, tracker, 3, 4)
+    insert(document, tracker, 3, "X")
+    assert tracker.may_be_unchanged()
+    assert tracker.is_unchanged() is False
+
+
+def test_forget_is_never_unchanged():
+    document, tracker = saved_tracker("abc")
+    insert(document, tracker, 0, "x")
+    tracker.forget()
+    delete(document, tracker, 0, 1)
+    assert tracker.is_unchanged() is None
+
+
+def test_appended_text_is_saved_too():
+    document, tracker = saved_tracker("line one\n")
+    start = len(document)
+    insert(document, tracker, start, "line two\n")
+    tracker.mark_appended_saved(start)
+    assert tracker.is_unchanged()
+    insert(document, tracker, len(document), "x")
+    delete(document, tracker, len(document) - 1, len(document))
+    assert tracker.is_unchanged() is True
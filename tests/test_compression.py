@@ -0,0 +1,115 @@
+import bz2
+import gzip
+import lzma
+import os
+
+import pytest
+
+from compression import (Compressor, Decompressor, compression_for_name, decompress_all, detect_compression,
+                         detect_file_compression)
+
+COMPRESSIONS = ["gzip", "bz2", "xz"]
+
+
+def compress(data, compression, chunk_size=1000):
+    compressor = Compressor(compression)
+    pieces = [compressor.compress(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    pieces.append(compressor.flush())
+    return b"".join(pieces)
+
+
+def decompress(data, compression, chunk_size=100):
+    decompressor = Decompressor(compression)
+    pieces = []
+    for i in range(0, len(data), chunk_size):
+        pieces.append(decompressor.decompress(data[i:i + chunk_size]))
+        while not decompressor.needs_input:
+            pieces.append(decompressor.decompress(b""))
+    decompressor.finish()
+    return b"".join(pieces)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_round_trip(compression):
+    data = b"".join(b"line %d of the file\n" % i for i in range(5000)) + os.urandom(2000)
+    compressed = compress(data, compression)
+    assert detect_compression(compressed) == compression
+    assert decompress(compressed, compression) == data
+
+
+@pytest.mark.parametrize("compression, module", [("gzip", gzip), ("bz2", bz2), ("xz", lzma)])
+def test_reads_what_the_standard_library_writes(compression, module):
+    data = b"hello\n" * 1000
+    assert decompress(module.compress(data), compression) == data
+    assert module.decompress(compress(data, compression)) == data
+
+
+@pytest.mark.parametrize("compression", ["gzip", "bz2"])
+def test_concatenated_streams(compression):
+    compressed = compress(b"first\n", compression) + compress(b"second\n", compression)
+    assert decompress(compressed, compression, chunk_size=7) == b"first\nsecond\n"
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_truncated_file(compression):
+    compressed = compress(b"some text\n" * 100, compression)
+    with pytest.raises(ValueError):
+        decompress(compressed[:len(compressed) // 2], compression)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_invalid_data(compression):
+    with pytest.raises(ValueError):
+        Decompressor(compression).decompress(b"this is not compressed at all")
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_output_is_bounded(compression, monkeypatch):
+    monkeypatch.setattr(Decompressor, "OUTPUT_SIZE", 1000)
+    data = b"".join(b"%d\n" % i for i in range(20000))
+    compressed = compress(data, compression)
+    decompressor = Decompressor(compression)
+    pieces = [decompressor.decompress(compressed)]
+    while not decompressor.needs_input:
+        pieces.append(decompressor.decompress(b""))
+    decompressor.finish()
+    assert b"".join(pieces) == data
+    assert all(len(piece) <= 1000 for piece in pieces)
+    assert len(pieces) > len(data) // 1000
+
+
+@pytest.mark.parametrize("compression", ["gzip", "bz2"])
+def test_output_is_bounded_across_streams(compression, monkeypatch):
+    monkeypatch.setattr(Decompressor, "OUTPUT_SIZE", 10)
+    compressed = compress(b"a" * 25, compression) + compress(b"b" * 25, compression)
+    assert decompress(compressed, compression, chunk_size=len(compressed)) == b"a" * 25 + b"b" * 25
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_decompress_all(compression, monkeypatch):
+    monkeypatch.setattr(Decompressor, "OUTPUT_SIZE", 100)
+    data = b"some text\n" * 1000
+    assert decompress_all(compress(data, compression), compression) == data
+    with pytest.raises(ValueError):
+        decompress_all(compress(data, compression)[:-10], compression)
+
+
+def test_empty_file_is_not_truncated():
+    decompressor = Decompressor("gzip")
+    assert decompressor.decompress(b"") == b""
+    decompressor.finish()
+
+
+def test_detection():
+    assert detect_compression(b"plain text") is None
+    assert detect_compression(b"") is None
+    assert compression_for_name("notes.TXT.GZ") == "gzip"
+    assert compression_for_name("archive.tar.xz") == "xz"
+    assert compression_for_name("notes.txt") is None
+
+
+def test_detect_file_compression(tmp_path):
+    path = tmp_path / "notes"
+    path.write_bytes(compress(b"text", "bz2"))
+    assert detect_file_compression(str(path)) == "bz2"
+    assert detect_file_compression(str(tmp_path / "missing")) is None
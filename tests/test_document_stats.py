@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from document_stats import BlockStatistics, count_block
+from long_lines import SPLIT
+from piece_table import PieceTable
+
+
+def expected(text, encoding):
+    text = text.replace(SPLIT, "")
+    return len(text.split()), len(text), len(text.encode(encoding, "replace"))
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(BlockStatistics, "BLOCK_SIZE", 16)
+
+
+def test_count_block():
+    counts = count_block(" two words\n", "utf-8")
+    assert (counts.words, counts.characters, counts.size) == (2, 11, 11)
+    assert not counts.starts_word and not counts.ends_word
+    assert count_block("é" + SPLIT + "é", "utf-16-le").size == 4
+
+
+def test_word_cut_by_a_block_boundary_counts_once(small_blocks):
+    text = "a" * 20 + " b"
+    statistics = BlockStatistics.count_all(PieceTable(text), "utf-8")
+    assert len(statistics.lengths) == 2
+    assert statistics.totals() == (2, 22, 22)
+
+
+def test_display_splits_are_not_counted(small_blocks):
+    text = "abcdefghijklmno" + SPLIT + "pqr stu"
+    statistics = BlockStatistics.count_all(PieceTable(text), "utf-8")
+    assert statistics.totals() == expected(text, "utf-8")
+
+
+def test_typing_recounts_one_block(small_blocks):
+    document = PieceTable("word " * 20)
+    statistics = BlockStatistics.count_all(document, "utf-8")
+    document.insert(42, "new ")
+    statistics.insert(42, 4)
+    assert statistics.dirty_size() == 20
+    statistics.recount(document)
+    assert statistics.totals() == expected(document.get_text(), "utf-8")
+
+
+def test_typing_near_the_start_does_not_walk_every_block(small_blocks):
+    document = PieceTable("word " * 200)
+    statistics = BlockStatistics.count_all(document, "utf-8")
+    for offset in range(5, 10):
+        document.insert(offset, "x")
+        statistics.insert(offset, 1)
+        assert len(statistics.ends) <= 1
+    statistics.recount(document)
+    assert len(statistics.ends) <= 1
+    assert statistics.totals() == expected(document.get_text(), "utf-8")
+
+
+def test_cancelled_count():
+    assert BlockStatistics.count_all(PieceTable("abc"), "utf-8", lambda: True) is None
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-16-le", "cp1252"])
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits_match_a_full_count(small_blocks, encoding, seed):
+    rng = random.Random(seed)
+    alphabet = "ab c\n\té" + SPLIT
+    document = PieceTable("".join(rng.choice(alphabet) for _ in range(rng.randrange(200))))
+    statistics = BlockStatistics.count_all(document, encoding)
+    for _ in range(40):
+        if len(document) and rng.random() < 0.5:
+            start = rng.randrange(len(document))
+            end = min(len(document), start + rng.randrange(1, 60))
+            document.delete(start, end)
+            statistics.delete(start, end)
+        else:
+            offset = rng.randrange(len(document) + 1)
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(1, 50)))
+            document.insert(offset, text)
+            statistics.insert(offset, len(text))
+        assert sum(statistics.lengths) == len(document)
+        if rng.random() < 0.3:
+            statistics.recount(document)
+            assert statistics.totals() == expected(document.get_text(), encoding)
+    statistics.recount(document)
+    assert statistics.totals() == expected(document.get_text(), encoding)
+    assert all(length <= 2 * BlockStatistics.BLOCK_SIZE for length in statistics.lengths)
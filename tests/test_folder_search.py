@@ -0,0 +1,135 @@
+import os
+import re
+
+import pytest
+
+from folder_search import FolderSearch, compile_bytes_pattern, is_ignored, read_ignore_file
+
+
+def write(root, relative_path, data):
+    path = root / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data.encode("utf-8") if isinstance(data, str) else data)
+    return str(path)
+
+
+def search(root, text, **kwargs):
+    results = []
+    finished = []
+    folder_search = FolderSearch(str(root), compile_bytes_pattern(text, **kwargs), results.extend, finished.append)
+    folder_search.run()
+    assert finished == [folder_search]
+    return folder_search, sorted(results)
+
+
+def test_read_ignore_file(tmp_path):
+    write(tmp_path, ".gitignore", "# build output\n\nbuild/\n*.log\n!keep.log\n/docs/*.html\n  spaced  \n")
+    assert read_ignore_file(str(tmp_path)) == [
+        ("build", False, True),
+        ("*.log", False, False),
+        ("docs/*.html", True, False),
+        ("spaced", False, False),
+    ]
+    assert read_ignore_file(str(tmp_path / "missing")) == []
+
+
+def test_is_ignored():
+    rules = [("", [("build", False, True), ("*.log", False, False)]),
+             ("sub", [("docs/*.html", True, False)])]
+    assert is_ignored("build", "build", True, rules)
+    assert not is_ignored("build", "build", False, rules)  # a file named build
+    assert is_ignored("a/b/debug.log", "debug.log", False, rules)
+    assert is_ignored("sub/docs/index.html", "index.html", False, rules)
+    assert not is_ignored("docs/index.html", "index.html", False, rules)
+    assert not is_ignored("sub/other/docs/index.html", "index.html", False, rules)
+
+
+def test_walk_leaves_out_ignored_files(tmp_path):
+    write(tmp_path, ".gitignore", "*.log\nbuild/\n")
+    write(tmp_path, "a.txt", "")
+    write(tmp_path, "debug.log", "")
+    write(tmp_path, "build/out.txt", "")
+    write(tmp_path, ".git/config", "")
+    write(tmp_path, "node_modules/x.js", "")
+    write(tmp_path, "src/.gitignore", "gen/*.py\n")
+    write(tmp_path, "src/gen/generated.py", "")
+    write(tmp_path, "src/main.py", "")
+    write(tmp_path, "src/deep/gen/generated.py", "")
+    write(tmp_path, "gen/generated.py", "")
+    folder_search = FolderSearch(str(tmp_path), compile_bytes_pattern("x"), None)
+    found = [os.path.relpath(path, tmp_path) for path in folder_search.walk()]
+    assert found == [".gitignore", "a.txt", "gen/generated.py", "src/.gitignore", "src/main.py",
+                     "src/deep/gen/generated.py"]
+
+
+def test_find_numbers_lines_from_zero(tmp_path):
+    folder_search = FolderSearch(str(tmp_path), compile_bytes_pattern("needle"), None)
+    data = b"needle\nhay\r\nhay needle NEEDLE\r\n\nlast needle"
+    assert folder_search.find("f", data) == [
+        ("f", 0, "needle"),
+        ("f", 2, "hay needle NEEDLE"),
+        ("f", 4, "last needle"),
+    ]
+    assert folder_search.match_count == 3
+
+
+def test_find_cuts_long_lines(tmp_path):
+    folder_search = FolderSearch(str(tmp_path), compile_bytes_pattern("x"), None)
+    [(path, line, text)] = folder_search.find("f", b"x" * 1000)
+    assert text == "x" * FolderSearch.MAX_LINE_LENGTH
+
+
+def test_search(tmp_path):
+    write(tmp_path, "one.txt", "alpha\nbeta\nAlpha beta\n")
+    write(tmp_path, "dir/two.txt", "gamma\nalphabet\n")
+    write(tmp_path, "binary.bin", b"alpha\0")
+    write(tmp_path, "none.txt", "nothing here\n")
+    folder_search, results = search(tmp_path, "alpha")
+    assert [(os.path.relpath(path, tmp_path), line, text) for path, line, text in results] == [
+        ("dir/two.txt", 1, "alphabet"),
+        ("one.txt", 0, "alpha"),
+        ("one.txt", 2, "Alpha beta"),
+    ]
+    assert (folder_search.files_searched, folder_search.files_skipped) == (3, 1)
+    assert not folder_search.truncated and not folder_search.cancelled
+
+
+def test_search_options(tmp_path):
+    write(tmp_path, "a.txt", "Alpha\nalpha\na.pha\n")
+    assert len(search(tmp_path, "alpha", case_sensitive=True)[1]) == 1
+    assert len(search(tmp_path, "a.pha")[1]) == 1
+    assert len(search(tmp_path, "a.pha", regex=True)[1]) == 3
+    assert len(search(tmp_path, "^a", regex=True, case_sensitive=True)[1]) == 2
+
+
+def test_large_files_are_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(FolderSearch, "MMAP_SIZE", 100)
+    write(tmp_path, "big.txt", "filler\n" * 100 + "found\n")
+    folder_search, results = search(tmp_path, "found")
+    assert [(line, text) for path, line, text in results] == [(100, "found")]
+
+
+def test_stops_at_max_matches(tmp_path, monkeypatch):
+    monkeypatch.setattr(FolderSearch, "MAX_MATCHES", 5)
+    for i in range(4):
+        write(tmp_path, f"{i}.txt", "match\n" * 3)
+    folder_search, results = search(tmp_path, "match")
+    assert len(results) == folder_search.match_count == 5
+    assert folder_search.truncated
+    assert not folder_search.cancelled
+
+
+def test_exactly_max_matches_is_not_truncated(tmp_path, monkeypatch):
+    monkeypatch.setattr(FolderSearch, "MAX_MATCHES", 6)
+    write(tmp_path, "a.txt", "match\n" * 3)
+    write(tmp_path, "b.txt", "match\n" * 3)
+    write(tmp_path, "c.txt", "nothing\n")
+    folder_search, results = search(tmp_path, "match")
+    assert len(results) == folder_search.match_count == 6
+    assert not folder_search.truncated
+    assert folder_search.files_searched == 3
+
+
+def test_invalid_regex():
+    with pytest.raises(re.error):
+        compile_bytes_pattern("(", regex=True)
@@ -0,0 +1,95 @@
+import pytest
+
+pytest.importorskip("gi")
+
+from gi.repository import Gio  # noqa: E402
+
+from highlight import JsonLexer, LogLexer, PythonLexer, YamlLexer, iter_lines, lexer_for_file  # noqa: E402
+from piece_table import PieceTable  # noqa: E402
+
+
+def lex(lexer, text, state=None):
+    """Lex text line by line, carrying the state over, returning each line's tokens as (text, kind)."""
+    lines = []
+    for line in text.split("\n"):
+        tokens, state = lexer.lex_line(line, state)
+        lines.append([(line[start:end], kind) for start, end, kind in tokens])
+    return lines, state
+
+
+def test_python_tokens():
+    [tokens], state = lex(PythonLexer(), "def f(x): return len(x) + 0x1F  # done")
+    assert tokens == [("def", "keyword"), ("f", "function"), ("return", "keyword"), ("len", "builtin"),
+                      ("0x1F", "number"), ("# done", "comment")]
+    assert state is None
+
+
+def test_python_strings_and_decorators():
+    [decorator, line], state = lex(PythonLexer(), "@functools.cache\nx = 'a # not a comment' + \"b\\\"\" # c")
+    assert decorator == [("@functools.cache", "decorator")]
+    assert line == [("'a # not a comment'", "string"), ('"b\\""', "string"), ("# c", "comment")]
+
+
+def test_triple_quoted_string_carries_over_lines():
+    lines, state = lex(PythonLexer(), 'x = """start\nmiddle "" \'\'\'\nend""" if True else None')
+    assert lines == [[('"""start', "string")],
+                     [("middle \"\" '''", "string")],
+                     [('end"""', "string"), ("if", "keyword"), ("True", "constant"), ("else", "keyword"),
+                      ("None", "constant")]]
+    assert state is None
+
+
+def test_open_string_state_is_the_delimiter():
+    lexer = PythonLexer()
+    tokens, state = lexer.lex_line("s = '''open", None)
+    assert state == "'''"
+    assert lexer.lex_line("", state) == ([], state)
+    assert lexer.lex_line('""" not closing', state) == ([(0, 15, "string")], state)
+    tokens, state = lexer.lex_line("\\''' still open", state)
+    assert state == "'''"
+    tokens, state = lexer.lex_line("\\\\''' closed", state)
+    assert tokens == [(0, 5, "string")] and state is None
+
+
+def test_lexing_again_reaches_the_same_state():
+    # what lets the highlighter stop re-lexing after an edit
+    lexer = PythonLexer()
+    text = 'a = 1\nb = """\ndoc\n"""\nc = 2'
+    states = [None]
+    for line in text.split("\n"):
+        states.append(lexer.lex_line(line, states[-1])[1])
+    assert states == [None, None, '"""', '"""', None, None]
+
+
+def test_json_keys_and_values():
+    [tokens], state = lex(JsonLexer(), '{"key": "value", "n": -1.5e3, "ok": true, "none": null}')
+    assert tokens == [('"key"', "key"), ('"value"', "string"), ('"n"', "key"), ("-1.5e3", "number"),
+                      ('"ok"', "key"), ("true", "constant"), ('"none"', "key"), ("null", "constant")]
+    assert state is JsonLexer.initial_state
+
+
+def test_yaml():
+    lines, state = lex(YamlLexer(), "---\nname: texty  # editor\n- version: 1.0\nenabled: yes")
+    assert lines == [[("---", "keyword")],
+                     [("name", "key"), ("# editor", "comment")],
+                     [("version", "key"), ("1.0", "number")],
+                     [("enabled", "key"), ("yes", "constant")]]
+
+
+def test_log_levels():
+    [tokens], state = lex(LogLexer(), '2024-05-01 12:00:00,123 ERROR failed to open "a.txt"')
+    assert tokens == [("2024-05-01 12:00:00,123", "timestamp"), ("ERROR", "error"), ('"a.txt"', "string")]
+
+
+def test_lexer_for_file():
+    assert isinstance(lexer_for_file(Gio.File.new_for_path("/tmp/setup.PY")), PythonLexer)
+    assert isinstance(lexer_for_file(Gio.File.new_for_path("/tmp/data.jsonl")), JsonLexer)
+    assert lexer_for_file(Gio.File.new_for_path("/tmp/notes.txt")) is None
+    assert lexer_for_file(None) is None
+
+
+def test_iter_lines():
+    document = PieceTable("zero\none\n")
+    document.insert(5, "half ")
+    assert list(iter_lines(document, 0)) == ["zero", "half one", ""]
+    assert list(iter_lines(document, 1)) == ["half one", ""]
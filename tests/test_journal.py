@@ -0,0 +1,152 @@
+import os
+import random
+
+import pytest
+
+pytest.importorskip("gi")
+
+from gi.repository import Gio  # noqa: E402
+
+import journal  # noqa: E402
+from journal import Journal, discard_journal, read_journal, write_records, write_snapshot  # noqa: E402
+from piece_table import PieceTable  # noqa: E402
+from text_format import TextFormat  # noqa: E402
+
+
+class Location:
+    """Stands in for the Gtk.TextIter the buffer signals pass."""
+
+    def __init__(self, offset):
+        self.offset = offset
+
+    def get_offset(self):
+        return self.offset
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, "get_journal_dir", lambda: str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def edited():
+    """A PieceTable and a Journal logging the edits made to it with insert() and delete()."""
+    document = PieceTable()
+    document_journal = Journal(document)
+    yield document, document_journal
+    document_journal.suspend()
+
+
+def insert(document, document_journal, offset, text):
+    document_journal.on_insert_text(None, Location(offset), text, len(text))
+    document.insert(offset, text)
+
+
+def delete(document, document_journal, start, end):
+    document_journal.on_delete_range(None, Location(start), Location(end))
+    document.delete(start, end)
+
+
+def replay(document_journal, journal_dir):
+    path = str(journal_dir / "test.journal")
+    write_records(path, document_journal.header, document_journal.records)
+    return read_journal(path)
+
+
+def test_typing_merges_into_one_record(edited):
+    document, document_journal = edited
+    document_journal.reset()
+    for i, c in enumerate("hello"):
+        insert(document, document_journal, i, c)
+    assert document_journal.records == [["i", 0, "hello"]]
+    insert(document, document_journal, 0, ">")
+    assert document_journal.records == [["i", 0, "hello"], ["i", 0, ">"]]
+
+
+def test_deleting_merges_into_one_record(edited):
+    document, document_journal = edited
+    document.insert(0, "0123456789")
+    document_journal.reset()
+    for end in range(8, 5, -1):  # backspace
+        delete(document, document_journal, end - 1, end)
+    assert document_journal.records == [["d", 5, 8]]
+    for _ in range(3):  # delete
+        delete(document, document_journal, 1, 2)
+    assert document_journal.records == [["d", 5, 8], ["d", 1, 4]]
+    assert document.get_text() == "0489"
+
+
+def test_nothing_is_logged_while_suspended(edited):
+    document, document_journal = edited
+    document_journal.suspend()
+    insert(document, document_journal, 0, "loading")
+    assert document_journal.records == []
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_replay_reproduces_the_document(edited, journal_dir, seed):
+    rng = random.Random(seed)
+    document, document_journal = edited
+    document_journal.reset()
+    for _ in range(200):
+        if len(document) and rng.random() < 0.4:
+            start = rng.randrange(len(document))
+            end = start + 1 if rng.random() < 0.7 else min(len(document), start + rng.randrange(1, 20))
+            delete(document, document_journal, start, end)
+        else:
+            offset = rng.choice([len(document), rng.randrange(len(document) + 1)])
+            insert(document, document_journal, offset, rng.choice(["a", "b", "\n", "é", "word "]))
+    recovered = replay(document_journal, journal_dir)
+    assert recovered.text == document.get_text()
+    assert recovered.file is None
+    assert len(document_journal.records) < 200
+
+
+def test_replay_on_top_of_the_file(edited, journal_dir, tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"one\r\ntwo\r\n")
+    document, document_journal = edited
+    document.insert(0, "one\ntwo\n")
+    text_format = TextFormat("utf-8", b"", "\r\n")
+    document_journal.reset(Gio.File.new_for_path(str(path)), text_format)
+    insert(document, document_journal, 4, "and ")
+    recovered = replay(document_journal, journal_dir)
+    assert recovered.text == "one\nand two\n"
+    assert recovered.text_format == text_format
+    assert recovered.file.get_path() == str(path)
+
+
+def test_changed_file_is_not_replayed(edited, journal_dir, tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("one\n")
+    document, document_journal = edited
+    document.insert(0, "one\n")
+    document_journal.reset(Gio.File.new_for_path(str(path)))
+    insert(document, document_journal, 0, "zero\n")
+    path.write_text("one\ntwo\n")
+    with pytest.raises(ValueError):
+        replay(document_journal, journal_dir)
+
+
+def test_replay_on_top_of_a_snapshot(journal_dir):
+    document = PieceTable("snapshot\n")
+    path = str(journal_dir / "test.journal")
+    snapshot_path = str(journal_dir / "test.snapshot")
+    header = {"texty-journal": journal.VERSION, "pid": os.getpid(), "path": None, "encoding": "utf-8",
+              "bom": "", "newline": "\n", "base": "snapshot", "snapshot": "test.snapshot"}
+    write_snapshot(path, header, document.snapshot(), snapshot_path, None)
+    write_records(path, None, [["i", 9, "edit"], ["d", 0, 4]])
+    assert read_journal(path).text == "shot\nedit"
+    discard_journal(path)
+    assert os.listdir(journal_dir) == []
+
+
+def test_a_record_cut_short_by_a_crash_is_ignored(journal_dir):
+    path = journal_dir / "test.journal"
+    header = {"texty-journal": journal.VERSION, "pid": os.getpid(), "path": None, "encoding": "utf-8",
+              "bom": "", "newline": "\n", "base": "empty"}
+    write_records(str(path), header, [["i", 0, "kept"]])
+    with open(path, "a") as file:
+        file.write('["i", 4, "lo')
+    assert read_journal(str(path)).text == "kept"
@@ -0,0 +1,81 @@
+import random
+import re
+
+import pytest
+
+from long_lines import SPLIT, LineSplitter, join
+
+
+@pytest.fixture
+def short_segments(monkeypatch):
+    monkeypatch.setattr(LineSplitter, "SEGMENT_LENGTH", 20)
+    monkeypatch.setattr(LineSplitter, "SEARCH_LENGTH", 5)
+    monkeypatch.setattr(LineSplitter, "LONG_RUN", re.compile(r"[^\n]{21,}"))
+
+
+def split_in_chunks(text, sizes):
+    splitter = LineSplitter()
+    pieces = []
+    position = 0
+    for size in sizes:
+        pieces.append(splitter.split(text[position:position + size]))
+        position += size
+    pieces.append(splitter.split(text[position:], final=True))
+    return "".join(pieces), splitter.count
+
+
+def random_text(rng, length):
+    return "".join(rng.choice("abcdef  ,;\n" if rng.random() < 0.1 else "abcdefgh") for _ in range(length))
+
+
+def test_short_lines_are_left_alone():
+    text = "short\nlines\n"
+    splitter = LineSplitter()
+    assert splitter.split(text, final=True) == text
+    assert splitter.count == 0
+
+
+def test_long_line_is_split_at_segment_length(short_segments):
+    text = "x" * 50 + "\n"
+    split, count = split_in_chunks(text, [])
+    assert split.split(SPLIT) == ["x" * 20, "x" * 20, "x" * 10 + "\n"]
+    assert count == 2
+
+
+def test_cut_goes_after_a_break(short_segments):
+    split, count = split_in_chunks("x" * 17 + " " + "y" * 10, [])
+    assert split == "x" * 17 + " " + SPLIT + "y" * 10
+    assert count == 1
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_split_and_join_round_trip(short_segments, seed):
+    rng = random.Random(seed)
+    text = random_text(rng, rng.randrange(300))
+    split, count = split_in_chunks(text, [])
+    assert join(split) == text
+    assert split.count(SPLIT) == count
+    for line in split.split("\n"):
+        assert all(len(segment) <= 20 for segment in line.split(SPLIT))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_chunking_does_not_change_the_result(short_segments, seed):
+    rng = random.Random(seed)
+    text = random_text(rng, rng.randrange(300))
+    whole = split_in_chunks(text, [])
+    sizes = [rng.randrange(1, 40) for _ in range(rng.randrange(10))]
+    assert split_in_chunks(text, sizes) == whole
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_split_appended_continues_the_last_segment(short_segments, seed):
+    rng = random.Random(seed)
+    text = random_text(rng, rng.randrange(1, 200))
+    appended = random_text(rng, rng.randrange(1, 100))
+    split, count = split_in_chunks(text, [])
+    tail = split.rpartition("\n")[2].rpartition(SPLIT)[2]
+    split_appended = LineSplitter.split_appended(tail, appended)
+    assert join(split_appended) == appended
+    for line in (split + split_appended).split("\n"):
+        assert all(len(segment) <= 20 for segment in line.split(SPLIT))
@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from piece_table import LARGE_INSERT, PieceTable
+
+
+def check(document, text):
+    assert document.get_text() == text
+    assert len(document) == len(text)
+    assert document.line_count == text.count("\n") + 1
+    line_starts = [0] + [i + 1 for i, c in enumerate(text) if c == "\n"]
+    for line, start in enumerate(line_starts):
+        assert document.line_to_offset(line) == start
+        assert document.offset_to_line(start) == line
+    for offset in range(len(text) + 1):
+        assert document.offset_to_line(offset) == text.count("\n", 0, offset)
+
+
+def test_empty():
+    document = PieceTable()
+    check(document, "")
+    assert document.get_line(0) == ""
+
+
+def test_insert_and_delete():
+    document = PieceTable("hello\nworld")
+    document.insert(5, ",\nthere")
+    check(document, "hello,\nthere\nworld")
+    document.delete(0, 7)
+    check(document, "there\nworld")
+    document.insert(len(document), "\n")
+    check(document, "there\nworld\n")
+    assert document.get_line(1) == "world"
+    assert document.get_line(2) == ""
+
+
+def test_typing_merges_pieces():
+    document = PieceTable()
+    for i, c in enumerate("abc\ndef"):
+        document.insert(i, c)
+    check(document, "abc\ndef")
+    assert len(document.pieces) == 1
+
+
+def test_large_insert_is_its_own_source():
+    text = "x\n" * LARGE_INSERT
+    document = PieceTable("start")
+    document.insert(2, text)
+    check(document, "st" + text + "art")
+    assert document.sources[-1] is text
+
+
+def test_snapshot_is_unaffected_by_later_edits():
+    document = PieceTable("one\ntwo\nthree")
+    snapshot = document.snapshot()
+    document.delete(0, 4)
+    document.insert(0, "zero\n")
+    assert snapshot.get_text() == "one\ntwo\nthree"
+    assert snapshot.line_count == 3
+    assert snapshot.line_to_offset(2) == 8
+    check(document, "zero\ntwo\nthree")
+
+
+def test_iter_chunks_respects_range_and_size():
+    document = PieceTable("abcdef\nghij")
+    document.insert(3, "XYZ")
+    chunks = list(document.iter_chunks(2, 10, chunk_size=3))
+    assert "".join(chunks) == document.get_text()[2:10]
+    assert all(len(chunk) <= 3 for chunk in chunks)
+
+
+def test_replace_all_front_to_back():
+    # a run of edits advancing through the document, as Replace All makes them
+    text = "cat\n" * 50
+    document = PieceTable(text)
+    delta = 0
+    for start in range(0, len(text), 4):
+        document.delete(start + delta, start + delta + 3)
+        document.insert(start + delta, "tiger")
+        delta += 2
+    check(document, "tiger\n" * 50)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits_match_a_string(seed):
+    rng = random.Random(seed)
+    text = "".join(rng.choice("ab\n") for _ in range(rng.randrange(50)))
+    document = PieceTable(text)
+    for _ in range(60):
+        if text and rng.random() < 0.4:
+            start = rng.randrange(len(text))
+            end = min(len(text), start + rng.randrange(1, 10))
+            document.delete(start, end)
+            text = text[:start] + text[end:]
+        else:
+            offset = rng.randrange(len(text) + 1)
+            inserted = "".join(rng.choice("xy\n") for _ in range(rng.randrange(1, 8)))
+            document.insert(offset, inserted)
+            text = text[:offset] + inserted + text[offset:]
+    check(document, text)
@@ -0,0 +1,65 @@
+import codecs
+
+import pytest
+
+from text_format import (DEFAULT_FORMAT, SAMPLE_SIZE, TextFormat, describe, detect_encoding, detect_newline,
+                         from_buffer, is_consistent, to_buffer)
+
+
+@pytest.mark.parametrize("bom, encoding", [
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+])
+def test_detect_encoding_by_bom(bom, encoding):
+    assert detect_encoding(bom + "hello".encode(encoding)) == (encoding, bom)
+
+
+@pytest.mark.parametrize("data, encoding", [
+    (b"", "utf-8"),
+    (b"plain ascii\n", "utf-8"),
+    ("café €".encode("utf-8"), "utf-8"),
+    ("some text\n".encode("utf-16-le"), "utf-16-le"),
+    ("some text\n".encode("utf-16-be"), "utf-16-be"),
+    ("café €".encode("cp1252"), "cp1252"),
+    (b"caf\xe9 \x81", "latin-1"),
+])
+def test_detect_encoding_without_bom(data, encoding):
+    assert detect_encoding(data) == (encoding, b"")
+
+
+def test_utf8_cut_at_the_end_of_the_sample():
+    data = b"a" * (SAMPLE_SIZE - 1) + "é".encode("utf-8")
+    assert detect_encoding(data) == ("utf-8", b"")
+
+
+@pytest.mark.parametrize("text, newline", [
+    ("no line ending", None),
+    ("a\nb\r\n", "\n"),
+    ("a\r\nb\n", "\r\n"),
+    ("a\rb", "\r"),
+    ("a\r", None),
+])
+def test_detect_newline(text, newline):
+    assert detect_newline(text) == newline
+
+
+def test_is_consistent():
+    assert is_consistent("a\r\nb\r\n", "\r\n")
+    assert not is_consistent("a\r\nb\n", "\r\n")
+    assert not is_consistent("a\rb\n", "\r")
+    assert not is_consistent("a\nb\r", "\n")
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r", None])
+def test_buffer_round_trip(newline):
+    text = "one\r\ntwo\n" if newline is None else f"one{newline}two{newline}"
+    assert from_buffer(to_buffer(text, newline), newline) == text
+
+
+def test_describe():
+    assert describe(DEFAULT_FORMAT) == "UTF-8 · LF"
+    assert describe(TextFormat("utf-16-le", codecs.BOM_UTF16_LE, "\r\n")) == "UTF-16-LE BOM · CRLF"
+    assert describe(DEFAULT_FORMAT._replace(newline=None, compression="gzip")) == "UTF-8 · Mixed · gzip"
@@ -0,0 +1,86 @@
+import random
+import re
+import threading
+
+import pytest
+
+from transform import ChangeCase, Filter, Pipeline, Sort, Substitute, TransformCancelled, Trim, Unique
+
+
+def apply_edits(text, edits):
+    for start, end, replacement in reversed(edits):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+PIPELINES = [
+    [Trim()],
+    [Filter(r"b")],
+    [Filter(r"b", keep=False)],
+    [Substitute(r"a+", "A")],
+    [ChangeCase("upper")],
+    [Unique()],
+    [Sort()],
+    [Sort(reverse=True, numeric=True)],
+    [Trim(), Unique(), Sort()],
+    [Filter(r"^$", keep=False), Substitute(r"\d", "#")],
+]
+
+
+@pytest.mark.parametrize("steps", PIPELINES, ids=lambda steps: "+".join(type(step).__name__ for step in steps))
+@pytest.mark.parametrize("seed", range(25))
+def test_run_reproduces_apply(steps, seed):
+    rng = random.Random(seed)
+    lines = ["".join(rng.choice(" ab1\t") for _ in range(rng.randrange(4))) for _ in range(rng.randrange(30))]
+    text = "\n".join(lines) + rng.choice(["", "\n"])
+    pipeline = Pipeline(steps)
+    edits = pipeline.run(text)
+    assert apply_edits(text, edits) == pipeline.apply(text)
+    assert edits == sorted(edits)
+    assert all(start != end or replacement for start, end, replacement in edits)
+
+
+def test_unchanged_text_needs_no_edits():
+    assert Pipeline([Trim()]).run("a\nb\n") == []
+
+
+def test_edits_only_touch_changed_lines():
+    edits = Pipeline([ChangeCase("upper")]).run("A\nb\nC\nd")
+    assert edits == [(2, 4, "B\n"), (6, 7, "D")]
+
+
+def test_too_many_runs_become_one_edit():
+    pipeline = Pipeline([ChangeCase("upper")])
+    pipeline.MAX_EDITS = 2
+    text = "a\nB\nc\nD\ne"
+    edits = pipeline.run(text)
+    assert len(edits) == 1
+    assert apply_edits(text, edits) == text.upper()
+
+
+def test_trim_keeps_carriage_returns():
+    assert Pipeline([Trim()]).apply(" a \r\n\tb\t\nc") == "a\r\nb\nc"
+
+
+def test_numeric_sort_puts_other_lines_last():
+    assert Pipeline([Sort(numeric=True)]).apply("10\nx\n9\n-1.5") == "-1.5\n9\n10\nx"
+
+
+@pytest.mark.parametrize("replacement", [r"\2", r"\g<missing>", "\\"])
+def test_bad_replacement_is_an_re_error(replacement):
+    with pytest.raises(re.error):
+        Substitute(r"(a)", replacement)
+
+
+def test_cancel():
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(TransformCancelled):
+        Pipeline([Trim()]).run("a\nb", cancel_event=cancel_event)
+
+
+def test_progress_reaches_one():
+    fractions = []
+    Pipeline([Trim(), Sort()]).run("b\na", on_progress=fractions.append)
+    assert fractions == sorted(fractions)
+    assert fractions[-1] == 1.0
@@ -0,0 +1,157 @@
+import os
+
+import pytest
+
+gi = pytest.importorskip("gi")
+gi.require_version("Gtk", "4.0")
+
+from gi.repository import Gtk  # noqa: E402
+
+import undo  # noqa: E402
+from undo import UndoManager  # noqa: E402
+
+
+@pytest.fixture
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(undo, "get_spill_dir", lambda: str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def make_manager():
+    managers = []
+
+    def make(limit=0, spill=False):
+        manager = UndoManager(Gtk.TextBuffer(), limit, spill)
+        manager.attach()
+        managers.append(manager)
+        return manager
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def text(manager):
+    buffer = manager.buffer
+    return buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
+
+
+def type_text(manager, typed):
+    for c in typed:
+        manager.buffer.insert(manager.buffer.get_end_iter(), c)
+
+
+def backspace(manager, count):
+    buffer = manager.buffer
+    for _ in range(count):
+        end = buffer.get_end_iter()
+        start = buffer.get_iter_at_offset(end.get_offset() - 1)
+        buffer.delete(start, end)
+
+
+def undo_all(manager):
+    steps = 0
+    while manager.undo():
+        steps += 1
+    return steps
+
+
+def test_typing_makes_one_step_per_word(make_manager):
+    manager = make_manager()
+    type_text(manager, "hello world")
+    assert len(manager.undo_steps) == 2
+    assert manager.undo()
+    assert text(manager) == "hello "
+    assert manager.undo()
+    assert text(manager) == ""
+    assert not manager.undo()
+    assert manager.redo() and manager.redo()
+    assert text(manager) == "hello world"
+    assert not manager.redo()
+
+
+def test_backspacing_makes_one_step(make_manager):
+    manager = make_manager()
+    manager.buffer.insert(manager.buffer.get_end_iter(), "some words")
+    backspace(manager, 4)
+    assert text(manager) == "some w"
+    assert len(manager.undo_steps) == 2
+    manager.undo()
+    assert text(manager) == "some words"
+
+
+def test_pause_between_keystrokes_starts_a_step(make_manager, monkeypatch):
+    monkeypatch.setattr(UndoManager, "COALESCE_TIMEOUT", -1)
+    manager = make_manager()
+    type_text(manager, "abc")
+    assert undo_all(manager) == 3
+
+
+def test_user_action_is_one_step(make_manager):
+    manager = make_manager()
+    buffer = manager.buffer
+    buffer.set_text("one two")  # not a user action, but recorded as a step of its own
+    buffer.begin_user_action()
+    buffer.delete(buffer.get_start_iter(), buffer.get_iter_at_offset(4))
+    buffer.insert(buffer.get_end_iter(), " three")
+    buffer.end_user_action()
+    assert text(manager) == "two three"
+    manager.undo()
+    assert text(manager) == "one two"
+    manager.redo()
+    assert text(manager) == "two three"
+
+
+def test_new_edit_clears_redo(make_manager):
+    manager = make_manager()
+    type_text(manager, "a b")
+    manager.undo()
+    assert manager.can_redo()
+    type_text(manager, "c")
+    assert not manager.can_redo()
+
+
+def test_large_text_is_compressed(make_manager):
+    manager = make_manager()
+    big = "x" * UndoManager.COMPRESS_SIZE
+    manager.buffer.insert(manager.buffer.get_end_iter(), big)
+    assert isinstance(manager.undo_steps[-1][0][2], bytes)
+    assert manager.memory_usage()[0] < UndoManager.COMPRESS_SIZE
+    manager.undo()
+    manager.redo()
+    assert text(manager) == big
+
+
+def test_limit_drops_the_oldest_steps(make_manager, monkeypatch):
+    monkeypatch.setattr(UndoManager, "COALESCE_TIMEOUT", -1)
+    manager = make_manager(limit=2000)
+    type_text(manager, "x" * 50)
+    assert manager.memory_usage()[0] <= 2000
+    steps = undo_all(manager)
+    assert 0 < steps < 50
+    assert text(manager) == "x" * (50 - steps)
+
+
+def test_spilled_steps_are_undone_to(make_manager, spill_dir, monkeypatch):
+    monkeypatch.setattr(UndoManager, "COALESCE_TIMEOUT", -1)
+    manager = make_manager(limit=2000, spill=True)
+    type_text(manager, "abcdefghij" * 5)
+    in_memory, spilled, steps = manager.memory_usage()
+    assert in_memory <= 2000 and spilled > 0 and steps == 50
+    assert os.listdir(spill_dir)
+    assert undo_all(manager) == 50
+    assert text(manager) == ""
+    assert manager.redo()
+    assert text(manager) == "a"
+    manager.close()
+    assert not os.listdir(spill_dir)
+
+
+def test_spill_error_drops_the_spilled_steps(make_manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(UndoManager, "COALESCE_TIMEOUT", -1)
+    (tmp_path / "file").write_text("")
+    monkeypatch.setattr(undo, "get_spill_dir", lambda: str(tmp_path / "file" / "undo"))
+    manager = make_manager(limit=2000, spill=True)
+    type_text(manager, "x" * 50)
+    assert manager.memory_usage()[1] == 0
+    assert 0 < undo_all(manager) < 50
@@ -0,0 +1,116 @@
+import codecs
+from collections import namedtuple
+
+
+# encoding: a Python codec name with no BOM handling of its own
+# bom: the byte order mark the file starts with, or b""
+# newline: "\n", "\r\n" or "\r", converted to and from "\n" in the buffer, or None
+#          if the file mixes them, in which case they're kept as they are
+# compression: "gzip", "bz2" or "xz" if the file is compressed, see compression.py
+TextFormat = namedtuple("TextFormat", "encoding bom newline compression", defaults=(None,))
+
+DEFAULT_FORMAT = TextFormat("utf-8", b"", "\n")
+
+SAMPLE_SIZE = 64 * 1024
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF32_LE, "utf-32-le"),  # before UTF-16 LE, which it starts with
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# bytes that windows-1252 leaves undefined; text containing them is taken as latin-1
+CP1252_UNDEFINED = bytes((0x81, 0x8D, 0x8F, 0x90, 0x9D))
+
+NEWLINE_NAMES = {"\n": "LF", "\r\n": "CRLF", "\r": "CR", None: "Mixed"}
+
+
+def detect_encoding(head):
+    """
+    Guess the encoding of a file from its first bytes, returning (encoding, bom).
+
+    Only the first SAMPLE_SIZE bytes are looked at, and decoding them is the
+    costliest step, done by the C codecs: a few microseconds however big the
+    file is.
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, bom
+    sample = head[:SAMPLE_SIZE]
+    if not sample:
+        return DEFAULT_FORMAT.encoding, b""
+    encoding = guess_utf16(sample)
+    if encoding:
+        return encoding, b""
+    try:
+        # final=False tolerates a character cut in two at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, False)
+        return "utf-8", b""
+    except UnicodeDecodeError:
+        pass
+    if any(byte in sample for byte in CP1252_UNDEFINED):
+        return "latin-1", b""
+    return "cp1252", b""
+
+
+def guess_utf16(sample):
+    """Recognize BOM-less UTF-16 by its zero bytes: mostly-ASCII text has one in every pair."""
+    pairs = len(sample) // 2
+    if pairs < 2 or b"\0" not in sample:
+        return None
+    even = sample[0:pairs * 2:2].count(0)
+    odd = sample[1:pairs * 2:2].count(0)
+    if odd > pairs * 0.3 and even < pairs * 0.05:
+        return "utf-16-le"
+    if even > pairs * 0.3 and odd < pairs * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def detect_newline(text):
+    """Return the first line ending in text, or None if there is none."""
+    lf = text.find("\n")
+    cr = text.find("\r")
+    if cr < 0:
+        return "\n" if lf >= 0 else None
+    if lf < 0 or cr < lf:
+        if cr + 1 == len(text):
+            return None  # can't tell "\r" from half of "\r\n" yet
+        return "\r\n" if text[cr + 1] == "\n" else "\r"
+    return "\n"
+
+
+def is_consistent(text, newline):
+    """Return whether every line ending in text is newline."""
+    if newline == "\r\n":
+        crlf = text.count("\r\n")
+        return text.count("\r") == crlf and text.count("\n") == crlf
+    if newline == "\r":
+        return "\n" not in text
+    return "\r" not in text
+
+
+def to_buffer(text, newline):
+    """Convert the line endings of text read from a file to the buffer's "\n"."""
+    if newline is None or newline == "\n":
+        return text
+    return text.replace(newline, "\n")
+
+
+def from_buffer(text, newline):
+    """Convert the buffer's "\n" line endings to the file's."""
+    if newline is None or newline == "\n":
+        return text
+    return text.replace("\n", newline)
+
+
+def describe(text_format):
+    """Return e.g. "UTF-8 · CRLF" or "UTF-8 · LF · gzip" for the status bar."""
+    name = codecs.lookup(text_format.encoding).name.upper()
+    if text_format.bom:
+        name += " BOM"
+    if text_format.compression:
+        return f"{name} · {NEWLINE_NAMES[text_format.newline]} · {text_format.compression}"
+    return f"{name} · {NEWLINE_NAMES[text_format.newline]}"
@@ -1,6 +1,5 @@
 import sys
 import gi
-import os
 
 gi.require_version('Gio', '2.0')
 gi.require_version('Gtk', '4.0')
@@ -8,32 +7,29 @@ gi.require_version('Adw', '1')
 
 from gi.repository import Gtk, Adw, Gio, Gdk, GLib
 
+import resources
+from instrumentation import Instrumentation
+from journal import JournalWriter, discard_journal, find_orphaned_journals, read_journal
+from settings_store import SettingsStore
+from style import StyleManager
+from folder_search_panel import FolderSearchPanel
+from tabs import DocumentTabs
+
 class TextyWindow(Adw.ApplicationWindow):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         __gtype_name__ = "TextyWindow"
 
-        # Load the UI file
-        builder = Gtk.Builder()
-        builder.add_from_file(os.path.join(os.path.dirname(__file__), "data", "shortcuts.ui"))
-        # builder.template(os.path.join(os.path.dirname(__file__), "data", "window.ui"))
-        
-        self.shortcuts_window = builder.get_object("shortcuts_window")
-        self.set_help_overlay(self.shortcuts_window)
-
         # preferences
-        self.settings = Gio.Settings.new("ca.footeware.py.texty")
+        self.settings = SettingsStore.get_default()
+        self.instrumentation = Instrumentation.get_default()
+        self.instrumentation.attach(self)
 
         # set default window size
         width = self.settings.get_int("window-width")
         height = self.settings.get_int("window-height")
         self.set_default_size(width, height)
 
-        # add path to icon to default icon theme
-        icon_dir = os.path.join(os.path.dirname(__file__), 'data', 'icons', 'hicolor', 'scalable', 'apps')
-        icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-        icon_theme.add_search_path(icon_dir)
-
         # create the header bar
         header = Adw.HeaderBar()
 
@@ -64,12 +60,23 @@ class TextyWindow(Adw.ApplicationWindow):
         self.add_action(save_as_action)
         menu_model.append_item(save_as_menu_item)
 
+        close_tab_menu_item = Gio.MenuItem.new("Close Tab", "win.close_tab")
+        close_tab_action = Gio.SimpleAction.new("close_tab", None)
+        close_tab_action.connect("activate", self.on_close_tab_action_activated)
+        self.add_action(close_tab_action)
+        menu_model.append_item(close_tab_menu_item)
+
         section = Gio.Menu.new()
         new_window_menu_item = Gio.MenuItem.new("New Window", "win.new_window")
         new_window_action = Gio.SimpleAction.new("new_window", None)
         new_window_action.connect("activate", self.on_new_window_action_activated)
         self.add_action(new_window_action)
         section.append_item(new_window_menu_item)
+        new_view_window_menu_item = Gio.MenuItem.new("New Window on Document", "win.new_view_window")
+        new_view_window_action = Gio.SimpleAction.new("new_view_window", None)
+        new_view_window_action.connect("activate", self.on_new_view_window_action_activated)
+        self.add_action(new_view_window_action)
+        section.append_item(new_view_window_menu_item)
         menu_model.append_section(None, section)
         
         save_button.set_menu_model(menu_model)
@@ -82,8 +89,8 @@ class TextyWindow(Adw.ApplicationWindow):
 
         hamburger_menu = Gtk.MenuButton.new()
         hamburger_menu.set_icon_name("open-menu-symbolic")
-        builder.add_from_file(os.path.join(os.path.dirname(__file__), "data", "menu.ui"))
-        menu_model = builder.get_object("hamburger-menu")
+        # parsed once, shared by every window
+        menu_model = resources.get_object("menu.ui", "hamburger-menu")
         hamburger_menu.set_menu_model(menu_model)
 
         toggle_wrap_action = Gio.SimpleAction.new_stateful("toggle_wrap", 
@@ -93,20 +100,73 @@ class TextyWindow(Adw.ApplicationWindow):
         toggle_wrap_action.set_state(GLib.Variant.new_boolean(self.settings.get_boolean("wrap-mode")))
         self.add_action(toggle_wrap_action) # (self window) == win in MENU_XML
 
-        font_size = self.settings.get_int("font-size")
-        self.set_font_size(font_size)
-        font_size_action = Gio.SimpleAction.new_stateful(
+        follow_action = Gio.SimpleAction.new_stateful("follow", None, GLib.Variant.new_boolean(False))
+        follow_action.connect("activate", self.on_follow_action_activated)
+        self.add_action(follow_action)
+
+        self.style_manager = StyleManager.for_display(Gdk.Display.get_default())
+        font_size = self.set_font_size(self.settings.get_int("font-size"))
+        self.font_size_action = Gio.SimpleAction.new_stateful(
             "font_size", GLib.VariantType.new("i"), GLib.Variant.new_int32(font_size)
         )
-        font_size_action.connect("change-state", self.on_font_size_action_changed)
-        font_size_action.set_state(GLib.Variant.new_int32(font_size))
-        self.add_action(font_size_action)
+        self.font_size_action.connect("change-state", self.on_font_size_action_changed)
+        self.font_size_action.set_state(GLib.Variant.new_int32(font_size))
+        self.add_action(self.font_size_action)
+
+        zoom_in_action = Gio.SimpleAction.new("zoom_in", None)
+        zoom_in_action.connect("activate", self.on_zoom_in_action_activated)
+        self.add_action(zoom_in_action)
+
+        zoom_out_action = Gio.SimpleAction.new("zoom_out", None)
+        zoom_out_action.connect("activate", self.on_zoom_out_action_activated)
+        self.add_action(zoom_out_action)
+
+        zoom_reset_action = Gio.SimpleAction.new("zoom_reset", None)
+        zoom_reset_action.connect("activate", self.on_zoom_reset_action_activated)
+        self.add_action(zoom_reset_action)
+
+        find_action = Gio.SimpleAction.new("find", None)
+        find_action.connect("activate", self.on_find_action_activated)
+        self.add_action(find_action)
+
+        find_replace_action = Gio.SimpleAction.new("find_replace", None)
+        find_replace_action.connect("activate", self.on_find_replace_action_activated)
+        self.add_action(find_replace_action)
+
+        go_to_line_action = Gio.SimpleAction.new("go_to_line", None)
+        go_to_line_action.connect("activate", self.on_go_to_line_action_activated)
+        self.add_action(go_to_line_action)
+
+        find_in_folder_action = Gio.SimpleAction.new("find_in_folder", None)
+        find_in_folder_action.connect("activate", self.on_find_in_folder_action_activated)
+        self.add_action(find_in_folder_action)
+
+        transform_action = Gio.SimpleAction.new("transform", None)
+        transform_action.connect("activate", self.on_transform_action_activated)
+        self.add_action(transform_action)
+
+        split_horizontal_action = Gio.SimpleAction.new("split_horizontal", None)
+        split_horizontal_action.connect("activate", self.on_split_horizontal_action_activated)
+        self.add_action(split_horizontal_action)
+
+        split_vertical_action = Gio.SimpleAction.new("split_vertical", None)
+        split_vertical_action.connect("activate", self.on_split_vertical_action_activated)
+        self.add_action(split_vertical_action)
+
+        unsplit_action = Gio.SimpleAction.new("unsplit", None)
+        unsplit_action.connect("activate", self.on_unsplit_action_activated)
+        self.add_action(unsplit_action)
 
         show_shortcuts_action = Gio.SimpleAction.new("show_shortcuts", None)
         show_shortcuts_action.connect("activate", self.on_show_shortcuts_action_activated)
         self.get_application().set_accels_for_action("win.show_shortcuts", ["<Ctrl>question"])
         self.add_action(show_shortcuts_action)
 
+        instrumentation_action = Gio.SimpleAction.new_stateful(
+            "instrumentation", None, GLib.Variant.new_boolean(self.instrumentation.enabled))
+        instrumentation_action.connect("activate", self.on_instrumentation_action_activated)
+        self.add_action(instrumentation_action)
+
         about_action = Gio.SimpleAction.new("about", None)
         about_action.connect("activate", self.on_about_action_activated)
         self.add_action(about_action)
@@ -122,79 +182,128 @@ class TextyWindow(Adw.ApplicationWindow):
 
         self.box.append(header)
 
-        scrolled_window = Gtk.ScrolledWindow()
-        scrolled_window.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
-
-        self.text_view = Gtk.TextView.new()
-        self.text_view.set_wrap_mode(Gtk.WrapMode.WORD)
-        self.text_view.set_hexpand(True)
-        self.text_view.set_vexpand(True)
-        self.text_view.set_left_margin(10)
-        self.text_view.set_right_margin(10)
-        self.text_view.set_top_margin(10)
-        self.text_view.set_bottom_margin(10)
-
-        self.current_file = None  # Store the currently open file
-
-        scrolled_window.set_child(self.text_view)
-        self.box.append(scrolled_window)
-        
-        self.buffer = self.text_view.get_buffer()
-        self.buffer.connect("changed", self.on_buffer_changed)
-        self.buffer_modified = False # Flag to track buffer changes
+        # one tab per document
+        tab_bar = Adw.TabBar()
+        self.box.append(tab_bar)
+        self.tab_view = Adw.TabView()
+        self.tab_view.set_vexpand(True)
+        tab_bar.set_view(self.tab_view)
+        # Find in Folder opens beside the tabs
+        self.content_paned = Gtk.Paned(orientation=Gtk.Orientation.HORIZONTAL)
+        self.content_paned.set_vexpand(True)
+        self.content_paned.set_resize_end_child(False)
+        self.content_paned.set_shrink_end_child(False)
+        self.content_paned.set_start_child(self.tab_view)
+        self.box.append(self.content_paned)
+        self.folder_search_panel = None  # built the first time it's asked for
+        self.tabs = DocumentTabs(self, self.tab_view, self.title)
+        self.tabs.add()
 
-        self.load_wrap_mode()
         self.connect("close-request", self.on_close_request)
 
-        self.text_view.grab_focus()
+    @property
+    def page(self):
+        return self.tabs.current
 
     def on_show_shortcuts_action_activated(self, action, param=None):
-        self.shortcuts_window.present()
+        # built the first time it's asked for, then shared by every window
+        shortcuts_window = resources.get_object("shortcuts.ui", "shortcuts_window")
+        shortcuts_window.set_hide_on_close(True)
+        shortcuts_window.set_transient_for(self)
+        shortcuts_window.present()
     
     def on_close_request(self, window):
+        if not self.tabs.prepare_close():
+            return True
+        if self.folder_search_panel:
+            self.folder_search_panel.cancel()
         width = self.get_width()
         height = self.get_height()
         self.settings.set_int("window-width", width)
         self.settings.set_int("window-height", height)
+        self.settings.flush()
         return False  # Return False to allow the window to close
-                    
-    def load_wrap_mode(self):
-        wrap_mode = self.settings.get_boolean("wrap-mode")
-        if wrap_mode:
-            self.text_view.set_wrap_mode(Gtk.WrapMode.WORD)
-        else:
-            self.text_view.set_wrap_mode(Gtk.WrapMode.NONE)
-    
+
     def on_font_size_action_changed(self, action, value):
-        font_size = value.get_int32()
-        action.set_state(value)
-        self.set_font_size(font_size)
+        font_size = self.set_font_size(value.get_int32())
+        action.set_state(GLib.Variant.new_int32(font_size))
         # save to pref
         self.settings.set_int("font-size", font_size)
     
     def set_font_size(self, font_size):
-        css = f"textview {{font-size: {font_size}px;}}"
-        css_provider = Gtk.CssProvider()
-        css_provider.load_from_data(css.encode())
-        Gtk.StyleContext.add_provider_for_display(
-            Gdk.Display.get_default(),
-            css_provider,
-            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
-        )
+        self.instrumentation.until_next_frame("set_font_size", self)
+        # one provider per display, updated in place
+        return self.style_manager.set_font_size(font_size)
+
+    def on_zoom_in_action_activated(self, action, param=None):
+        self.font_size_action.change_state(
+            GLib.Variant.new_int32(self.style_manager.font_size + StyleManager.ZOOM_STEP))
+
+    def on_zoom_out_action_activated(self, action, param=None):
+        self.font_size_action.change_state(
+            GLib.Variant.new_int32(self.style_manager.font_size - StyleManager.ZOOM_STEP))
+
+    def on_zoom_reset_action_activated(self, action, param=None):
+        self.font_size_action.change_state(self.settings.get_default_value("font-size"))
     
+    def on_find_action_activated(self, action, param=None):
+        self.page.find()
+
+    def on_find_replace_action_activated(self, action, param=None):
+        self.page.find(replace=True)
+
+    def on_go_to_line_action_activated(self, action, param=None):
+        self.page.prompt_go_to_line()
+
+    def on_find_in_folder_action_activated(self, action, param=None):
+        if self.folder_search_panel is None:
+            self.folder_search_panel = FolderSearchPanel(self.tabs.open_at, self.hide_folder_search)
+            self.content_paned.set_end_child(self.folder_search_panel)
+        self.folder_search_panel.set_visible(True)
+        self.folder_search_panel.focus_entry()
+
+    def hide_folder_search(self):
+        self.folder_search_panel.cancel()
+        self.folder_search_panel.set_visible(False)
+        self.page.focus_text()
+
+    def on_transform_action_activated(self, action, param=None):
+        self.page.prompt_transform()
+
+    def on_split_horizontal_action_activated(self, action, param=None):
+        # side by side
+        self.page.split(Gtk.Orientation.HORIZONTAL)
+
+    def on_split_vertical_action_activated(self, action, param=None):
+        self.page.split(Gtk.Orientation.VERTICAL)
+
+    def on_unsplit_action_activated(self, action, param=None):
+        self.page.unsplit()
+
     def on_toggle_wrap_action_activated(self, action, param=None):
         old_state = action.get_state()
         new_state = not old_state.get_boolean()
         action.set_state(GLib.Variant.new_boolean(new_state))
 
-        if new_state:
-            self.text_view.set_wrap_mode(Gtk.WrapMode.WORD)
-        else:
-            self.text_view.set_wrap_mode(Gtk.WrapMode.NONE)
+        self.tabs.set_wrap(new_state)
 
         # Save the wrap mode to prefs
         self.settings.set_boolean("wrap-mode", new_state)
             
+    def on_follow_action_activated(self, action, param=None):
+        follow = not action.get_state().get_boolean()
+        action.set_state(GLib.Variant.new_boolean(follow))
+        self.tabs.set_follow(follow)
+
+    def on_instrumentation_action_activated(self, action, param=None):
+        enabled = not action.get_state().get_boolean()
+        action.set_state(GLib.Variant.new_boolean(enabled))
+        self.instrumentation.set_enabled(enabled)
+        if enabled:
+            self.instrumentation.show_panel(self)
+        else:
+            self.instrumentation.hide_panel()
+
     def on_about_action_activated(self, action, param=None):
         about_dialog = Adw.AboutDialog.new()
         about_dialog.set_application_name("texty")
@@ -204,152 +313,55 @@ class TextyWindow(Adw.ApplicationWindow):
         about_dialog.set_application_icon("texty")
         about_dialog.present()
     
-    def on_buffer_changed(self, buffer):
-        self.buffer_modified = True
-        title_str = self.title.get_title()
-        if not title_str.startswith("* "):
-            self.title.set_title(f"* {title_str}")
-    
     def show_toast(self, message):
         toast = Adw.Toast.new(message)
         self.toast_overlay.add_toast(toast)
-    
-    def save_to_file(self, file):
-        buffer = self.text_view.get_buffer()
-        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
-        try:
-            with open(file.get_path(), 'w') as f:
-                f.write(text)
-            self.title.set_title(f"{file.get_basename()}")
-            self.title.set_subtitle(file.get_path())
-            self.buffer_modified = False
-            self.text_view.get_buffer().set_modified(False)
-            self.show_toast(f"File saved: {file.get_basename()}")
-            return True
-        except IOError as e:
-            self.show_toast(f"Error saving file: {str(e)}")
-            return False
 
-    def save_as(self):
-        dialog = Gtk.FileDialog.new()
-        dialog.set_title("Save File")
-        dialog.save(self, None, self.on_save_dialog_response)
-    
     def on_save_action_activated(self, action, parameters=None):
-        self.save_file()
+        self.page.save_file()
 
-    def on_save_dialog_response(self, dialog, result):
-        try:
-            file = dialog.save_finish(result)
-            if file:
-                if self.save_to_file(file):
-                    self.current_file = file
-                    self.buffer_modified = False
-                    self.text_view.get_buffer().set_modified(False)
-            else:
-                self.show_toast("Save operation cancelled")
-        except GLib.Error as error:
-            self.show_toast(f"Error saving file: {error.message}")
-        
-    def load_file(self, file):
-        try:
-            with open(file.get_path(), 'r') as f:
-                text = f.read()
-            buffer = self.text_view.get_buffer()
-            buffer.set_text(text)
-            self.current_file = file
-            self.show_toast(f"File opened: {file.get_basename()}")
-        except IOError as e:
-            self.show_toast(f"Error opening file: {str(e)}")
-    
     def on_new_action_activated(self, action, parameters=None):
-        self.new_file()
-    
-    def new_file(self):
-        if self.buffer_modified:
-            self.prompt_save_changes("new")
-        else:
-            self.create_new_file()
-    
-    def create_new_file(self):
-        self.text_view.get_buffer().set_text("")
-        self.text_view.get_buffer().set_modified(False)
-        self.current_file = None
-        self.title.set_title("texty")
-        self.title.set_subtitle("a minimal text editor")
-        self.show_toast("New file created")
-        self.buffer_modified = False
-        self.text_view.get_buffer().set_modified(False)
-    
-    def prompt_save_changes(self, next_action):
-        dialog = Adw.MessageDialog.new(self)
-        dialog.set_heading("Save changes?")
-        dialog.set_body("There are unsaved changes. Do you want to save them?")
-        dialog.add_response("cancel", "Cancel")
-        dialog.add_response("discard", "Discard")
-        dialog.add_response("save", "Save")
-        dialog.set_default_response("save")
-        dialog.set_close_response("cancel")
+        self.tabs.add()
 
-        dialog.connect("response", self.on_save_changes_response, next_action)
-        dialog.present()
+    def on_close_tab_action_activated(self, action, parameters=None):
+        self.tabs.close_current()
 
-    def on_save_changes_response(self, dialog, response, next_action):
-        if response == "save":
-            success = self.save_file()
-            if success:
-                self.execute_next_action(next_action)
-        elif response == "discard":
-            self.execute_next_action(next_action)
-        # If "cancel" or dialog is closed, do nothing
-
-    def execute_next_action(self, next_action):
-        if next_action == "new":
-            self.create_new_file()
-            self.text_view.grab_focus()
-        elif next_action == "open":
-            self.open_file(self)
-    
-    def open_file(self):
+    def restore(self, recovered):
+        """Open a document recovered from a crash journal in a tab of its own, as unsaved changes."""
+        page = self.page if self.page.is_blank() else self.tabs.add()
+        page.restore(recovered)
+
+    def on_open_action_activated(self, action, parameters=None):
         dialog = Gtk.FileDialog.new()
         dialog.set_title("Open File")
         dialog.open(self, None, self.on_open_dialog_response)
-
-    def save_file(self):
-        if self.current_file:
-            return self.save_to_file(self.current_file)
-        else:
-            return self.save_as()
-        
-    def on_open_action_activated(self, action, parameters=None):
-        if self.buffer_modified:
-            self.prompt_save_changes("new")
-        else:
-            dialog = Gtk.FileDialog.new()
-            dialog.set_title("Open File")
-            dialog.open(self, None, self.on_open_dialog_response)
     
     def on_open_dialog_response(self, dialog, result):
         try:
             file = dialog.open_finish(result)
             if file:
-                self.load_file(file)
-                self.title.set_title(f"{file.get_basename()}")
-                self.title.set_subtitle(file.get_path())
-                self.buffer_modified = False
-                self.buffer.set_modified(False)
+                self.tabs.open(file)
             else:
                 self.show_toast("Open operation cancelled")
         except GLib.Error as error:
             self.show_toast(f"Error opening file: {error.message}")
     
     def on_save_as_action_activated(self, action, parameters=None):
-        self.save_as()
+        self.page.save_as()
 
     def on_new_window_action_activated(self, action, parameters=None):
         new_window = TextyWindow(application=self.get_application())
         new_window.present()
 
+    def on_new_view_window_action_activated(self, action, parameters=None):
+        # another view of the same buffer: the text is held once
+        if self.page.large_file_view:
+            self.show_toast("Large files can only be shown in one window")
+            return
+        new_window = TextyWindow(application=self.get_application())
+        new_window.tabs.add_view_of(self.page)
+        new_window.present()
+
 class TextyApp(Adw.Application):
     def __init__(self, **kwargs):
         """
@@ -361,13 +373,23 @@ class TextyApp(Adw.Application):
         """
         super().__init__(**kwargs)
         self.connect('activate', self.on_activate)
+        self.connect('open', self.on_open)
+        self.connect('shutdown', self.on_shutdown)
         # Define accelerators for actions
-        self.set_accels_for_action("win.new", ["<Control>n"])
+        self.set_accels_for_action("win.new", ["<Control>n", "<Control>t"])
+        self.set_accels_for_action("win.close_tab", ["<Control>F4"])
         self.set_accels_for_action("win.open", ["<Control>o"])
         self.set_accels_for_action("win.save", ["<Control>s"])
         self.set_accels_for_action("win.save_as", ["<Control><Shift>s"])
         self.set_accels_for_action("win.new_window", ["<Control><Shift>n"])
         self.set_accels_for_action("win.toggle_wrap", ["<Control>w"])
+        self.set_accels_for_action("win.find", ["<Control>f"])
+        self.set_accels_for_action("win.find_replace", ["<Control>h"])
+        self.set_accels_for_action("win.go_to_line", ["<Control>l"])
+        self.set_accels_for_action("win.find_in_folder", ["<Control><Shift>f"])
+        self.set_accels_for_action("win.zoom_in", ["<Control>plus", "<Control>equal", "<Control>KP_Add"])
+        self.set_accels_for_action("win.zoom_out", ["<Control>minus", "<Control>KP_Subtract"])
+        self.set_accels_for_action("win.zoom_reset", ["<Control>0", "<Control>KP_0"])
 
     def on_activate(self, app):
         """
@@ -375,8 +397,85 @@ class TextyApp(Adw.Application):
 
         This method creates a new TextyWindow and presents it.
         """
+        first = not self.get_windows()
         self.win = TextyWindow(application=app)
         self.win.present()
+        if first:
+            self.win.tabs.restore_session()
+        self.check_for_recovery()
+
+    def on_open(self, app, files, n_files, hint):
+        """
+        Handle the application's open signal: files named on the command line.
 
-app = TextyApp(application_id="ca.footeware.py.texty")
-app.run(sys.argv)
\ No newline at end of file
+        Started again while running, texty forwards them to the running
+        instance over D-Bus, which opens them as tabs of its active window.
+        """
+        win = self.get_active_window()
+        if win is None:
+            self.win = win = TextyWindow(application=app)
+            win.present()
+            self.check_for_recovery()
+        win.tabs.open_all(files)
+        win.present()
+
+    def check_for_recovery(self):
+        journals = find_orphaned_journals()
+        if journals:
+            self.offer_recovery(journals)
+
+    def offer_recovery(self, journals):
+        """
+        Ask whether to recover the documents of a texty that crashed.
+
+        Each recovered document opens in a tab of its own in the window just
+        presented.
+        """
+        dialog = Adw.MessageDialog.new(self.win)
+        dialog.set_heading("Recover unsaved changes?")
+        count = "a document" if len(journals) == 1 else f"{len(journals)} documents"
+        dialog.set_body(f"texty didn't shut down properly and has unsaved changes to {count}.")
+        dialog.add_response("discard", "Discard")
+        dialog.add_response("later", "Later")
+        dialog.add_response("recover", "Recover")
+        dialog.set_response_appearance("discard", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_default_response("recover")
+        # closing the dialog keeps the journals, to be offered again next time
+        dialog.set_close_response("later")
+        dialog.connect("response", self.on_recovery_response, journals)
+        dialog.present()
+
+    def on_recovery_response(self, dialog, response, journals):
+        for path in journals:
+            if response == "discard":
+                discard_journal(path)
+            elif response == "recover":
+                try:
+                    recovered = read_journal(path)
+                except (OSError, ValueError, LookupError) as e:
+                    # the journal is the only copy of the changes: keep it
+                    self.win.show_toast(f"Error recovering changes, kept for later: {e}")
+                else:
+                    self.win.restore(recovered)
+                    # once the restored document's own journal has been written
+                    JournalWriter.get_default().submit(discard_journal, path)
+
+    def on_shutdown(self, app):
+        """
+        Handle the application's shutdown signal.
+
+        This method writes out any preferences still waiting to be saved,
+        finishes the journal writes still queued, such as deleting the
+        journals of closed documents, and writes the instrumentation trace
+        if TEXTY_INSTRUMENTATION names a file.
+        """
+        SettingsStore.get_default().flush()
+        JournalWriter.get_default().close()
+        instrumentation = Instrumentation.get_default()
+        if instrumentation.trace_path:
+            instrumentation.write_trace(instrumentation.trace_path)
+
+if __name__ == '__main__':
+    resources.register()
+    app = TextyApp(application_id="ca.footeware.py.texty", flags=Gio.ApplicationFlags.HANDLES_OPEN)
+    app.run(sys.argv)
\ No newline at end of file
@@ -1,37 +1,38 @@
 import sys
 import gi
-import os
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gio, Gdk, GLib
 
-# Get the directory of the current script
-current_dir = os.path.dirname(os.path.abspath(__file__))
-# Construct the path to the UI file
-ui_file = os.path.join(current_dir, "data", "window.ui")
+import resources
+from instrumentation import Instrumentation
+from journal import JournalWriter, discard_journal, find_orphaned_journals, read_journal
+from settings_store import SettingsStore
+from folder_search_panel import FolderSearchPanel
+from tabs import DocumentTabs
+from style import StyleManager
 
-@Gtk.Template(filename=ui_file)
+# the window template is read from the bundle, which has to be registered first
+resources.register()
+
+@Gtk.Template(resource_path=f"{resources.RESOURCE_PATH}/window.ui")
 class TextyWindow(Adw.ApplicationWindow):
     __gtype_name__ = "TextyWindow"
 
     save_button = Gtk.Template.Child()
-    text_view = Gtk.Template.Child()
     window_title = Gtk.Template.Child()
     toast_overlay = Gtk.Template.Child()
     menu_button = Gtk.Template.Child()
+    tab_bar = Gtk.Template.Child()
+    tab_view = Gtk.Template.Child()
+    content_paned = Gtk.Template.Child()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        self.current_file = None
-        self.buffer_modified = False
-    
         # preferences
-        self.settings = Gio.Settings.new("ca.footeware.py.texty")
-
-        # set window size from prefs
-        self.update_title()
+        self.settings = SettingsStore.get_default()
 
         # set default window size
         width = self.settings.get_int("window-width")
@@ -42,196 +43,144 @@ class TextyWindow(Adw.ApplicationWindow):
         self.connect("notify::default-width", self.on_window_size_change)
         self.connect("notify::default-height", self.on_window_size_change)
 
-        # add path to icon to default icon theme
-        icon_dir = os.path.join(os.path.dirname(__file__), 'data', 'icons', 'hicolor', 'scalable', 'apps')
-        icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-        icon_theme.add_search_path(icon_dir)
+        # font size, shared by every window through the display's style provider
+        self.style_manager = StyleManager.for_display(Gdk.Display.get_default())
+        self.style_manager.set_font_size(self.settings.get_int("font-size"))
 
-        self.buffer = self.text_view.get_buffer()
-        self.buffer.connect("changed", self.on_buffer_changed)
-        self.buffer_modified = False # Flag to track buffer changes
+        self.instrumentation = Instrumentation.get_default()
+        self.instrumentation.attach(self)
+
+        # one tab per document
+        self.tabs = DocumentTabs(self, self.tab_view, self.window_title)
+        self.tabs.add()
+        self.folder_search_panel = None  # built the first time it's asked for, beside the tabs
 
         # save clicked
         self.save_button.connect("clicked", self.on_save_clicked)
 
+        self.connect("close-request", self.on_close_request)
+
+    @property
+    def page(self):
+        return self.tabs.current
+
+    def on_close_request(self, window):
+        if not self.tabs.prepare_close():
+            return True
+        if self.folder_search_panel:
+            self.folder_search_panel.cancel()
+        self.save_window_size()
+        self.settings.flush()
+        return False
+
     def on_window_size_change(self, widget, param):
         self.save_window_size()
         
     def save_window_size(self):
-        width = self.get_width() 
-        height = self.get_height()
-        self.settings.set_int("window-width", width)
-        self.settings.set_int("window-height", height)
-        self.settings.apply()
-
-    def save_window_size(self):
+        # only recorded here; SettingsStore coalesces a whole drag into a few writes
         width = self.get_width()
         height = self.get_height()
         self.settings.set_int("window-width", width)
         self.settings.set_int("window-height", height)
-        self.settings.apply()
-
-    def get_text(self):
-        buffer = self.text_view.get_buffer()
-        return buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
-
-    def set_text(self, text):
-        self.text_view.get_buffer().set_text(text)
 
     def on_save_clicked(self, button):
          self.save_file()
 
-    def save_file(self):
-        if self.current_file:
-            return self.save_to_file(self.current_file)
-        else:
-            return self.save_as()
-        
-    def save_as(self):
-        dialog = Gtk.FileDialog.new()
-        dialog.set_title("Save File")
-        dialog.save(self, None, self.on_save_dialog_response)
+    def save_file(self, on_saved=None):
+        self.page.save_file(on_saved)
 
-    def on_save_dialog_response(self, dialog, result):
-        try:
-            file = dialog.save_finish(result)
-            if file:
-                if self.save_to_file(file):
-                    self.current_file = file
-                    self.buffer_modified = False
-                    self.text_view.get_buffer().set_modified(False)
-            else:
-                self.show_toast("Save operation cancelled")
-        except GLib.Error as error:
-            self.show_toast(f"Error saving file: {error.message}")
+    def save_as(self, on_saved=None):
+        self.page.save_as(on_saved)
 
-    def save_to_file(self, file):
-        buffer = self.text_view.get_buffer()
-        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True)
-        try:
-            with open(file.get_path(), 'w') as f:
-                f.write(text)
-            self.window_title.set_title(f"{file.get_basename()}")
-            self.window_title.set_subtitle(file.get_path())
-            self.buffer_modified = False
-            self.text_view.get_buffer().set_modified(False)
-            self.show_toast(f"File saved: {file.get_basename()}")
-            return True
-        except IOError as e:
-            self.show_toast(f"Error saving file: {str(e)}")
-            return False
-        
     def show_toast(self, message):
         toast = Adw.Toast.new(message)
         self.toast_overlay.add_toast(toast)
 
-    def update_title(self):
-        if self.current_file:
-            self.window_title.set_title(os.path.basename(self.current_file))
-            self.window_title.set_subtitle(os.path.dirname(self.current_file))
-        else:
-            self.window_title.set_title("texty")
-            self.window_title.set_subtitle("a minimal text editor")
-
     def new_file(self):
-        if self.buffer_modified:
-            self.prompt_save_changes("new")
-        else:
-            self.create_new_file()
+        self.tabs.add()
 
-    def prompt_save_changes(self, next_action):
-        dialog = Adw.MessageDialog.new(self)
-        dialog.set_heading("Save changes?")
-        dialog.set_body("There are unsaved changes. Do you want to save them?")
-        dialog.add_response("cancel", "Cancel")
-        dialog.add_response("discard", "Discard")
-        dialog.add_response("save", "Save")
-        dialog.set_default_response("save")
-        dialog.set_close_response("cancel")
-        dialog.connect("response", self.on_save_changes_response, next_action)
-        dialog.present()
-
-    def create_new_file(self):
-        self.text_view.get_buffer().set_text("")
-        self.text_view.get_buffer().set_modified(False)
-        self.current_file = None
-        self.window_title.set_title("texty")
-        self.window_title.set_subtitle("a minimal text editor")
-        self.show_toast("New file created")
-        self.buffer_modified = False
-        self.text_view.get_buffer().set_modified(False)
-
-    def on_buffer_changed(self, buffer):
-        self.buffer_modified = True
-        title_str = self.window_title.get_title()
-        if not title_str.startswith("* "):
-            self.window_title.set_title(f"* {title_str}")
-
-    def on_save_changes_response(self, dialog, response, next_action):
-        if response == "save":
-            success = self.save_file()
-            if success:
-                self.execute_next_action(next_action)
-        elif response == "discard":
-            self.execute_next_action(next_action)
-        # If "cancel" or dialog is closed, do nothing
+    def close_tab(self):
+        self.tabs.close_current()
 
     def on_open_dialog_response(self, dialog, result):
         try:
             file = dialog.open_finish(result)
             if file:
-                self.load_file(file)
-                self.window_title.set_title(f"{file.get_basename()}")
-                self.window_title.set_subtitle(file.get_path())
-                self.buffer_modified = False
-                self.buffer.set_modified(False)
+                self.tabs.open(file)
             else:
                 self.show_toast("Open operation cancelled")
         except GLib.Error as error:
             self.show_toast(f"Error opening file: {error.message}")
 
-    def execute_next_action(self, next_action):
-        if next_action == "new":
-            self.create_new_file()
-            self.text_view.grab_focus()
-        elif next_action == "open":
-            self.open_file(self)
+    def open_files(self, files):
+        self.tabs.open_all(files)
 
     def open_file(self):
         dialog = Gtk.FileDialog.new()
         dialog.set_title("Open File")
         dialog.open(self, None, self.on_open_dialog_response)
 
-    def load_file(self, file):
-        try:
-            with open(file.get_path(), 'r') as f:
-                text = f.read()
-            buffer = self.text_view.get_buffer()
-            buffer.set_text(text)
-            self.current_file = file
-            self.show_toast(f"File opened: {file.get_basename()}")
-        except IOError as e:
-            self.show_toast(f"Error opening file: {str(e)}")
-
-    def save_as(self):
-        dialog = Gtk.FileDialog.new()
-        dialog.set_title("Save File")
-        dialog.save(self, None, self.on_save_dialog_response)
+    def restore(self, recovered):
+        """Open a document recovered from a crash journal in a tab of its own, as unsaved changes."""
+        page = self.page if self.page.is_blank() else self.tabs.add()
+        page.restore(recovered)
+
+    def set_font_size(self, font_size):
+        self.instrumentation.until_next_frame("set_font_size", self)
+        font_size = self.style_manager.set_font_size(font_size)
+        self.settings.set_int("font-size", font_size)
+
+    def zoom_in(self):
+        self.set_font_size(self.style_manager.font_size + StyleManager.ZOOM_STEP)
+
+    def zoom_out(self):
+        self.set_font_size(self.style_manager.font_size - StyleManager.ZOOM_STEP)
+
+    def zoom_reset(self):
+        self.set_font_size(self.settings.get_default_value("font-size").get_int32())
+
+    def find(self, replace=False):
+        self.page.find(replace)
+
+    def prompt_go_to_line(self):
+        self.page.prompt_go_to_line()
+
+    def find_in_folder(self):
+        if self.folder_search_panel is None:
+            self.folder_search_panel = FolderSearchPanel(self.tabs.open_at, self.hide_folder_search)
+            self.content_paned.set_end_child(self.folder_search_panel)
+        self.folder_search_panel.set_visible(True)
+        self.folder_search_panel.focus_entry()
+
+    def hide_folder_search(self):
+        self.folder_search_panel.cancel()
+        self.folder_search_panel.set_visible(False)
+        self.page.focus_text()
+
+    def prompt_transform(self):
+        self.page.prompt_transform()
+
+    def split(self, orientation):
+        self.page.split(orientation)
+
+    def unsplit(self):
+        self.page.unsplit()
 
     def toggle_wrap_text(self, state):
-        if state:
-            self.text_view.set_wrap_mode(Gtk.WrapMode.WORD)
-        else:
-            self.text_view.set_wrap_mode(Gtk.WrapMode.NONE)
+        self.tabs.set_wrap(state)
+
+    def set_follow(self, follow):
+        self.tabs.set_follow(follow)
 
 class TextyApplication(Adw.Application):
     def __init__(self):
         super().__init__(application_id="ca.footeware.py.texty",
-                         flags=Gio.ApplicationFlags.FLAGS_NONE)
+                         flags=Gio.ApplicationFlags.HANDLES_OPEN)
         self.wrap_text_state = False  # Initialize the state
 
     def do_startup(self):
         Adw.Application.do_startup(self)
+        self.wrap_text_state = SettingsStore.get_default().get_boolean("wrap-mode")
 
         save_action = Gio.SimpleAction.new("save", None)
         save_action.connect("activate", self.on_save_action)
@@ -240,6 +189,7 @@ class TextyApplication(Adw.Application):
         new_action = Gio.SimpleAction.new("new", None)
         new_action.connect("activate", self.on_new_action)
         self.add_action(new_action)
+        self.set_accels_for_action("app.new", ["<Control>t"])
 
         open_action = Gio.SimpleAction.new("open", None)
         open_action.connect("activate", self.on_open_action)
@@ -249,6 +199,11 @@ class TextyApplication(Adw.Application):
         save_as_action.connect("activate", self.on_save_as_action)
         self.add_action(save_as_action)
 
+        close_tab_action = Gio.SimpleAction.new("close_tab", None)
+        close_tab_action.connect("activate", self.on_close_tab_action)
+        self.add_action(close_tab_action)
+        self.set_accels_for_action("app.close_tab", ["<Control>F4"])
+
         new_window_action = Gio.SimpleAction.new("new_window", None)
         new_window_action.connect("activate", self.on_new_window_action)
         self.add_action(new_window_action)  
@@ -260,20 +215,160 @@ class TextyApplication(Adw.Application):
         toggle_wrap_action.set_enabled(True)
         self.add_action(toggle_wrap_action)
 
+        follow_action = Gio.SimpleAction.new_stateful("follow", None, GLib.Variant.new_boolean(False))
+        follow_action.connect("change-state", self.on_follow_changed)
+        self.add_action(follow_action)
+
+        zoom_in_action = Gio.SimpleAction.new("zoom_in", None)
+        zoom_in_action.connect("activate", self.on_zoom_in_action)
+        self.add_action(zoom_in_action)
+        self.set_accels_for_action("app.zoom_in", ["<Control>plus", "<Control>equal", "<Control>KP_Add"])
+
+        zoom_out_action = Gio.SimpleAction.new("zoom_out", None)
+        zoom_out_action.connect("activate", self.on_zoom_out_action)
+        self.add_action(zoom_out_action)
+        self.set_accels_for_action("app.zoom_out", ["<Control>minus", "<Control>KP_Subtract"])
+
+        zoom_reset_action = Gio.SimpleAction.new("zoom_reset", None)
+        zoom_reset_action.connect("activate", self.on_zoom_reset_action)
+        self.add_action(zoom_reset_action)
+        self.set_accels_for_action("app.zoom_reset", ["<Control>0", "<Control>KP_0"])
+
+        find_action = Gio.SimpleAction.new("find", None)
+        find_action.connect("activate", self.on_find_action)
+        self.add_action(find_action)
+        self.set_accels_for_action("app.find", ["<Control>f"])
+
+        find_replace_action = Gio.SimpleAction.new("find_replace", None)
+        find_replace_action.connect("activate", self.on_find_replace_action)
+        self.add_action(find_replace_action)
+        self.set_accels_for_action("app.find_replace", ["<Control>h"])
+
+        instrumentation_action = Gio.SimpleAction.new_stateful(
+            "instrumentation", None, GLib.Variant.new_boolean(Instrumentation.get_default().enabled))
+        instrumentation_action.connect("change-state", self.on_instrumentation_changed)
+        self.add_action(instrumentation_action)
+
+        go_to_line_action = Gio.SimpleAction.new("go_to_line", None)
+        go_to_line_action.connect("activate", self.on_go_to_line_action)
+        self.add_action(go_to_line_action)
+        self.set_accels_for_action("app.go_to_line", ["<Control>l"])
+
+        find_in_folder_action = Gio.SimpleAction.new("find_in_folder", None)
+        find_in_folder_action.connect("activate", self.on_find_in_folder_action)
+        self.add_action(find_in_folder_action)
+        self.set_accels_for_action("app.find_in_folder", ["<Control><Shift>f"])
+
+        transform_action = Gio.SimpleAction.new("transform", None)
+        transform_action.connect("activate", self.on_transform_action)
+        self.add_action(transform_action)
+
+        split_horizontal_action = Gio.SimpleAction.new("split_horizontal", None)
+        split_horizontal_action.connect("activate", self.on_split_horizontal_action)
+        self.add_action(split_horizontal_action)
+
+        split_vertical_action = Gio.SimpleAction.new("split_vertical", None)
+        split_vertical_action.connect("activate", self.on_split_vertical_action)
+        self.add_action(split_vertical_action)
+
+        unsplit_action = Gio.SimpleAction.new("unsplit", None)
+        unsplit_action.connect("activate", self.on_unsplit_action)
+        self.add_action(unsplit_action)
+
+        new_view_window_action = Gio.SimpleAction.new("new_view_window", None)
+        new_view_window_action.connect("activate", self.on_new_view_window_action)
+        self.add_action(new_view_window_action)
+
     def on_toggle_wrap_text(self, action, value):
         new_state = value.get_boolean()
         self.wrap_text_state = new_state
         action.set_state(value)
+        SettingsStore.get_default().set_boolean("wrap-mode", new_state)
         win = self.get_active_window()
         if win:
             win.toggle_wrap_text(new_state)
 
+    def on_follow_changed(self, action, value):
+        action.set_state(value)
+        for win in self.get_windows():
+            if isinstance(win, TextyWindow):
+                win.set_follow(value.get_boolean())
+
+    def on_instrumentation_changed(self, action, value):
+        action.set_state(value)
+        instrumentation = Instrumentation.get_default()
+        instrumentation.set_enabled(value.get_boolean())
+        if value.get_boolean():
+            instrumentation.show_panel(self.get_active_window())
+        else:
+            instrumentation.hide_panel()
+
+    def do_shutdown(self):
+        SettingsStore.get_default().flush()
+        # a closed document's journal left behind would be offered for recovery next time
+        JournalWriter.get_default().close()
+        instrumentation = Instrumentation.get_default()
+        if instrumentation.trace_path:
+            instrumentation.write_trace(instrumentation.trace_path)
+        Adw.Application.do_shutdown(self)
+
     def do_activate(self):
-        self.new_window()
+        win = self.new_window()
+        if len(self.get_windows()) == 1:
+            win.tabs.restore_session()
+        self.check_for_recovery(win)
+
+    def do_open(self, files, n_files, hint):
+        # also how files reach the running texty when it's started again: GApplication forwards them
+        win = self.get_active_window()
+        if win is None:
+            win = self.new_window()
+            self.check_for_recovery(win)
+        win.open_files(files)
+        win.present()
+
+    def check_for_recovery(self, win):
+        journals = find_orphaned_journals()
+        if journals:
+            self.offer_recovery(win, journals)
 
     def new_window(self):
         win = TextyWindow(application=self)
+        win.toggle_wrap_text(self.wrap_text_state)
+        win.set_follow(self.get_action_state("follow").get_boolean())
         win.present()
+        return win
+
+    def offer_recovery(self, win, journals):
+        # each recovered document opens in a tab of its own
+        dialog = Adw.MessageDialog.new(win)
+        dialog.set_heading("Recover unsaved changes?")
+        count = "a document" if len(journals) == 1 else f"{len(journals)} documents"
+        dialog.set_body(f"texty didn't shut down properly and has unsaved changes to {count}.")
+        dialog.add_response("discard", "Discard")
+        dialog.add_response("later", "Later")
+        dialog.add_response("recover", "Recover")
+        dialog.set_response_appearance("discard", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_default_response("recover")
+        # closing the dialog keeps the journals, to be offered again next time
+        dialog.set_close_response("later")
+        dialog.connect("response", self.on_recovery_response, win, journals)
+        dialog.present()
+
+    def on_recovery_response(self, dialog, response, win, journals):
+        for path in journals:
+            if response == "discard":
+                discard_journal(path)
+            elif response == "recover":
+                try:
+                    recovered = read_journal(path)
+                except (OSError, ValueError, LookupError) as e:
+                    # the journal is the only copy of the changes: keep it
+                    win.show_toast(f"Error recovering changes, kept for later: {e}")
+                else:
+                    win.restore(recovered)
+                    # once the restored document's own journal has been written
+                    JournalWriter.get_default().submit(discard_journal, path)
 
     def on_save_action(self, action, parameter):
         win = self.get_active_window()
@@ -281,12 +376,7 @@ class TextyApplication(Adw.Application):
 
     def on_open_action(self, action, parameters=None):
         win = self.get_active_window()
-        if win.buffer_modified:
-            win.prompt_save_changes("new")
-        else:
-            dialog = Gtk.FileDialog.new()
-            dialog.set_title("Open File")
-            dialog.open(win, None, win.on_open_dialog_response)
+        win.open_file()
 
     def on_new_action(self, action, parameter):
         win = self.get_active_window()
@@ -296,9 +386,67 @@ class TextyApplication(Adw.Application):
         win = self.get_active_window()
         win.save_as()
     
+    def on_close_tab_action(self, action, parameter):
+        win = self.get_active_window()
+        win.close_tab()
+
     def on_new_window_action(self, action, parameter):
         self.new_window()
 
+    def on_new_view_window_action(self, action, parameter):
+        # another view of the same buffer: the text is held once
+        win = self.get_active_window()
+        if win.page.large_file_view:
+            win.show_toast("Large files can only be shown in one window")
+            return
+        page = win.page
+        self.new_window().tabs.add_view_of(page)
+
+    def on_find_in_folder_action(self, action, parameter):
+        win = self.get_active_window()
+        win.find_in_folder()
+
+    def on_transform_action(self, action, parameter):
+        win = self.get_active_window()
+        win.prompt_transform()
+
+    def on_split_horizontal_action(self, action, parameter):
+        # side by side
+        win = self.get_active_window()
+        win.split(Gtk.Orientation.HORIZONTAL)
+
+    def on_split_vertical_action(self, action, parameter):
+        win = self.get_active_window()
+        win.split(Gtk.Orientation.VERTICAL)
+
+    def on_unsplit_action(self, action, parameter):
+        win = self.get_active_window()
+        win.unsplit()
+
+    def on_zoom_in_action(self, action, parameter):
+        win = self.get_active_window()
+        win.zoom_in()
+
+    def on_zoom_out_action(self, action, parameter):
+        win = self.get_active_window()
+        win.zoom_out()
+
+    def on_zoom_reset_action(self, action, parameter):
+        win = self.get_active_window()
+        win.zoom_reset()
+
+    def on_find_action(self, action, parameter):
+        win = self.get_active_window()
+        win.find()
+
+    def on_find_replace_action(self, action, parameter):
+        win = self.get_active_window()
+        win.find(replace=True)
+
+    def on_go_to_line_action(self, action, parameter):
+        win = self.get_active_window()
+        win.prompt_go_to_line()
+
 def main(version):
 
     app = TextyApplication()
@@ -0,0 +1,225 @@
+import re
+
+
+class TransformCancelled(Exception):
+    pass
+
+
+class Step:
+    """
+    One step of a Pipeline, applied to every line.
+
+    Steps work on two parallel lists: the lines' texts and, for each, the
+    index of the line it came from, so that when no step reorders the
+    lines the Pipeline can tell which ones changed, and edit only those.
+    """
+
+    preserves_order = True
+
+    def apply(self, sources, texts, progress):
+        kept_sources = []
+        kept_texts = []
+        for start in range(0, len(texts), Pipeline.CHUNK_LINES):
+            end = start + Pipeline.CHUNK_LINES
+            for source, text in zip(sources[start:end], texts[start:end]):
+                text = self.transform(text)
+                if text is not None:
+                    kept_sources.append(source)
+                    kept_texts.append(text)
+            progress(min(end, len(texts)) / max(len(texts), 1))
+        return kept_sources, kept_texts
+
+    def transform(self, text):
+        """Return text changed, or None to drop the line."""
+        return text
+
+
+class Trim(Step):
+    def transform(self, text):
+        # a "\r" kept in a document with mixed line endings is part of its line ending, not whitespace
+        if text.endswith("\r"):
+            return text[:-1].strip(" \t") + "\r"
+        return text.strip(" \t")
+
+
+class Filter(Step):
+    def __init__(self, pattern, keep=True):
+        self.pattern = re.compile(pattern)
+        self.keep = keep
+
+    def transform(self, text):
+        return text if (self.pattern.search(text) is not None) == self.keep else None
+
+
+class Substitute(Step):
+    def __init__(self, pattern, replacement):
+        self.pattern = re.compile(pattern)
+        try:
+            self.pattern.sub(replacement, "")  # a bad group reference is an re.error now, not on the worker
+        except IndexError as e:
+            # what an unknown group name raises before Python 3.12
+            raise re.error(str(e)) from e
+        self.replacement = replacement
+
+    def transform(self, text):
+        return self.pattern.sub(self.replacement, text)
+
+
+class ChangeCase(Step):
+    CASES = {"upper": str.upper, "lower": str.lower, "title": str.title}
+
+    def __init__(self, case):
+        self.transform = self.CASES[case]
+
+
+class Unique(Step):
+    """Drop lines equal to an earlier one."""
+
+    def apply(self, sources, texts, progress):
+        self.seen = set()
+        try:
+            return super().apply(sources, texts, progress)
+        finally:
+            self.seen = None
+
+    def transform(self, text):
+        if text in self.seen:
+            return None
+        self.seen.add(text)
+        return text
+
+
+class Sort(Step):
+    NUMBER = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+
+    preserves_order = False
+
+    def __init__(self, reverse=False, numeric=False):
+        self.reverse = reverse
+        self.numeric = numeric
+
+    def apply(self, sources, texts, progress):
+        # a single sort call: it can't report progress or be cancelled half way
+        order = sorted(range(len(texts)), key=self.numeric_key(texts) if self.numeric else texts.__getitem__,
+                       reverse=self.reverse)
+        progress(1.0)
+        return [sources[i] for i in order], [texts[i] for i in order]
+
+    def numeric_key(self, texts):
+        def key(i):
+            # lines that don't start with a number go after the ones that do
+            match = self.NUMBER.match(texts[i])
+            return (0, float(match.group(1)), texts[i]) if match else (1, 0.0, texts[i])
+        return key
+
+
+class Pipeline:
+    """
+    Sort, filter and rewrite the lines of a text, headlessly.
+
+    run() returns the edits that turn the text into the result, as
+    (start, end, replacement) character offsets in ascending order, so a
+    buffer can be changed in place rather than replaced: when the steps
+    keep the lines in order, there's one edit per run of changed lines, up
+    to MAX_EDITS; otherwise, or beyond that, a single edit replaces what
+    lies between the unchanged first and last lines. Progress is reported
+    to on_progress(fraction) every CHUNK_LINES lines of each step, and
+    setting cancel_event stops the run with TransformCancelled.
+    """
+
+    CHUNK_LINES = 10000
+    MAX_EDITS = 1000
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def transform(self, text, on_progress=None, cancel_event=None):
+        """Return the lines of text, transformed, with the index of the line each came from."""
+        texts = text.split("\n")
+        sources = list(range(len(texts)))
+        for i, step in enumerate(self.steps):
+            def progress(fraction, i=i):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TransformCancelled()
+                if on_progress:
+                    on_progress((i + fraction) / len(self.steps))
+            sources, texts = step.apply(sources, texts, progress)
+        return sources, texts
+
+    def apply(self, text, on_progress=None, cancel_event=None):
+        """Return text transformed."""
+        return "\n".join(self.transform(text, on_progress, cancel_event)[1])
+
+    def run(self, text, on_progress=None, cancel_event=None):
+        sources, texts = self.transform(text, on_progress, cancel_event)
+        lines = text.split("\n")
+        starts = [0]
+        for line in lines:
+            starts.append(starts[-1] + len(line) + 1)
+        hunks = None
+        if all(step.preserves_order for step in self.steps):
+            hunks = changed_lines(lines, sources, texts, self.MAX_EDITS)
+        if hunks is None:
+            hunks = [outer_change(lines, texts)]
+        edits = [to_edit(starts, len(lines), hunk) for hunk in hunks if hunk is not None]
+        return [edit for edit in edits if edit[0] != edit[1] or edit[2]]
+
+
+def changed_lines(lines, sources, texts, limit):
+    """
+    Return (first, end, new_lines) for each run of lines that an order-preserving pipeline dropped or changed.
+
+    Returns None if there are more than limit runs.
+    """
+    hunks = []
+    first = None  # the run of dropped or changed lines being collected starts here
+    new_lines = []
+    expected = 0  # the line after the last one accounted for
+    for source, text in zip(sources, texts):
+        if source > expected and first is None:
+            first = expected
+        if text == lines[source]:
+            if first is not None:
+                hunks.append((first, source, new_lines))
+                if len(hunks) > limit:
+                    return None
+                first = None
+                new_lines = []
+        else:
+            if first is None:
+                first = source
+            new_lines.append(text)
+        expected = source + 1
+    if expected < len(lines) and first is None:
+        first = expected
+    if first is not None:
+        hunks.append((first, len(lines), new_lines))
+    return hunks if len(hunks) <= limit else None
+
+
+def outer_change(lines, texts):
+    """Return the one (first, end, new_lines) between the lines lines and texts start and end with, or None."""
+    first = 0
+    while first < len(lines) and first < len(texts) and lines[first] == texts[first]:
+        first += 1
+    if first == len(lines) == len(texts):
+        return None
+    last = 0
+    while (last < len(lines) - first and last < len(texts) - first
+           and lines[len(lines) - 1 - last] == texts[len(texts) - 1 - last]):
+        last += 1
+    return first, len(lines) - last, texts[first:len(texts) - last]
+
+
+def to_edit(starts, line_count, hunk):
+    """Turn lines [first, end) replaced by new_lines into a (start, end, replacement) of characters."""
+    first, end, new_lines = hunk
+    if end < line_count:
+        return starts[first], starts[end], "".join(line + "\n" for line in new_lines)
+    # the text doesn't end in a newline
+    length = starts[line_count] - 1
+    if new_lines:
+        return starts[first], length, "\n".join(new_lines)
+    if first > 0:
+        return starts[first] - 1, length, ""
+    return 0, length, ""
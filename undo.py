@@ -0,0 +1,349 @@
+import os
+import pickle
+import sys
+import time
+import uuid
+import zlib
+
+from gi.repository import GLib
+
+from instrumentation import Instrumentation
+from journal import is_running
+
+INSERT = 0
+DELETE = 1
+
+
+def get_spill_dir():
+    return os.path.join(GLib.get_user_cache_dir(), "texty", "undo")
+
+
+def remove_orphaned_spill_files():
+    """Remove the spill files of texty processes that have exited without removing them."""
+    try:
+        names = os.listdir(get_spill_dir())
+    except OSError:
+        return
+    for name in names:
+        pid = name.split("-", 1)[0]
+        if pid.isdigit() and not is_running(int(pid)):
+            try:
+                os.remove(os.path.join(get_spill_dir(), name))
+            except OSError:
+                pass
+
+
+def pack(text):
+    if len(text) >= UndoManager.COMPRESS_SIZE:
+        return zlib.compress(text.encode("utf-8", "surrogatepass"), 1)
+    return text
+
+
+def unpack(data):
+    if isinstance(data, bytes):
+        return zlib.decompress(data).decode("utf-8", "surrogatepass")
+    return data
+
+
+def record_size(record):
+    return sys.getsizeof(record[2]) + UndoManager.RECORD_OVERHEAD
+
+
+class UndoManager:
+    """
+    Undo and redo for a Gtk.TextBuffer, within a memory limit.
+
+    Replaces the buffer's own undo, which keeps every step for as long as
+    the buffer lives. A step is the edits of one user action, each recorded
+    as a compact (kind, offset, text) record, with texts of COMPRESS_SIZE
+    characters or more zlib-compressed; typing and deleting characters one
+    at a time merge into one step per word, as long as no more than
+    COALESCE_TIMEOUT seconds pass between them.
+
+    Once the steps take more than limit bytes, the oldest are dropped, or,
+    with spill set, written to a file in the cache directory and read back
+    when undone to, so the history stays complete while what it costs in
+    memory doesn't grow. If the spill file can't be written or read, the
+    spilled steps are dropped and on_error(error), when set, is called.
+    memory_usage() tells what the history takes, and the
+    InstrumentationPanel shows the total of every document's.
+    """
+
+    COMPRESS_SIZE = 16 * 1024
+    COALESCE_TIMEOUT = 1.0
+    RECORD_OVERHEAD = 100  # bytes a record takes besides its text, roughly
+
+    managers = set()
+    gauge_added = False
+
+    def __init__(self, buffer, limit=0, spill=False):
+        self.buffer = buffer
+        self.limit = limit  # bytes; 0 for no limit
+        self.spill = spill
+        self.undo_steps = []  # each a list of records, in the order they were made
+        self.redo_steps = []
+        self.undo_sizes = []
+        self.redo_sizes = []
+        self.size = 0
+        self.spilled = []  # (position, length) in the spill file of the steps before undo_steps
+        self.spill_path = None
+        self.spilled_size = 0
+        self.step = None  # the step being recorded, while a user action runs
+        self.user_action_depth = 0
+        self.last_edit = 0
+        self.can_coalesce = False
+        self.active = True  # whether edits are being recorded
+        self.paused = False
+        self.applying = False
+        self.on_error = None
+        UndoManager.managers.add(self)
+        if not UndoManager.gauge_added:
+            Instrumentation.get_default().add_gauge("undo history", UndoManager.describe_usage)
+            UndoManager.gauge_added = True
+
+    def attach(self):
+        self.buffer.set_enable_undo(False)
+        self.buffer.connect("insert-text", self.on_insert_text)
+        self.buffer.connect("delete-range", self.on_delete_range)
+        self.buffer.connect("begin-user-action", self.on_begin_user_action)
+        self.buffer.connect("end-user-action", self.on_end_user_action)
+
+    def suspend(self):
+        """Stop recording, e.g. while a file is loading, and forget the history."""
+        self.clear()
+        self.active = False
+
+    def reset(self):
+        """Start a new history; the text as it is now is where undoing stops."""
+        self.clear()
+        self.active = True
+
+    def pause(self):
+        """Keep edits that don't move the recorded ones, like text appended to the end, out of the history."""
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def close(self):
+        self.clear()
+        self.active = False
+        UndoManager.managers.discard(self)
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.undo_sizes.clear()
+        self.redo_sizes.clear()
+        self.size = 0
+        self.step = None
+        self.can_coalesce = False
+        self.spilled.clear()
+        self.spilled_size = 0
+        if self.spill_path:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+            self.spill_path = None
+
+    def can_undo(self):
+        return bool(self.undo_steps or self.spilled)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def memory_usage(self):
+        """Return (bytes in memory, bytes spilled to disk, steps) of the history."""
+        return self.size, self.spilled_size, len(self.undo_steps) + len(self.redo_steps) + len(self.spilled)
+
+    @classmethod
+    def describe_usage(cls):
+        usages = [manager.memory_usage() for manager in cls.managers]
+        in_memory = sum(usage[0] for usage in usages) / 1024 / 1024
+        spilled = sum(usage[1] for usage in usages) / 1024 / 1024
+        steps = sum(usage[2] for usage in usages)
+        return f"{in_memory:.1f} MB in memory, {spilled:.1f} MB on disk, {steps} steps"
+
+    def recording(self):
+        return self.active and not self.paused and not self.applying
+
+    def on_begin_user_action(self, buffer):
+        self.user_action_depth += 1
+
+    def on_end_user_action(self, buffer):
+        self.user_action_depth -= 1
+        if self.user_action_depth == 0:
+            self.finish_step()
+
+    def on_insert_text(self, buffer, location, text, length):
+        if self.recording():
+            self.add_record((INSERT, location.get_offset(), text))
+
+    def on_delete_range(self, buffer, start, end):
+        if self.recording() and start.get_offset() != end.get_offset():
+            self.add_record((DELETE, start.get_offset(), start.get_slice(end)))
+
+    def add_record(self, record):
+        self.redo_steps.clear()
+        self.size -= sum(self.redo_sizes)
+        self.redo_sizes.clear()
+        if self.step is None:
+            self.step = []
+        self.step.append(record)
+        if self.user_action_depth == 0:
+            self.finish_step()
+
+    def finish_step(self):
+        step, self.step = self.step, None
+        if not step:
+            return
+        now = time.monotonic()
+        if self.coalesce(step, now):
+            self.last_edit = now
+            return
+        self.can_coalesce = True
+        self.last_edit = now
+        step = [(kind, offset, pack(text)) for kind, offset, text in step]
+        size = sum(record_size(record) for record in step)
+        self.undo_steps.append(step)
+        self.undo_sizes.append(size)
+        self.size += size
+        self.enforce_limit()
+
+    def coalesce(self, step, now):
+        """Merge a step typing or deleting one character into the previous one, if that did the same."""
+        if (len(step) != 1 or not self.can_coalesce or not self.undo_steps
+                or now - self.last_edit > self.COALESCE_TIMEOUT or len(self.undo_steps[-1]) != 1):
+            return False
+        kind, offset, text = step[0]
+        last_kind, last_offset, last_text = self.undo_steps[-1][0]
+        if kind != last_kind or len(text) != 1 or text == "\n" or not last_text or isinstance(last_text, bytes):
+            return False
+        if kind == INSERT and offset == last_offset + len(last_text):
+            # a new word starts a new step
+            if last_text[-1].isspace() and not text.isspace():
+                return False
+            merged = (INSERT, last_offset, last_text + text)
+        elif kind == DELETE and offset + 1 == last_offset:  # backspace
+            if text.isspace() and not last_text[0].isspace():
+                return False
+            merged = (DELETE, offset, text + last_text)
+        elif kind == DELETE and offset == last_offset:  # delete
+            if text.isspace() and not last_text[-1].isspace():
+                return False
+            merged = (DELETE, offset, last_text + text)
+        else:
+            return False
+        size = record_size(merged)
+        self.size += size - self.undo_sizes[-1]
+        self.undo_steps[-1] = [merged]
+        self.undo_sizes[-1] = size
+        self.enforce_limit()
+        return True
+
+    def enforce_limit(self):
+        if not self.limit:
+            return
+        # without spilling, the step just made is kept however big it is
+        while self.size > self.limit and len(self.undo_steps) > (0 if self.spill else 1):
+            step = self.undo_steps.pop(0)
+            size = self.undo_sizes.pop(0)
+            self.size -= size
+            if self.spill:
+                self.spill_step(step, size)
+            else:
+                # what came before can't be undone to without the step
+                self.clear_spilled()
+        while self.size > self.limit and len(self.redo_steps) > 1:
+            # the furthest redo is the first
+            self.redo_steps.pop(0)
+            self.size -= self.redo_sizes.pop(0)
+
+    def spill_step(self, step, size):
+        try:
+            if self.spill_path is None:
+                remove_orphaned_spill_files()
+                os.makedirs(get_spill_dir(), exist_ok=True)
+                self.spill_path = os.path.join(get_spill_dir(), f"{os.getpid()}-{uuid.uuid4().hex}.undo")
+            data = pickle.dumps((step, size), pickle.HIGHEST_PROTOCOL)
+            with open(self.spill_path, "ab") as spill_file:
+                position = spill_file.tell()
+                spill_file.write(data)
+        except OSError as e:
+            self.clear_spilled()
+            if self.on_error:
+                self.on_error(e)
+            return
+        self.spilled.append((position, len(data)))
+        self.spilled_size += len(data)
+
+    def unspill_step(self):
+        """Read the newest spilled step back, to undo it; the file is truncated to what's left."""
+        position, length = self.spilled.pop()
+        self.spilled_size -= length
+        try:
+            with open(self.spill_path, "r+b") as spill_file:
+                spill_file.seek(position)
+                step, size = pickle.loads(spill_file.read(length))
+                spill_file.truncate(position)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            self.clear_spilled()
+            if self.on_error:
+                self.on_error(e)
+            return False
+        self.undo_steps.insert(0, step)
+        self.undo_sizes.insert(0, size)
+        self.size += size
+        return True
+
+    def clear_spilled(self):
+        self.spilled.clear()
+        self.spilled_size = 0
+        if self.spill_path:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+            self.spill_path = None
+
+    def undo(self):
+        if not self.undo_steps and not (self.spilled and self.unspill_step()):
+            return False
+        step = self.undo_steps.pop()
+        size = self.undo_sizes.pop()
+        self.apply(step, undo=True)
+        self.redo_steps.append(step)
+        self.redo_sizes.append(size)
+        self.enforce_limit()
+        return True
+
+    def redo(self):
+        if not self.redo_steps:
+            return False
+        step = self.redo_steps.pop()
+        size = self.redo_sizes.pop()
+        self.apply(step, undo=False)
+        self.undo_steps.append(step)
+        self.undo_sizes.append(size)
+        self.enforce_limit()
+        return True
+
+    def apply(self, step, undo):
+        self.can_coalesce = False
+        self.applying = True
+        buffer = self.buffer
+        buffer.begin_user_action()
+        try:
+            for kind, offset, data in (reversed(step) if undo else step):
+                text = unpack(data)
+                if (kind == INSERT) == undo:
+                    buffer.delete(buffer.get_iter_at_offset(offset), buffer.get_iter_at_offset(offset + len(text)))
+                    cursor = offset
+                else:
+                    buffer.insert(buffer.get_iter_at_offset(offset), text)
+                    cursor = offset + len(text)
+        finally:
+            buffer.end_user_action()
+            self.applying = False
+        buffer.place_cursor(buffer.get_iter_at_offset(cursor))